@@ -0,0 +1,750 @@
+"""Latency and throughput benchmarks for the OMS hot paths.
+
+End-to-end benchmarks run the real OrderManager loop against the local
+FlattradeSimulator; results are reported as percentiles (microseconds) and
+can be saved as JSON to compare across commits.
+
+Usage: python bench_oms.py [name ...] [--json results.json] [--orders N]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import platform
+import random
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from collections import deque
+from typing import Dict, List, Optional
+
+import omsflatradejiddi as oms
+import flattrade_simulator as sim_mod
+from omsflatradejiddi import KniteOrder, OrderManager, ORDER_TYPE_LIMIT
+
+OM = OrderManager()  # Replaced by _reset_oms() before each end-to-end run
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarise latencies given in seconds as microsecond percentiles"""
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(n - 1, int(p / 100 * n))] * 1e6, 1)
+
+    return {
+        "n": n,
+        "mean_us": round(sum(ordered) / n * 1e6, 1),
+        "p50_us": pct(50),
+        "p90_us": pct(90),
+        "p99_us": pct(99),
+        "p999_us": pct(99.9),
+        "max_us": round(ordered[-1] * 1e6, 1),
+    }
+
+
+def _reset_oms() -> OrderManager:
+    """Fresh OrderManager for the next benchmark run"""
+    global OM
+    OM = OrderManager()
+    return OM
+
+
+class _WireTimedAPI(sim_mod.SimulatedFlattradeAPI):
+    """Records when each place request leaves for the wire (FIFO order)"""
+    wire_times: List[float] = []
+    lose_acks = False  # Broker takes the order but the response never arrives
+
+    async def place_order(self, **payload) -> dict:
+        self.wire_times.append(time.perf_counter())
+        response = await super().place_order(**payload)
+        return {} if self.lose_acks else response
+
+
+@contextlib.asynccontextmanager
+async def _oms_against_sim(config: Optional[dict] = None, **sim_kwargs):
+    """Run OrderManager.start against a fresh simulator; yields (sim, wire_times)"""
+    _reset_oms()
+    for name, value in (config or {}).items():
+        setattr(OM, name, value)
+    # Measure OMS overhead, not the broker's throttle
+    OM.RATE_LIMITS = {lane: (1e9, 1e9) for lane in OM.RATE_LIMITS}
+    OM.RISK_LIMITS = {**OM.RISK_LIMITS, "max_orders_per_sec": 10**9}
+    sim = sim_mod.FlattradeSimulator(**sim_kwargs)
+    await sim.start()
+    sim_mod.install(sim)
+    wire_times: List[float] = []
+    _WireTimedAPI.wire_times = wire_times
+    OM.API_CLASS = lambda creds, token=None: _WireTimedAPI(sim, creds, token)
+
+    loop_task = asyncio.create_task(OM.start(sim_mod.SIM_CREDS))
+    await OM._ready.wait()
+    await OM._ws_connected.wait()
+    try:
+        yield sim, wire_times
+    finally:
+        await OM.stop()
+        loop_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await loop_task
+        await OM._api.close()
+        await sim.stop()
+
+
+def _bench_order(i: int, quantity: int = 1) -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    order.quantity = quantity
+    order.price = 100.0
+    order.symbol = "MCX:CRUDEOIL25NOVFUT"
+    order.exchange = "MCX"
+    order.token = "400001"
+    order.tag = f"BENCH_{i}"
+    return order
+
+
+async def _wait_for(predicate, timeout: float = 60.0):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark condition not reached")
+        await asyncio.sleep(0.001)
+
+
+def _make_ws_frames(n: int, open_ids: List[str]) -> List[str]:
+    """Burst of order updates and touchline ticks shaped like PiConnect frames"""
+    frames = []
+    for i in range(n):
+        if i % 4 == 0:
+            frames.append(json.dumps({
+                "t": "om", "n": random.choice(open_ids), "status": "OPEN",
+                "filledqty": "0", "prctyp": "LMT", "prc": "101.5", "qty": "10",
+                "exch": "MCX", "tsym": "CRUDEOIL25NOVFUT", "trantype": "B",
+                "norentm": "10:00:00 18-10-2026", "exch_tm": "18-10-2026 10:00:00",
+                "rejreason": "", "remarks": "", "uid": "U1", "actid": "U1",
+            }))
+        else:
+            frames.append(json.dumps({
+                "t": "tf", "e": "MCX", "tk": str(400000 + i % 50),
+                "lp": f"{100 + random.random():.2f}", "bp1": "99.90", "sp1": "100.10",
+                "v": "12345", "ft": "1760000000",
+            }))
+    return frames
+
+
+def _legacy_handle(data: dict):
+    """Baseline: the pre-dispatch-table inline handler"""
+    if data.get("t") == "om":
+        order_id = data.get("n")
+        status = data.get("status")
+        filled_qty = int(data.get("filledqty", "0"))
+        if order_id in OM._open_orders:
+            knite_order = OM._open_orders[order_id]
+            knite_order.filled_qty = filled_qty
+            if status in ["REJECTED", "CANCELLED"]:
+                knite_order.status = oms.ORDER_STATUS_REJECTED
+            elif status == "COMPLETE":
+                knite_order.status = oms.ORDER_STATUS_COMPLETE
+            elif status in ["OPEN", "PENDING"]:
+                knite_order.status = oms.ORDER_STATUS_OPEN
+
+
+def bench_ws_decode(n: int = 200_000) -> Dict[str, float]:
+    """WebSocket frames decoded and dispatched per second on one core"""
+    open_ids = [f"25101800{i:06d}" for i in range(200)]
+    for oid in open_ids:
+        OM._open_orders[oid] = KniteOrder(ORDER_TYPE_LIMIT)
+    frames = _make_ws_frames(n, open_ids)
+
+    start = time.perf_counter()
+    for message in frames:
+        _legacy_handle(json.loads(message))
+    legacy = n / (time.perf_counter() - start)
+
+    pending = deque(frames)
+    start = time.perf_counter()
+    OM._drain_ws_frames(pending)
+    current = n / (time.perf_counter() - start)
+
+    OM._open_orders.clear()
+    OM._ws_updates.clear()
+    OM._pending_stages.clear()
+    return {
+        "frames": n,
+        "legacy_msgs_per_sec": round(legacy),
+        "msgs_per_sec": round(current),
+        "speedup": round(current / legacy, 2),
+    }
+
+
+def bench_ws_ack(n: int = 20_000) -> Dict[str, float]:
+    """Order-update frame arrival to KniteOrder state update"""
+    _reset_oms()
+    open_ids = [f"25101800{i:06d}" for i in range(n)]
+    for oid in open_ids:
+        OM._open_orders[oid] = KniteOrder(ORDER_TYPE_LIMIT)
+    frames = [json.dumps({"t": "om", "n": oid, "status": "COMPLETE", "filledqty": "1"})
+              for oid in open_ids]
+
+    samples = []
+    pending = deque()
+    for frame in frames:
+        pending.append(frame)
+        start = time.perf_counter()
+        OM._drain_ws_frames(pending)
+        samples.append(time.perf_counter() - start)
+    _reset_oms()
+    return percentiles(samples)
+
+
+async def bench_submit(n: int = 2_000) -> Dict[str, float]:
+    """place_new_order to the HTTP request leaving place_order"""
+    async with _oms_against_sim(fill_model=sim_mod.FillModel("touch")) as (sim, wire_times):
+        samples = []
+        for i in range(n):
+            start = time.perf_counter()
+            await OM.place_new_order(_bench_order(i))
+            await _wait_for(lambda: len(wire_times) > i)
+            samples.append(wire_times[i] - start)
+        return percentiles(samples)
+
+
+async def bench_sl_tick_to_exit(n: int = 500) -> Dict[str, float]:
+    """Tick crossing a resting stop to the exit order hitting the wire"""
+    async with _oms_against_sim() as (sim, wire_times):
+        samples = []
+        for i in range(n):
+            parent = _bench_order(i)
+            parent.sl_price = 95.0
+            OM.add_sl_order(OM.create_sl_order(parent))
+            sent = len(wire_times)
+            start = time.perf_counter()
+            OM.on_tick(parent.instrument_key, 94.0)
+            await _wait_for(lambda: len(wire_times) > sent)
+            samples.append(wire_times[sent] - start)
+        return percentiles(samples)
+
+
+async def bench_exit_all(n: int = 50, rounds: int = 20) -> Dict[str, float]:
+    """exit_all_orders with n open positions and n working entries until every exit is on the wire"""
+    async with _oms_against_sim(fill_model=sim_mod.FillModel("touch")) as (sim, wire_times):
+        samples, flat = [], []
+        pos_mgr = OM._live_pos_mgr
+        for r in range(rounds):
+            entries = []
+            for i in range(2 * n):
+                order = _bench_order(r * 2 * n + i)
+                order.token = str(500000 + i % n)  # One position and one working entry per instrument
+                order.symbol = f"MCX:BENCH{i % n}"
+                if i < n:
+                    order.order_type = oms.ORDER_TYPE_MARKET  # Fills at once
+                entries.append(order)  # LIMITs on unpriced symbols rest
+                await OM.place_new_order(order)
+            await _wait_for(lambda: len(pos_mgr.positions_to_flatten()) == n
+                            and sum(o.is_open for o in entries[n:]) == n)
+
+            sent = len(wire_times)
+            start = time.perf_counter()
+            OM.exit_all_orders()
+            await _wait_for(lambda: len(wire_times) >= sent + n)
+            samples.append(wire_times[sent + n - 1] - start)
+            await _wait_for(lambda: not pos_mgr.positions_to_flatten() and not OM._open_orders)
+            flat.append(time.perf_counter() - start)
+            assert len(wire_times) == sent + n, "flatten sent more exits than positions"
+        result = percentiles(samples)
+        result["flat_p50_us"] = percentiles(flat)["p50_us"]
+        result["positions"] = n
+        result["cancelled"] = sim.stats["cancelled"]
+        return result
+
+
+async def bench_thread_submit(n: int = 2_000, burst: int = 50) -> Dict[str, float]:
+    """Strategy thread submit_threadsafe to the order on the wire, single orders and bursts"""
+    async with _oms_against_sim(fill_model=sim_mod.FillModel("touch")) as (sim, wire_times):
+        def strategy():
+            single = []
+            for i in range(n):
+                start = time.perf_counter()
+                OM.submit_threadsafe(_bench_order(i))
+                while len(wire_times) <= i:
+                    time.sleep(0)
+                single.append(wire_times[i] - start)
+            bursts = []
+            for r in range(max(1, n // burst)):
+                sent = len(wire_times)
+                start = time.perf_counter()
+                OM.submit_many_threadsafe([_bench_order(n + r * burst + i) for i in range(burst)])
+                while len(wire_times) < sent + burst:
+                    time.sleep(0)
+                bursts.append(wire_times[sent + burst - 1] - start)
+            return single, bursts
+
+        single, bursts = await asyncio.to_thread(strategy)
+        handoff = OM._latency_hist.get("thread_handoff")
+        return {"single": percentiles(single),
+                "burst": dict(percentiles(bursts), orders=burst),
+                "handoff_us": handoff.summary() if handoff else {}}
+
+
+async def bench_ws_failover(n: int = 20) -> Dict[str, dict]:
+    """Broker-side WebSocket drop to reconnected, and to a fill missed while down being applied"""
+    result = {}
+    for mode, standby in (("backoff", False), ("standby", True)):
+        async with _oms_against_sim(config={"WS_STANDBY": standby},
+                                    fill_model=sim_mod.FillModel("manual")) as (sim, wire_times):
+            reconnect, applied = [], []
+            for i in range(n):
+                if standby:
+                    await _wait_for(lambda: OM._ws_standby is not None)
+                order = _bench_order(i)
+                await OM.place_new_order(order)
+                await _wait_for(lambda: order.broker_order_id in OM._open_orders
+                                and order.status == oms.ORDER_STATUS_OPEN)
+                dropped = OM._ws
+                start = time.perf_counter()
+                await sim.drop_ws()
+                await sim.fill(order.broker_order_id)  # Nobody is listening for this update
+                await _wait_for(lambda: OM._ws_connected.is_set() and OM._ws not in (None, dropped))
+                reconnect.append(time.perf_counter() - start)
+                await _wait_for(lambda: order.broker_order_id not in OM._open_orders)
+                applied.append(time.perf_counter() - start)
+            result[mode] = {"reconnect": percentiles(reconnect), "fill_applied": percentiles(applied),
+                            "ws": OM.ws_stats()}
+    return result
+
+
+def _legacy_payload(creds: dict, order: KniteOrder) -> dict:
+    """Baseline: the per-order payload build and logging place_order used to do"""
+    side = "B" if order.quantity > 0 else "S"
+    symbol = order.symbol.replace("MCX:", "")
+    order_payload = {
+        "uid": str(creds['USER']), "actid": str(creds['USER']), "exch": "MCX",
+        "tsym": str(symbol), "qty": str(abs(order.quantity)),
+        "prd": str(order.product_type if order.product_type is not None else "I"),
+        "trantype": str(side), "ret": "DAY",
+    }
+    order_payload["prctyp"] = "LIMIT"
+    order_payload["prc"] = str(order.price if order.price is not None else "0")
+    order_payload = {k: v for k, v in order_payload.items() if v is not None}
+    logging.info(f"Order payload for {order.symbol}: {json.dumps(order_payload)}")
+    return order_payload
+
+
+def bench_payload_build(n: int = 100_000) -> Dict[str, float]:
+    """Place-order payload construction: time and allocations per order"""
+    creds = {"USER": "FT0001"}
+    broker = SimpleNamespace(creds=creds)
+    order = _bench_order(0)
+
+    def templated():
+        payload = dict(OM._payload_template(
+            broker.creds['USER'], order.exchange, order.symbol, order.product_type, order.order_type))
+        payload["qty"] = str(abs(order.quantity))
+        payload["trantype"] = "B" if order.quantity > 0 else "S"
+        payload["prc"] = str(order.price)
+        logging.debug("Order payload for %s: %s", order.symbol, payload)
+        return payload
+
+    result = {}
+    for name, build in (("legacy", lambda: _legacy_payload(creds, order)), ("templated", templated)):
+        build()
+        start = time.perf_counter()
+        for _ in range(n):
+            build()
+        result[f"{name}_ns"] = round((time.perf_counter() - start) / n * 1e9, 1)
+
+        # Peak bytes allocated while building one payload
+        tracemalloc.start()
+        peak_total = 0
+        for _ in range(1000):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            build()
+            peak_total += tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+        result[f"{name}_peak_alloc_bytes"] = round(peak_total / 1000)
+    return result
+
+
+def bench_metrics_overhead(n: int = 1_000_000) -> Dict[str, float]:
+    """Cost of one lifecycle timestamp and one histogram record, in ns"""
+    _reset_oms()
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    stamp = OM._stamp
+
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        pass
+    empty = time.perf_counter_ns() - start
+
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        stamp(order, oms.TS_DEQUEUE)
+    stamp_ns = (time.perf_counter_ns() - start - empty) / n
+
+    hist = oms.LatencyHistogram()
+    sample = [random.randint(1_000, 50_000_000) for _ in range(min(n, 1000))]
+    values = (sample * -(-n // len(sample)))[:n]  # Exactly n, so the per-record division holds for any n
+    start = time.perf_counter_ns()
+    for v in values:
+        hist.record(v)
+    record_ns = (time.perf_counter_ns() - start - empty) / n
+
+    OM._order_ts.clear()
+    return {"stamp_ns": round(stamp_ns, 1), "hist_record_ns": round(record_ns, 1)}
+
+
+def bench_event_log(n: int = 200_000) -> Dict[str, float]:
+    """Per-line cost on the loop: logging.info to a file vs an event-log record"""
+    workdir = tempfile.mkdtemp(prefix="oms_bench_")
+    order = _bench_order(0)
+    broker_id = "25101800000001"
+
+    logger = logging.getLogger("bench_event_log")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.FileHandler(os.path.join(workdir, "oms.log"))
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    start = time.perf_counter()
+    for _ in range(n):
+        logger.info("Placed order %s for %s", broker_id, order.symbol)
+    legacy_ns = (time.perf_counter() - start) / n * 1e9
+    logger.removeHandler(handler)
+    handler.close()
+
+    # Ring sized like production; the writer thread drains concurrently
+    event_log = oms.EventLog(os.path.join(workdir, "events"), OM.EVENT_LOG_CAPACITY, OM.EVENT_LOG_FLUSH_SEC)
+    start = time.perf_counter()
+    for _ in range(n):
+        event_log.emit(oms.EV_PLACED, order.id, broker_id, order.quantity, order.price)
+    emit_ns = (time.perf_counter() - start) / n * 1e9
+    event_log.close()
+    written = sum(1 for path in event_log.files for _ in oms.EventLog.read(path))
+    return {"lines": n,
+            "logging_ns": round(legacy_ns, 1),
+            "event_emit_ns": round(emit_ns, 1),
+            "speedup": round(legacy_ns / emit_ns, 1),
+            "written": written,
+            "dropped": event_log.dropped}
+
+
+def bench_journal(n: int = 20_000) -> Dict[str, float]:
+    """Journal append cost per order transition and crash-recovery replay time"""
+    path = os.path.join(tempfile.mkdtemp(prefix="oms_bench_"), "journal.bin")
+    journal = oms.OrderJournal(path)
+    orders = []
+    for i in range(n):
+        order = _bench_order(i, 1 if i % 2 else -1)
+        order.broker_order_id = f"25101800{i:06d}"
+        order.status = oms.ORDER_STATUS_OPEN
+        orders.append(order)
+
+    start = time.perf_counter()
+    for order in orders:
+        journal.append_order(oms.REC_ORDER, order)
+    append = (time.perf_counter() - start) / n
+    for order in orders[: n // 2]:
+        journal.append_fill(order, order.quantity, 100.0)
+        journal.append_id(oms.REC_CLOSE, order.id)
+    journal.close()
+
+    journal = oms.OrderJournal(path)
+    start = time.perf_counter()
+    state = journal.replay()
+    replay = time.perf_counter() - start
+    journal.close()
+    os.remove(path)
+    return {"append_us": round(append * 1e6, 2), "records": state.records,
+            "replay_ms": round(replay * 1e3, 2), "recovered_open": len(state.open_orders)}
+
+
+async def bench_basket(n: int = 5_000) -> Dict[str, float]:
+    """place_orders_from_file on an n-leg CSV: first order on the wire vs whole file queued"""
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as f:
+        f.write("symbol,qty,price,tag,exchange,token\n")
+        for i in range(n):
+            f.write(f"MCX:CRUDEOIL25NOVFUT,{1 if i % 2 else -1},100.0,BASKET_{i},MCX,400001\n")
+    try:
+        async with _oms_against_sim(fill_model=sim_mod.FillModel("touch")) as (sim, wire_times):
+            start = time.perf_counter()
+            placed = await OM.place_orders_from_file(path)
+            queued = time.perf_counter()
+            await _wait_for(lambda: len(wire_times) >= placed)
+            done = time.perf_counter()
+            return {"legs": placed,
+                    "first_on_wire_ms": round((wire_times[0] - start) * 1e3, 2),
+                    "file_queued_ms": round((queued - start) * 1e3, 2),
+                    "all_on_wire_ms": round((done - start) * 1e3, 2)}
+    finally:
+        os.remove(path)
+
+
+async def bench_reconcile(n: int = 5_000, errored: int = 50) -> Dict[str, float]:
+    """Errored-order lookup in an n-order book (full scan vs tag index), then lost-ack recovery end to end"""
+    book = [{"orderid": f"25101800{i:06d}", "status": "OPEN", "ordertype": "LMT", "filledqty": "0",
+             "price": "100.0", "quantity": "1", "tag": f"BENCH_{i}"} for i in range(n)]
+    tags = [f"BENCH_{i}" for i in range(0, n, max(1, n // errored))][:errored]
+    rounds = 50
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        legacy = [row for row in book if row.get("tag") in tags]
+    legacy_us = (time.perf_counter() - start) / rounds * 1e6
+
+    cache = oms.OrderBookCache()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        cache.load(book)
+    index_us = (time.perf_counter() - start) / rounds * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds):
+        found = [cache.by_tag[tag] for tag in tags if tag in cache.by_tag]
+    lookup_us = (time.perf_counter() - start) / rounds * 1e6
+    assert len(found) == len(legacy)
+
+    async with _oms_against_sim(fill_model=sim_mod.FillModel("touch")) as (sim, wire_times):
+        OM._api.lose_acks = True
+        start = time.perf_counter()
+        for i in range(errored):
+            await OM.place_new_order(_bench_order(i))
+        await _wait_for(lambda: len(sim.orders) >= errored and not OM._errored_orders
+                        and not OM._orphaned_orders)
+        assert OM._book.refreshes, "recovery never consulted the order book"
+        recovered_ms = (time.perf_counter() - start) * 1e3
+
+    return {"book": n, "errored": len(tags),
+            "legacy_scan_us": round(legacy_us, 1),
+            "index_build_us": round(index_us, 1),
+            "indexed_lookup_us": round(lookup_us, 2),
+            "lost_ack_recovery_ms": round(recovered_ms, 2)}
+
+
+def bench_risk(n: int = 100_000) -> Dict[str, float]:
+    """Pre-trade risk check per order, untimed and with per-check timing"""
+    risk = oms.RiskEngine({**OM.RISK_LIMITS, "max_orders_per_sec": 10**9})
+    orders = [_bench_order(i) for i in range(n)]
+    result = {}
+    for timed in (False, True):
+        start = time.perf_counter()
+        for order in orders:
+            risk.check(order, 100.0, timed)
+            risk.release(order)
+        result["timed_ns" if timed else "check_ns"] = round((time.perf_counter() - start) / n * 1e9, 1)
+    result["check_us"] = {name: stats["p99"] for name, stats in risk.stats()["check_us"].items()}
+    return result
+
+
+
+def bench_instruments(n: int = 100_000) -> Dict[str, float]:
+    """Scrip master compile (cold SOD), index open (warm SOD) and O(1) lookups"""
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "NFO_symbols.txt")
+    with open(source, "w") as f:
+        f.write("Exchange,Token,LotSize,Symbol,TradingSymbol,Expiry,Instrument,OptionType,StrikePrice,TickSize,\n")
+        for i in range(n):
+            f.write(f"NFO,{35000 + i},75,NIFTY,NIFTY25NOV{20000 + i}CE,27-NOV-2025,OPTIDX,CE,{20000 + i},0.05,\n")
+    path = os.path.join(workdir, "instruments.idx")
+    try:
+        start = time.perf_counter()
+        oms.InstrumentMaster.compile([source], path)
+        compiled = time.perf_counter()
+        master = oms.InstrumentMaster(path)
+        opened = time.perf_counter()
+
+        symbols = [f"NFO:NIFTY25NOV{20000 + random.randrange(n)}CE" for _ in range(10_000)]
+        start_lookup = time.perf_counter()
+        for symbol in symbols:
+            master._cache.clear()
+            master.by_symbol(symbol)
+        cold = (time.perf_counter() - start_lookup) / len(symbols)
+        for symbol in symbols:
+            master.by_symbol(symbol)
+        start_lookup = time.perf_counter()
+        for symbol in symbols:
+            master.by_symbol(symbol)
+        cached = (time.perf_counter() - start_lookup) / len(symbols)
+        master.close()
+        return {"instruments": n, "compile_ms": round((compiled - start) * 1e3, 1),
+                "open_ms": round((opened - compiled) * 1e3, 3), "index_bytes": os.path.getsize(path),
+                "lookup_ns": round(cold * 1e9, 1), "cached_lookup_ns": round(cached * 1e9, 1)}
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+
+
+async def bench_startup(n: int = 20) -> Dict[str, float]:
+    """start() launch to dispatching orders, with the per-step warm-up timeline of the last run"""
+    samples = []
+    report = {}
+    for _ in range(n):
+        async with _oms_against_sim():
+            report = OM.startup_report()
+            samples.append(report["ready_ms"] / 1000)
+    return {**percentiles(samples), "last_steps_ms": report["steps_ms"]}
+
+
+def bench_blotter(n: int = 100_000, symbols: int = 50) -> Dict[str, float]:
+    """Str vs int id lookups, and intraday queries: dict loops vs the columnar blotter"""
+    rng = random.Random(7)
+    store = oms.OrderStore(capacity=1024)
+    orders, fill_value = [], {}
+    for i in range(n):
+        order = KniteOrder(ORDER_TYPE_LIMIT)
+        order.symbol = f"NSE:SYM{i % symbols}-EQ"
+        order.quantity = rng.choice((-1, 1)) * rng.randint(1, 100)
+        order.price = order.expected_price = 100.0 + i % 7
+        store.record(order)
+        if rng.random() < 0.7:
+            order.filled_qty = abs(order.quantity)
+            order.status = oms.ORDER_STATUS_COMPLETE
+            price = order.expected_price + rng.uniform(-0.1, 0.2)
+            fill_value[order.id] = order.filled_qty * price
+            store.on_fill(order, order.filled_qty, price)
+        else:
+            order.status = oms.ORDER_STATUS_OPEN
+        store.sync(order)
+        orders.append(order)
+    by_id = {o.id: o for o in orders}
+
+    def legacy_queries():
+        fills, slip, exposure = {}, {}, {}
+        for o in by_id.values():
+            if o.filled_qty > 0:
+                side = 1 if o.quantity > 0 else -1
+                net, gross, value = fills.get(o.symbol, (0, 0, 0.0))
+                fills[o.symbol] = (net + side * o.filled_qty, gross + o.filled_qty, value + fill_value[o.id])
+                cost = (fill_value[o.id] / o.filled_qty - o.expected_price) * side * o.filled_qty
+                c, q = slip.get(o.symbol, (0.0, 0))
+                slip[o.symbol] = (c + cost, q + o.filled_qty)
+            elif o.status == oms.ORDER_STATUS_OPEN:
+                w, notional = exposure.get(o.symbol, (0, 0.0))
+                exposure[o.symbol] = (w + o.quantity, notional + o.quantity * o.price)
+        return fills, slip, exposure
+
+    def columnar_queries():
+        return store.fills_by_symbol(), store.slippage(), store.open_exposure()
+
+    result = {"orders": n, "symbols": symbols}
+    for name, fn in (("dict_loop_ms", legacy_queries), ("columnar_ms", columnar_queries)):
+        start = time.perf_counter()
+        for _ in range(5):
+            fn()
+        result[name] = round((time.perf_counter() - start) / 5 * 1e3, 2)
+    legacy_fills = legacy_queries()[0]
+    assert all(store.fills_by_symbol()[sym][0] == net for sym, (net, _, _) in legacy_fills.items())
+
+    str_ids = {f"ORD_{time.time_ns() + i}": o for i, o in enumerate(orders)}
+    keys_str, keys_int = list(str_ids), list(by_id)
+    for label, table, keys in (("str_lookup_ns", str_ids, keys_str), ("int_lookup_ns", by_id, keys_int)):
+        start = time.perf_counter()
+        for key in keys:
+            table[key]
+        result[label] = round((time.perf_counter() - start) / len(keys) * 1e9, 1)
+    return result
+
+
+def bench_scheduler(n: int = 100_000) -> Dict[str, float]:
+    """OrderScheduler push + pop cost with a mixed entry/exit/SL backlog of n orders"""
+    orders = []
+    for i in range(n):
+        order = _bench_order(i)
+        order.is_exit_order = i % 3 == 0
+        order.is_high_priority = i % 9 == 0
+        orders.append(order)
+    scheduler = oms.OrderScheduler()
+    classify = oms.OrderScheduler.classify
+
+    start = time.perf_counter()
+    for order in orders:
+        scheduler.push(order, classify(order))
+    pushed = time.perf_counter()
+    while scheduler:
+        klass, _ = scheduler.peek()
+        scheduler.pop(klass)
+    done = time.perf_counter()
+
+    stats = scheduler.stats()
+    return {"push_ns": round((pushed - start) / n * 1e9, 1),
+            "pop_ns": round((done - pushed) / n * 1e9, 1),
+            "dispatched": {name: c["dispatched"] for name, c in stats.items()},
+            "promoted": {name: c["promoted"] for name, c in stats.items()}}
+
+
+
+BENCHMARKS = {
+    "ws_decode": bench_ws_decode,
+    "ws_ack": bench_ws_ack,
+    "submit": bench_submit,
+    "sl_tick_to_exit": bench_sl_tick_to_exit,
+    "exit_all": bench_exit_all,
+    "metrics_overhead": bench_metrics_overhead,
+    "payload_build": bench_payload_build,
+    "journal": bench_journal,
+    "event_log": bench_event_log,
+    "scheduler": bench_scheduler,
+    "blotter": bench_blotter,
+    "basket": bench_basket,
+    "risk": bench_risk,
+    "reconcile": bench_reconcile,
+    "instruments": bench_instruments,
+    "startup": bench_startup,
+    "thread_submit": bench_thread_submit,
+    "ws_failover": bench_ws_failover,
+}
+
+
+def _run(name: str, size: int = 0) -> dict:
+    bench = BENCHMARKS[name]
+    result = bench(size) if size else bench()
+    if asyncio.iscoroutine(result):
+        result = asyncio.run(result)
+    return result
+
+
+def _meta() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "orjson": oms._json_loads is not json.loads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", default=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--orders", type=int, default=0, help="override each benchmark's size")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    random.seed(args.seed)
+
+    results = {"meta": _meta()}
+    for name in args.names:
+        results[name] = _run(name, args.orders)
+        print(f"{name}: {json.dumps(results[name])}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
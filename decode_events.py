@@ -0,0 +1,55 @@
+"""Render OMS binary event logs (oms_events_<user>_<date>.NNN.bin) as text.
+
+Usage: python decode_events.py FILE [FILE ...] [--order ID] [--event NAME ...] [--level LEVEL]
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+
+from omsflatradejiddi import EVENTS, EventLog
+
+LEVELS = {name: level for name, level in EVENTS}
+
+
+def format_record(ts: int, name: str, seq: int, order_id: int, num: int, value: float, b: str) -> str:
+    stamp = datetime.fromtimestamp(ts / 1e9).strftime("%H:%M:%S.%f")
+    level = logging.getLevelName(LEVELS.get(name, logging.INFO))
+    fields = [stamp, f"{level:<7}", f"{seq:>10}", f"{name:<16}"]
+    if order_id:
+        fields.append(str(order_id))
+    if b:
+        fields.append(b)
+    if num:
+        fields.append(f"n={num}")
+    if value:
+        fields.append(f"v={value:g}")
+    return " ".join(fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--order", help="Only records for this order id (or broker order id)")
+    parser.add_argument("--event", nargs="*", help="Only these event names")
+    parser.add_argument("--level", default="DEBUG", help="Minimum level, e.g. WARNING")
+    args = parser.parse_args()
+
+    min_level = logging.getLevelName(args.level.upper())
+    events = set(args.event or ())
+    try:
+        for path in sorted(args.files):
+            for ts, name, seq, order_id, num, value, b in EventLog.read(path):
+                if events and name not in events:
+                    continue
+                if LEVELS.get(name, logging.INFO) < min_level:
+                    continue
+                if args.order and args.order not in (str(order_id), b):
+                    continue
+                print(format_record(ts, name, seq, order_id, num, value, b))
+    except BrokenPipeError:
+        sys.stderr.close()
+
+
+if __name__ == "__main__":
+    main()
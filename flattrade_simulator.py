@@ -0,0 +1,498 @@
+"""Local Flattrade stand-in for SIMULATED runs and load tests.
+
+Serves the REST endpoints OrderManager talks to (order book, order status,
+modify, place) and the PiConnectWSTp stream (order updates "om" and
+touchline ticks "tk"/"tf") from one aiohttp app, with configurable latency
+distributions, fill models, rejects and per-endpoint rate limits.
+
+    sim = FlattradeSimulator(fill_model=FillModel("touch"), reject_rate=0.01)
+    await sim.start()
+    install(sim)                    # point OrderManager at the simulator
+    await OrderManager().start(SIM_CREDS)
+
+Run standalone with: python flattrade_simulator.py --port 8089
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qs
+
+import aiohttp
+from aiohttp import web
+
+import omsflatradejiddi as oms
+
+SIM_CREDS = {"USER": "SIMUSER", "PASSWORD": "", "API_KEY": "", "API_SECRET": ""}
+
+
+class LatencyModel:
+    """Samples a one-way delay in seconds: fixed, uniform or lognormal (ms params)"""
+    def __init__(self, kind: str = "fixed", ms: float = 0.0, sigma: float = 0.5,
+                 low_ms: float = 0.0, high_ms: float = 0.0):
+        self.kind = kind
+        self.ms = ms
+        self.sigma = sigma
+        self.low_ms = low_ms
+        self.high_ms = high_ms
+
+    def sample(self) -> float:
+        if self.kind == "uniform":
+            return random.uniform(self.low_ms, self.high_ms) / 1000
+        elif self.kind == "lognormal":
+            # ms is the median of the distribution
+            return random.lognormvariate(0.0, self.sigma) * self.ms / 1000
+        return self.ms / 1000
+
+    async def wait(self):
+        delay = self.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class FillModel:
+    """How accepted orders fill.
+
+    immediate: every order fills in full after `delay`.
+    touch:     MARKET fills at once; LIMIT fills when the simulated LTP
+               trades through the limit price.
+    manual:    orders rest until FlattradeSimulator.fill() is called.
+    A `partial_ratio` share of fills arrive in two pieces.
+    """
+    def __init__(self, mode: str = "immediate", delay: Optional[LatencyModel] = None,
+                 partial_ratio: float = 0.0):
+        self.mode = mode
+        self.delay = delay or LatencyModel()
+        self.partial_ratio = partial_ratio
+
+
+class _Bucket:
+    """Non-blocking token bucket; the simulator answers 429 instead of waiting"""
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def try_take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+# The order book reports price types as Noren codes, not the long forms placed
+NOREN_PRICE_TYPES = {"LIMIT": "LMT", "MARKET": "MKT", "SL": "SL-LMT", "SL-M": "SL-MKT"}
+
+
+class SimOrder:
+    __slots__ = ('id', 'tsym', 'exch', 'side', 'qty', 'filled_qty', 'price',
+                 'trigger', 'prctyp', 'status', 'tag', 'reason', 'created_at',
+                 'avg_price', 'fill_price')
+
+    def __init__(self, order_id: str, payload: dict):
+        self.id = order_id
+        self.tsym = payload.get("tsym", "")
+        self.exch = payload.get("exch", "")
+        self.side = payload.get("trantype", "B")
+        self.qty = int(payload.get("qty", 0))
+        self.filled_qty = 0
+        self.avg_price = 0.0
+        self.fill_price = 0.0  # Price of the latest fill
+        self.price = float(payload.get("prc") or 0)
+        self.trigger = float(payload.get("trigprc") or 0)
+        self.prctyp = payload.get("prctyp", "LIMIT")
+        self.status = "PENDING"
+        self.tag = payload.get("remarks") or payload.get("tag", "")
+        self.reason = ""
+        self.created_at = time.time()
+
+    def trade(self, quantity: int, price: float):
+        """Fill up to quantity in total at price"""
+        delta = quantity - self.filled_qty
+        self.avg_price = (self.avg_price * self.filled_qty + price * delta) / quantity
+        self.fill_price = price
+        self.filled_qty = quantity
+
+    def to_row(self) -> dict:
+        """Order-book row in the shape OrderManager._parse_order reads"""
+        return {
+            "orderid": self.id, "status": self.status, "ordertype": NOREN_PRICE_TYPES.get(self.prctyp, self.prctyp),
+            "filledqty": str(self.filled_qty), "price": str(self.price),
+            "avgprc": f"{self.avg_price:.2f}", "flprc": f"{self.fill_price:.2f}",
+            "quantity": str(self.qty), "tag": self.tag, "tsym": self.tsym,
+            "exch": self.exch, "trantype": self.side, "rejreason": self.reason,
+        }
+
+    def to_update(self) -> dict:
+        """PiConnect "om" order-update frame"""
+        return {
+            "t": "om", "n": self.id, "status": self.status, "filledqty": str(self.filled_qty),
+            "prc": str(self.price), "avgprc": f"{self.avg_price:.2f}", "flprc": f"{self.fill_price:.2f}", "qty": str(self.qty), "tsym": self.tsym, "exch": self.exch,
+            "trantype": self.side, "prctyp": self.prctyp, "remarks": self.tag,
+            "rejreason": self.reason,
+        }
+
+
+class FlattradeSimulator:
+    """In-process exchange + broker stand-in serving REST and WebSocket"""
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: Optional[Dict[str, LatencyModel]] = None,
+                 fill_model: Optional[FillModel] = None,
+                 reject_rate: float = 0.0,
+                 rate_limits: Optional[Dict[str, tuple]] = None,
+                 tick_interval: float = 0.05,
+                 start_price: float = 100.0,
+                 symbols: Optional[Dict[str, str]] = None,
+                 seed: Optional[int] = None):
+        self.host = host
+        self.port = port
+        # Per-endpoint latency: place, modify, query, ws (order-update push), ack (accept -> OPEN)
+        self.latency = {k: LatencyModel() for k in ("place", "modify", "query", "ws", "ack")}
+        self.latency.update(latency or {})
+        self.fill_model = fill_model or FillModel()
+        self.reject_rate = reject_rate
+        self._buckets = {k: _Bucket(*v) for k, v in (rate_limits or {}).items()}
+        self.tick_interval = tick_interval
+        self.start_price = start_price
+        self.symbols = symbols or {}  # tsym -> "EXCH|token", for touch fills
+        if seed is not None:
+            random.seed(seed)
+
+        self.orders: Dict[str, SimOrder] = {}
+        self.prices: Dict[str, float] = {}  # "EXCH|token" -> ltp
+        self.stats = {"placed": 0, "modified": 0, "cancelled": 0, "rejected": 0, "filled": 0,
+                      "throttled": 0, "ws_frames": 0}
+        self._ids = itertools.count(int(time.strftime("%y%m%d")) * 10**9)
+        self._clients: Dict[web.WebSocketResponse, None] = {}  # Authenticated, oldest first
+        self._subscriptions: Set[str] = set()
+        self._resting: Dict[str, SimOrder] = {}  # LIMIT orders waiting on a touch
+        self._runner: Optional[web.AppRunner] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    #region Lifecycle
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/PiConnectTP/PlaceOrder", self._handle_place)
+        app.router.add_get("/orders", self._handle_order_book)
+        app.router.add_get("/orders/{order_id}", self._handle_order_status)
+        app.router.add_put("/orders/{order_id}", self._handle_modify)
+        app.router.add_delete("/orders/{order_id}", self._handle_cancel)
+        app.router.add_get("/PiConnectWSTp/", self._handle_ws)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ticker = asyncio.create_task(self._tick_loop())
+        logging.info(f"Flattrade simulator listening on {self.base_url}")
+
+    async def stop(self):
+        if self._ticker:
+            self._ticker.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        for ws in list(self._clients):
+            await ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/PiConnectWSTp/"
+    #endregion
+
+    #region REST
+    def _throttled(self, endpoint: str) -> Optional[web.Response]:
+        bucket = self._buckets.get(endpoint)
+        if bucket is not None and not bucket.try_take():
+            self.stats["throttled"] += 1
+            return web.json_response({"stat": "Not_Ok", "status": "error",
+                                      "emsg": "Rate limit exceeded"}, status=429)
+        return None
+
+    async def _handle_place(self, request: web.Request) -> web.Response:
+        throttled = self._throttled("place")
+        if throttled:
+            return throttled
+        body = await request.text()
+        # Noren sends jData=<json>&jKey=<token>; plain JSON is accepted too
+        if body.startswith("jData="):
+            payload = json.loads(parse_qs(body)["jData"][0])
+        else:
+            payload = json.loads(body or "{}")
+        await self.latency["place"].wait()
+
+        order = SimOrder(str(next(self._ids)), payload)
+        self.orders[order.id] = order
+        self.stats["placed"] += 1
+        self._spawn(self._run_order(order))
+        return web.json_response({"stat": "Ok", "norenordno": order.id,
+                                  "request_time": time.strftime("%H:%M:%S %d-%m-%Y")})
+
+    async def _handle_order_book(self, request: web.Request) -> web.Response:
+        throttled = self._throttled("query")
+        if throttled:
+            return throttled
+        await self.latency["query"].wait()
+        return web.json_response({"status": "success",
+                                  "data": [o.to_row() for o in self.orders.values()]})
+
+    async def _handle_order_status(self, request: web.Request) -> web.Response:
+        throttled = self._throttled("query")
+        if throttled:
+            return throttled
+        await self.latency["query"].wait()
+        order = self.orders.get(request.match_info["order_id"])
+        if order is None:
+            return web.json_response({"status": "error", "emsg": "Order not found"}, status=404)
+        return web.json_response({"status": "success", "data": order.to_row()})
+
+    async def _handle_modify(self, request: web.Request) -> web.Response:
+        throttled = self._throttled("modify")
+        if throttled:
+            return throttled
+        payload = await request.json()
+        await self.latency["modify"].wait()
+        order = self.orders.get(request.match_info["order_id"])
+        if order is None or order.status != "OPEN":
+            return web.json_response({"status": "error", "emsg": "Order not open"})
+        order.price = float(payload.get("price") or order.price)
+        order.qty = int(payload.get("quantity") or order.qty)
+        self.stats["modified"] += 1
+        await self._publish(order)
+        self._check_touch(order)
+        return web.json_response({"status": "success", "result": order.id})
+
+    async def _handle_cancel(self, request: web.Request) -> web.Response:
+        throttled = self._throttled("modify")
+        if throttled:
+            return throttled
+        await self.latency["modify"].wait()
+        order = self.orders.get(request.match_info["order_id"])
+        if order is None or order.status != "OPEN":
+            return web.json_response({"status": "error", "emsg": "Order not open"})
+        self._resting.pop(order.id, None)
+        order.status = "CANCELED"
+        self.stats["cancelled"] += 1
+        await self._publish(order)
+        return web.json_response({"status": "success", "result": order.id})
+    #endregion
+
+    #region Order lifecycle
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_order(self, order: SimOrder):
+        await self.latency["ack"].wait()
+        if random.random() < self.reject_rate:
+            order.status = "REJECTED"
+            order.reason = "RMS: simulated reject"
+            self.stats["rejected"] += 1
+            await self._publish(order)
+            return
+
+        order.status = "OPEN"
+        await self._publish(order)
+        if self.fill_model.mode == "manual":
+            return
+        if self.fill_model.mode == "touch" and order.prctyp == "LIMIT":
+            self._resting[order.id] = order
+            self._check_touch(order)
+        else:
+            await self._fill(order)
+
+    async def _fill(self, order: SimOrder):
+        self._resting.pop(order.id, None)
+        await self.fill_model.delay.wait()
+        if order.status != "OPEN":
+            return
+        if order.qty > 1 and random.random() < self.fill_model.partial_ratio:
+            order.trade(order.qty // 2, self._trade_price(order))
+            await self._publish(order)
+            await self.fill_model.delay.wait()
+        order.trade(order.qty, self._trade_price(order))
+        order.status = "COMPLETE"
+        self.stats["filled"] += 1
+        await self._publish(order)
+
+    def _check_touch(self, order: SimOrder):
+        """Fill a resting LIMIT if the last price traded through it"""
+        if order.id not in self._resting:
+            return
+        ltp = self._ltp_for(order)
+        if ltp is None:
+            return
+        if (order.side == "B" and ltp <= order.price) or (order.side == "S" and ltp >= order.price):
+            self._spawn(self._fill(order))
+
+    def _trade_price(self, order: SimOrder) -> float:
+        """LIMITs trade at their price, everything else at the last price"""
+        if order.prctyp == "LIMIT" and order.price:
+            return order.price
+        ltp = self._ltp_for(order)
+        return ltp if ltp is not None else self.start_price
+
+    def _ltp_for(self, order: SimOrder) -> Optional[float]:
+        key = self.symbols.get(order.tsym)
+        return self.prices.get(key) if key else None
+
+    async def _publish(self, order: SimOrder):
+        await self._broadcast(order.to_update(), self.latency["ws"])
+    #endregion
+
+    #region WebSocket
+    async def _handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        try:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = json.loads(msg.data)
+                kind = data.get("t")
+                if kind == "c":
+                    self._clients[ws] = None
+                    await ws.send_str(json.dumps({"t": "ck", "s": "OK", "uid": data.get("uid")}))
+                elif kind in ("t", "d"):
+                    for key in filter(None, data.get("k", "").split("#")):
+                        self._subscriptions.add(key)
+                        ltp = self.prices.setdefault(key, self.start_price)
+                        exch, token = key.split("|", 1)
+                        await ws.send_str(json.dumps({
+                            "t": "tk" if kind == "t" else "dk", "e": exch, "tk": token,
+                            "lp": f"{ltp:.2f}", "bp1": f"{ltp - 0.05:.2f}", "sp1": f"{ltp + 0.05:.2f}",
+                        }))
+        finally:
+            self._clients.pop(ws, None)
+        return ws
+
+    async def _broadcast(self, frame: dict, latency: Optional[LatencyModel] = None):
+        if latency is not None:
+            await latency.wait()
+        message = json.dumps(frame)
+        for ws in list(self._clients):
+            try:
+                await ws.send_str(message)
+                self.stats["ws_frames"] += 1
+            except ConnectionResetError:
+                self._clients.pop(ws, None)
+
+    async def _tick_loop(self):
+        """Random-walk every subscribed instrument and push touchline updates"""
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            for key in list(self._subscriptions):
+                ltp = max(0.05, self.prices[key] + random.choice((-0.05, 0.0, 0.05)))
+                self.prices[key] = ltp
+                exch, token = key.split("|", 1)
+                await self._broadcast({"t": "tf", "e": exch, "tk": token, "lp": f"{ltp:.2f}",
+                                       "bp1": f"{ltp - 0.05:.2f}", "sp1": f"{ltp + 0.05:.2f}"})
+            for order in list(self._resting.values()):
+                self._check_touch(order)
+
+    async def fill(self, order_id: str):
+        """Fill a working order now, e.g. while the OMS is disconnected"""
+        await self._fill(self.orders[order_id])
+
+    async def drop_ws(self, count: int = 1):
+        """Close the oldest authenticated WebSocket connections, as a broker-side disconnect"""
+        for ws in list(self._clients)[:count]:
+            self._clients.pop(ws, None)
+            await ws.close(code=aiohttp.WSCloseCode.GOING_AWAY, message=b"simulated disconnect")
+
+    async def push_tick(self, key: str, ltp: float):
+        """Force a price print, e.g. to trip stop-losses in a benchmark"""
+        self.prices[key] = ltp
+        exch, token = key.split("|", 1)
+        await self._broadcast({"t": "tf", "e": exch, "tk": token, "lp": f"{ltp:.2f}"})
+        for order in list(self._resting.values()):
+            self._check_touch(order)
+    #endregion
+
+
+class SimulatedFlattradeAPI:
+    """Drop-in for FlattradeAPI that talks to a FlattradeSimulator"""
+    def __init__(self, sim: FlattradeSimulator, creds: dict, token: Optional[str] = None):
+        self.sim = sim
+        self.creds = creds
+        self.token = token
+        self.client = SimpleNamespace(cookies=[])
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def login(self):
+        self.token = f"SIM_{int(time.time())}"
+        return self.client
+
+    async def get_positions(self) -> List[dict]:
+        return []
+
+    async def place_order(self, **payload) -> dict:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=64))
+        data = f"jData={json.dumps(payload)}&jKey={self.token}"
+        async with self._session.post(f"{self.sim.base_url}/PiConnectTP/PlaceOrder", data=data) as resp:
+            return await resp.json()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class RemoteSimulatedFlattradeAPI(SimulatedFlattradeAPI):
+    """SimulatedFlattradeAPI for a simulator in another process, found via FLATTRADE_BASE_URL.
+
+    Picklable, so it can be handed to AccountSupervisor worker processes.
+    """
+    def __init__(self, creds: dict, token: Optional[str] = None):
+        super().__init__(SimpleNamespace(base_url=oms.FLATTRADE_BASE_URL), creds, token)
+
+
+def install(sim: FlattradeSimulator, order_manager=oms.OrderManager):
+    """Point the OMS REST/WebSocket endpoints and API client (class-wide, or one instance) at the simulator"""
+    oms.FLATTRADE_BASE_URL = sim.base_url
+    oms.FLATTRADE_WS_URL = sim.ws_url
+    order_manager.API_CLASS = lambda creds, token=None: SimulatedFlattradeAPI(sim, creds, token)
+    order_manager._token_file = os.path.join(tempfile.gettempdir(), "flattrade_sim_token.json")
+    order_manager.JOURNAL_DIR = tempfile.mkdtemp(prefix="oms_sim_journal_")
+    order_manager.EVENT_LOG_DIR = order_manager.JOURNAL_DIR
+
+
+async def _serve(args):
+    sim = FlattradeSimulator(
+        host=args.host, port=args.port,
+        latency={k: LatencyModel("lognormal", args.latency_ms) for k in ("place", "modify", "query", "ws")},
+        fill_model=FillModel(args.fill_model),
+        reject_rate=args.reject_rate,
+    )
+    await sim.start()
+    print(f"REST {sim.base_url}  WS {sim.ws_url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Flattrade simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="median one-way latency")
+    parser.add_argument("--fill-model", choices=("immediate", "touch"), default="immediate")
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(parser.parse_args()))
@@ -1,103 +1,339 @@
 import asyncio
+import csv
 import logging
 import time
 import json
 import hashlib
 import websockets
+import aiohttp
+import numpy as np
 import hmac
+import io
+import itertools
 import base64
+import mmap
+import struct
+import zlib
+import zipfile
+from array import array
 from collections import deque
 from datetime import datetime, timedelta, date
 import heapq
+import math
+import multiprocessing
 import threading
 import os
-from typing import Deque, Dict, List, Optional, Set, Tuple
+import random
+from typing import Deque, Dict, Iterator, List, Optional, Set, Tuple
 from api.flattrade_api import FlattradeAPI
 
+try:
+    import orjson
+    _json_loads = orjson.loads  # ~3x faster frame decode when available
+except ImportError:
+    _json_loads = json.loads
+
 # Constants
 ORDER_STATUS_REJECTED = "REJECTED"
 ORDER_STATUS_COMPLETE = "COMPLETE"
 ORDER_STATUS_OPEN = "OPEN"
+ORDER_STATUSES_TERMINAL = (ORDER_STATUS_REJECTED, ORDER_STATUS_COMPLETE)
 ORDER_TYPE_LIMIT = "LIMIT"
 ORDER_TYPE_SL = "SL"
 ORDER_TYPE_MARKET = "MARKET"
+DEFAULT_EXCHANGE = "NSE"  # KniteOrder.exchange unless the order names one
+# Broker order-book price types (Noren codes and the long forms) -> internal order types
+BROKER_ORDER_TYPES = {
+    "LMT": ORDER_TYPE_LIMIT, "L": ORDER_TYPE_LIMIT, ORDER_TYPE_LIMIT: ORDER_TYPE_LIMIT,
+    "MKT": ORDER_TYPE_MARKET, "M": ORDER_TYPE_MARKET, ORDER_TYPE_MARKET: ORDER_TYPE_MARKET,
+    "SL-LMT": ORDER_TYPE_SL, "SL-L": ORDER_TYPE_SL, ORDER_TYPE_SL: ORDER_TYPE_SL,
+    "SL-MKT": "SL-M", "SL-M": "SL-M",
+}
 RESTART_TYPE_DROP_ALL = "DROP_ALL"
 RESTART_TYPE_RECREATE_POS = "RECREATE_POS"
 
-# Flattrade API Constants
-FLATTRADE_BASE_URL = "https://api.flattrade.in"
-FLATTRADE_WS_URL = "wss://piconnect.flattrade.in/PiConnectWSTp/"
+# Journal record types
+REC_ORDER = 1       # KniteOrder snapshot after a state transition
+REC_CLOSE = 2       # Order settled, no longer working
+REC_SL_ADD = 3      # Stop-loss rested
+REC_SL_REMOVE = 4   # Stop-loss fired or cancelled
+REC_FILL = 5        # Fill applied to a position
+
+# Event log codes; EVENTS gives each one's name and level for the decoder and the logging fallback.
+# Record fields: order = KniteOrder.id, b = broker id / reason text, num = quantity or count, value = price or ms
+(EV_PLACED, EV_PLACE_REJECTED, EV_PLACE_ERROR, EV_RISK_REJECT, EV_BARRIER, EV_WS_CONNECTED,
+ EV_WS_PROMOTED, EV_WS_CLOSED, EV_WS_ERROR, EV_WS_RECONNECT, EV_WS_FRAME_DROPPED, EV_LOST,
+ EV_WS_AUTH_REJECTED) = range(13)
+EVENTS = (
+    ("placed", logging.INFO),
+    ("place_rejected", logging.ERROR),
+    ("place_error", logging.ERROR),
+    ("risk_reject", logging.WARNING),
+    ("barrier", logging.INFO),
+    ("ws_connected", logging.INFO),
+    ("ws_promoted", logging.INFO),
+    ("ws_closed", logging.WARNING),
+    ("ws_error", logging.ERROR),
+    ("ws_reconnect", logging.INFO),
+    ("ws_frame_dropped", logging.ERROR),
+    ("lost", logging.WARNING),  # Written by the event log writer: num records dropped on a full ring
+    ("ws_auth_rejected", logging.ERROR),
+)
+
+# Order loop stages, in the order they are serviced on each wakeup
+STAGE_OPEN = "OPEN"          # WebSocket order updates waiting to be applied
+STAGE_POLL = "POLL"          # REST status reconciliation deadline
+STAGE_NEW = "NEW"            # Orders queued for placement
+STAGE_ERRORED = "ERRORED"    # Errored order recovery / timeout deadline
+STAGE_SL = "SL"              # Stop-loss triggers
+STAGE_COMMAND = "COMMAND"    # External commands (ExitAll)
+STAGE_ORDER = (STAGE_OPEN, STAGE_POLL, STAGE_NEW, STAGE_ERRORED, STAGE_SL, STAGE_COMMAND)
+
+# Rate-limit lanes and priorities (lower value is served first)
+LANE_PLACE = "place"
+LANE_MODIFY = "modify"
+LANE_CANCEL = "cancel"
+LANE_QUERY = "query"
+PRIORITY_EXIT = 0
+PRIORITY_NORMAL = 1
+
+# Placement scheduler classes (lower value is served first)
+SCHED_PANIC, SCHED_SL_EXIT, SCHED_EXIT, SCHED_AMEND, SCHED_ENTRY = range(5)
+SCHED_CLASS_NAMES = ("panic", "sl_exit", "exit", "amend", "entry")
+
+# Cross-thread inbox message kinds
+INBOX_ORDER, INBOX_ORDERS, INBOX_EXIT_ALL, INBOX_COMMAND = range(4)
+
+# Order lifecycle timestamps (perf_counter_ns) and the spans built from them
+TS_ENQUEUE, TS_DEQUEUE, TS_PAYLOAD, TS_RATE_LIMIT, TS_RESPONSE, TS_ACK = range(6)
+LATENCY_SPANS = {
+    "queue_wait": (TS_ENQUEUE, TS_DEQUEUE),
+    "payload_build": (TS_DEQUEUE, TS_PAYLOAD),
+    "rate_limit": (TS_PAYLOAD, TS_RATE_LIMIT),
+    "http_rtt": (TS_RATE_LIMIT, TS_RESPONSE),
+    "ws_ack": (TS_RESPONSE, TS_ACK),
+    "submit_to_ack": (TS_ENQUEUE, TS_ACK),
+}
+
+# Flattrade API Constants (overridable to point at a local simulator)
+FLATTRADE_BASE_URL = os.environ.get("FLATTRADE_BASE_URL", "https://api.flattrade.in")
+FLATTRADE_WS_URL = os.environ.get("FLATTRADE_WS_URL", "wss://piconnect.flattrade.in/PiConnectWSTp/")
 
 class OrderManager:
-    # Shared state
-    _lock = threading.RLock()
-    _open_orders: Dict[str, 'KniteOrder'] = {}
-    _sl_orders: Deque['KniteOrder'] = deque()
-    _orders_to_place: Deque['KniteOrder'] = deque()
-    _errored_orders: List['KniteOrder'] = []
-    _orphaned_orders: List['KniteOrder'] = []
-    _export_orders_str = ""
-
-    # Flattrade connection
-    _session = None
-    _api = None
-    _access_token = None
-    _user_id = None
-    _http_client = None  # To store the authenticated httpx client
-    _token_file = "flattrade_token.json"
-    _ws = None
-    _last_request_time = 0
-    RATE_LIMIT = 0.1  # 100ms between requests
+    """One Flattrade account: its session, WebSocket, queues and token cache.
+
+    Configuration lives on the class and can be overridden per instance;
+    AccountSupervisor runs several instances across worker processes.
+    """
+    API_CLASS = FlattradeAPI  # Swapped for SimulatedFlattradeAPI in offline runs
+    TOKEN_FILE = "flattrade_token_{user}.json"  # Per-account token cache
+    _token_file: Optional[str] = None  # Resolved from TOKEN_FILE at login unless set
+    # (requests per second, burst) per endpoint lane, sized to Flattrade's API limits
+    RATE_LIMITS = {
+        LANE_PLACE: (10.0, 10),
+        LANE_MODIFY: (10.0, 10),
+        LANE_CANCEL: (10.0, 10),
+        LANE_QUERY: (5.0, 5),
+    }
+    HTTP_POOL_SIZE = 16  # Keep-alive connections shared by REST calls
+    WS_RECONNECT_BASE_SEC = 0.01  # Backoff cap after a drop; doubles per failed attempt, full jitter
+    WS_RECONNECT_MAX_SEC = 5.0
+    WS_STABLE_SEC = 5.0  # Backoff resets once the broker acks the login, or the link stays up this long
+    WS_STANDBY = False  # Keep a second authenticated WebSocket to promote when the primary drops
+    STATUS_FANOUT = 8  # Max concurrent per-order status GETs on fallback
 
     # Configuration
     SIMULATED = False
-    SEC_TOUT = 0.001  # 1ms for low-latency
+    OPEN_ORDER_POLL_SEC = 1.0  # REST backstop for missed WebSocket updates
+    ERROR_ORDER_POLL_SEC = 0.5
     ERROR_ORDER_TIMEOUT_SEC = 5
+    ORPHAN_POLL_SEC = 5.0  # Timed-out orders are still looked for at the broker at this pace
+    ORPHAN_TTL_SEC = 300  # ...until they are this old
+    RECON_MAX_AGE_SEC = 0.25  # Reconciliation passes this close together share one order-book snapshot
     BLOCK_ALL_ORDERS = False
+    SL_FIRE_LIMIT_PCT: Optional[float] = None  # Fired stops go out as MARKET; set to send a LIMIT this % through the LTP
+    SUBMIT_WINDOW = 32  # Max concurrent place_order calls
+    METRICS_ENABLED = True
+    TRADED_SYMBOLS: List[str] = []  # Payload templates are prebuilt for these at SOD
+    JOURNAL_ENABLED = True
+    JOURNAL_DIR = "."
+    JOURNAL_FSYNC_SEC = 0.005  # Group-commit window
+    BLOTTER_CAPACITY = 1 << 14  # Session orders preallocated in the blotter; doubles when full
+    EVENT_LOG_ENABLED = True  # Hot-path log lines go to a binary ring drained by a writer thread
+    EVENT_LOG_DIR = "."
+    EVENT_LOG_CAPACITY = 1 << 16  # Records buffered between writer passes
+    EVENT_LOG_FLUSH_SEC = 0.05
+    EVENT_LOG_FILE_BYTES = 64 * 1024 * 1024  # Rotate to a new file past this size
+    MARKET_DATA_DEPTH = False  # Subscribe to depth ("d") instead of touchline ("t")
+    MD_STALE_SEC = 2.0  # Cached prices older than this are treated as missing
+    LIMIT_REPRICE_MAX_TICKS = 0  # Working LIMITs chase the touch up to this many ticks from their placed price; 0 leaves them alone
+    RISK_LIMITS = {
+        "max_qty": 10_000,              # Per order, absolute
+        "max_notional": 10_000_000.0,   # Per order, qty * price
+        "max_position": 50_000,         # Net position plus working orders, per instrument
+        "price_band_pct": 0.05,         # Fat-finger band around the cached LTP
+        "max_orders_per_sec": 100,      # New entries accepted per second, all instruments
+    }
+    RISK_INSTRUMENT_LIMITS: Dict[str, dict] = {}  # instrument key -> overrides of RISK_LIMITS
+    INSTRUMENT_DIR = "."  # Compiled index (and downloaded scrip masters) live here
+    SCRIP_MASTER_FILES: List[str] = []  # Local scrip master CSV/TXT files, optionally zipped
+    SCRIP_MASTER_URLS: List[str] = []  # Fetched when there is no index for today yet
+    STARTUP_BUDGET_SEC = 3.0  # Launch to dispatching orders; slower optional warm-up steps finish in the background
+    HTTP_PREWARM_CONNECTIONS = 4
 
-    @classmethod
-    async def start(cls, creds: dict):
+    def __init__(self, **config):
+        for name, value in config.items():
+            if not hasattr(type(self), name):
+                raise AttributeError(f"Unknown OrderManager setting {name}")
+            setattr(self, name, value)
+
+        # Order state; only the event loop thread touches it, other threads go through _post()
+        self._open_orders: Dict[str, 'KniteOrder'] = {}
+        self._sl_orders: Dict[str, 'SlTriggerBook'] = {}  # instrument key -> resting stops
+        self._sl_by_parent: Dict[int, 'KniteOrder'] = {}
+        self._triggered_sl_orders: Deque['KniteOrder'] = deque()
+        self._scheduler: 'OrderScheduler' = None  # Orders and amends waiting to go out, by class
+        self._errored_orders: List['KniteOrder'] = []
+        self._orphaned_orders: List['KniteOrder'] = []  # Timed out unconfirmed; adopted if the broker has them
+        self._book = OrderBookCache()
+        self._book_refresh: Optional[asyncio.Future] = None
+        self._inflight: Set[asyncio.Task] = set()  # Placements on the wire
+        self._export_orders_str = ""
+        self._cts = asyncio.Event()
+        self._live_pos_mgr = None
+
+        # Cross-thread handoff: any thread appends (deque ops are atomic), the loop drains in batches
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._inbox: Deque[Tuple[int, object, int]] = deque()  # (INBOX_*, payload, perf_counter_ns posted)
+        self._inbox_scheduled = False
+
+        # Event-driven scheduling
+        self._wakeup = asyncio.Event()
+        self._pending_stages: Set[str] = set()
+        self._deadlines: Dict[str, float] = {}  # stage -> time.monotonic() due
+        self._ws_updates: Dict[str, 'Order'] = {}
+        self._ws_handlers = {  # WebSocket message type ("t") -> handler
+            "ck": self._on_ws_auth,
+            "om": self._on_order_update,
+            "tk": self._on_tick,
+            "tf": self._on_tick,
+            "dk": self._on_tick,
+            "df": self._on_tick,
+        }
+
+        # Market data
+        self._md_cache: 'MarketDataCache' = None
+        self._md_subscriptions: Set[str] = set()
+
+        # Order amends: at most one modify in flight per order, newer targets coalesce
+        self._amend_inflight: Set[int] = set()
+        self._amend_pending: Dict[int, float] = {}
+        self._amend_stats = {"sent": 0, "failed": 0, "coalesced": 0, "suppressed": 0,
+                             "latency_sec_total": 0.0, "latency_sec_max": 0.0}
+
+        # Hot-path latency metrics keyed by KniteOrder.id
+        self._order_ts: Dict[int, List[int]] = {}
+        self._latency_hist: Dict[str, 'LatencyHistogram'] = {}
+
+        # Write-ahead order journal
+        self._journal: 'OrderJournal' = None
+        self._journal_flusher: Optional[asyncio.TimerHandle] = None  # Armed by the first append after a commit
+        self._journal_sync: Optional[asyncio.Future] = None  # Commit running on the executor
+        self._event_log: Optional['EventLog'] = None
+        self._orders: Optional['OrderStore'] = None  # Columnar blotter, created at SOD
+
+        # Place-order payload templates: (user, exchange, symbol, product, order type) -> static fields
+        self._payload_templates: Dict[Tuple, dict] = {}
+
+        # Pre-trade risk tables, rebuilt at SOD
+        self._risk: 'RiskEngine' = None
+
+        # Scrip master compiled into a memory-mapped index at SOD
+        self._instruments: 'InstrumentMaster' = None
+
+        # Startup warm-up
+        self._launched_at = 0.0  # perf_counter() when start() was called
+        self._startup_timeline: Dict[str, Tuple[float, float]] = {}  # step -> (begin ms, end ms) since launch
+        self._startup_order_book: List[dict] = []
+        self._token_verified = False
+        self._token_ready = asyncio.Event()  # WebSocket auth waits for a validated token
+        self._ws_connected = asyncio.Event()
+        self._ready = asyncio.Event()  # Set once orders are being dispatched
+
+        # Flattrade connection
+        self._session = None
+        self._api = None
+        self._access_token = None
+        self._user_id = None
+        self._http_client = None  # To store the authenticated httpx client
+        self._ws = None
+        self._ws_standby: Optional[Tuple[object, asyncio.Task]] = None  # (connection, idle reader)
+        self._ws_down_at = 0.0  # perf_counter() of the drop being recovered, 0 while connected
+        self._ws_authed = False  # Broker acknowledged the current connection's login
+        self._ws_stats = {"disconnects": 0, "failovers": 0, "gap_fills": 0, "last_outage_ms": 0.0}
+        self._rate_limits: Dict[str, 'TokenBucket'] = {}
+
+    async def start(self, creds: dict, restart_type: Optional[str] = None):
         """Main order processing loop"""
         logging.info("Starting OrderManager for Flattrade")
-        await cls.authenticate(creds)
-        cls._live_pos_mgr = PositionMgr()
-        await cls.sod()
-        
-        # Start WebSocket listener
-        asyncio.create_task(cls._ws_listener())
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._launched_at = time.perf_counter()
+        self._startup_timeline.clear()
+        await self._timed("authenticate", self.authenticate(creds))
+        self._ensure_session()
+        self._live_pos_mgr = PositionMgr()
+        await self.warm_up(creds, restart_type)
         
-        while not cls._cts.is_set():
-            start_time = time.perf_counter()
-            
-            # Process all order types with priority
-            await cls.process_open_orders()
-            await cls.process_new_orders()
-            await cls.process_errored_orders()
-            await cls.process_sl_orders()
-            
+        while not self._cts.is_set():
+            # Sleep until a stage is signalled or its deadline expires
+            if not self._pending_stages:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._next_deadline_in())
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            stages = self._collect_due_stages()
+
+            # Service only the stages that have work, in priority order
+            if STAGE_OPEN in stages:
+                await self.process_ws_updates()
+            if STAGE_POLL in stages:
+                await self.process_open_orders()
+            if STAGE_NEW in stages:
+                await self.process_new_orders()
+            if STAGE_ERRORED in stages:
+                await self.process_errored_orders()
+            if STAGE_SL in stages:
+                await self.process_sl_orders()
+
             # Handle high-priority commands
-            if cls._export_orders_str == "ExitAll":
-                cls.exit_all_orders()
-            
-            # Maintain tight loop timing
-            elapsed = time.perf_counter() - start_time
-            await asyncio.sleep(max(0, cls.SEC_TOUT - elapsed))
+            if self._export_orders_str == "ExitAll":
+                self._export_orders_str = ""
+                self.exit_all_orders()
 
-    @classmethod
-    async def stop(cls):
+    async def stop(self):
         """Graceful shutdown"""
-        cls._cts.set()
-        await cls.eod()
+        self._cts.set()
+        self._wakeup.set()
+        await self.eod()
 
-    @classmethod
-    async def authenticate(cls, creds: dict):
+    def submit_command(self, command: str):
+        """Post an external command (e.g. "ExitAll") to the order loop"""
+        self._export_orders_str = command
+        self._signal(STAGE_COMMAND)
+
+    async def authenticate(self, creds: dict):
         """Authenticate with Flattrade, using a cached token if available."""
         today = date.today().isoformat()
         cached_token = None
+        if self._token_file is None:
+            self._token_file = self.TOKEN_FILE.format(user=creds['USER'])
 
         # Check for a cached token
-        if os.path.exists(cls._token_file):
-            with open(cls._token_file, 'r') as f:
+        if os.path.exists(self._token_file):
+            with open(self._token_file, 'r') as f:
                 try:
                     token_data = json.load(f)
                     if token_data.get("date") == today:
@@ -106,488 +342,1587 @@ class OrderManager:
                 except (json.JSONDecodeError, FileNotFoundError):
                     logging.warning("Could not read cached Flattrade token file.")
 
-        # Try to authenticate with the cached token
+        # Use the cached token; warm_up() validates it alongside the other SOD steps
         if cached_token:
-            cls._api = FlattradeAPI(creds, token=cached_token)
-            # Verify token by making a lightweight API call
-            # positions = await cls._api.get_positions() # Bypassing for debugging
-            # if positions is not None and isinstance(positions, list):
-            if True: # Assume token is valid for now
-                logging.info("Flattrade authentication successful using cached token (validation bypassed).")
-                cls._http_client = cls._api.client
-                cls._access_token = cls._api.token
-                cls._user_id = creds['USER']
-                return  # Success
+            self._api = self.API_CLASS(creds, token=cached_token)
+            self._http_client = self._api.client
+            self._access_token = self._api.token
+            self._user_id = creds['USER']
+            self._token_verified = False
+            logging.info("Using cached Flattrade token; validating during warm-up.")
+            return
 
-            logging.warning("Cached Flattrade token is invalid or expired. Re-authenticating.")
+        await self._login(creds)
 
-        # Full login if no valid cached token
-        cls._api = FlattradeAPI(creds)
-        client = await cls._api.login()
+    async def _login(self, creds: dict):
+        """Full Flattrade login, caching the new token for the rest of the day"""
+        today = date.today().isoformat()
+        self._api = self.API_CLASS(creds)
+        client = await self._api.login()
         if client:
-            cls._http_client = client
-            cls._access_token = cls._api.token
-            cls._user_id = creds['USER']
+            self._http_client = client
+            self._access_token = self._api.token
+            self._user_id = creds['USER']
+            self._token_verified = True
             logging.info("Flattrade authentication successful via FlattradeAPI.")
 
             # Cache the new token
-            with open(cls._token_file, 'w') as f:
-                json.dump({"token": cls._access_token, "date": today}, f)
-                logging.info(f"Cached new Flattrade token to {cls._token_file}")
+            with open(self._token_file, 'w') as f:
+                json.dump({"token": self._access_token, "date": today}, f)
+                logging.info(f"Cached new Flattrade token to {self._token_file}")
         else:
             raise ConnectionError("Authentication failed via FlattradeAPI")
 
-    @classmethod
-    async def _rate_limiter(cls):
-        """Ensure we don't exceed API rate limits"""
-        elapsed = time.perf_counter() - cls._last_request_time
-        if elapsed < cls.RATE_LIMIT:
-            await asyncio.sleep(cls.RATE_LIMIT - elapsed)
-        cls._last_request_time = time.perf_counter()
+    def _ensure_session(self):
+        """Create the pooled keep-alive HTTP session used for REST calls"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.HTTP_POOL_SIZE, ttl_dns_cache=300)
+            )
 
-    @classmethod
-    async def _ws_listener(cls):
-        """WebSocket listener using a custom protocol factory for header injection."""
-        cookie_header = "; ".join([f"{c.name}={c.value}" for c in cls._http_client.cookies])
-        
-        class CustomClientProtocol(websockets.client.ClientProtocol):
-            async def write_http_request(self, path, headers):
-                headers['Cookie'] = cookie_header
-                await super().write_http_request(path, headers)
+    async def _rate_limiter(self, lane: str = LANE_QUERY, priority: int = PRIORITY_NORMAL):
+        """Wait for a token on the endpoint's lane; exits jump the queue"""
+        bucket = self._rate_limits.get(lane)
+        if bucket is None:
+            rate, burst = self.RATE_LIMITS[lane]
+            bucket = self._rate_limits[lane] = TokenBucket(rate, burst)
+        await bucket.acquire(priority)
+
+    #region Journal
+    def _open_journal(self, restart_type: Optional[str]):
+        """Open today's journal, replaying it first when restarting mid-session"""
+        if not self.JOURNAL_ENABLED:
+            return
+        path = os.path.join(self.JOURNAL_DIR, f"oms_journal_{self._user_id}_{date.today().isoformat()}.bin")
+        self._journal = OrderJournal(path)
+        if restart_type is not None:
+            self.recover(restart_type)
+
+    def _open_event_log(self):
+        """Start today's binary event log and its writer thread"""
+        if not self.EVENT_LOG_ENABLED or self._event_log is not None:
+            return
+        prefix = os.path.join(self.EVENT_LOG_DIR, f"oms_events_{self._user_id}_{date.today().isoformat()}")
+        self._event_log = EventLog(prefix, self.EVENT_LOG_CAPACITY, self.EVENT_LOG_FLUSH_SEC,
+                                   self.EVENT_LOG_FILE_BYTES)
+
+    def _event(self, code: int, order_id: int = 0, b: str = "", num: int = 0, value: float = 0.0):
+        """Hot-path log line: one record into the ring, or a lazy logging call when the event log is off"""
+        event_log = self._event_log
+        if event_log is not None:
+            event_log.emit(code, order_id, b, num, value)
+        else:
+            name, level = EVENTS[code]
+            logging.log(level, "%s %s %s %s %s", name, order_id, b, num, value)
+
+    def _arm_journal_flush(self):
+        """Group commit: the first append after a commit schedules one msync a window later"""
+        if self._journal_flusher is None and self._loop is not None:
+            self._journal_flusher = self._loop.call_later(self.JOURNAL_FSYNC_SEC, self._flush_journal)
+
+    def _flush_journal(self):
+        """Commit everything appended in the window, off-loop"""
+        self._journal_flusher = None
+        journal = self._journal
+        if journal is not None and journal.dirty:
+            self._journal_sync = self._loop.run_in_executor(None, journal.sync)
+
+    def _journal_order(self, order: 'KniteOrder', rec_type: int = REC_ORDER):
+        # Every state transition comes through here; keep the blotter row in step
+        if self._orders is not None:
+            self._orders.sync(order)
+        if self._journal is not None:
+            self._journal.append_order(rec_type, order)
+            self._arm_journal_flush()
+
+    def _journal_id(self, rec_type: int, order_id: str):
+        if self._journal is not None:
+            self._journal.append_id(rec_type, order_id)
+            self._arm_journal_flush()
+
+    def recover(self, restart_type: str):
+        """Rebuild OMS state from the journal after a crash"""
+        start = time.perf_counter()
+        state = self._journal.replay()
+        self._live_pos_mgr.restore(state.fills)
+        self._live_pos_mgr.legs.update(state.legs)
+        self.risk().restore(self._live_pos_mgr)
+
+        if restart_type == RESTART_TYPE_RECREATE_POS:
+            for broker_id, order in state.open_orders.items():
+                self._open_orders[broker_id] = order
+                self.risk().track(order)
+            for sl_order in state.sl_orders:
+                self.add_sl_order(sl_order)
+            if self._open_orders:
+                self._schedule(STAGE_POLL, 0)  # Reconcile against the broker straight away
+        elif state.open_orders or state.sl_orders:
+            # DROP_ALL keeps positions only: close working orders and stops in the journal so a
+            # later RECREATE_POS does not resurrect them, and cancel the orders at the broker
+            logging.warning(f"Dropping {len(state.open_orders)} open and "
+                            f"{len(state.sl_orders)} stop orders from the previous session")
+            for order in state.open_orders.values():
+                self._journal_id(REC_CLOSE, order.id)
+            for sl_order in state.sl_orders:
+                self._journal_id(REC_SL_REMOVE, sl_order.id)
+            if state.open_orders:
+                asyncio.create_task(self._cancel_dropped(list(state.open_orders.values())))
+
+        logging.info(f"Recovered {state.records} journal records ({restart_type}) in "
+                     f"{(time.perf_counter() - start) * 1000:.2f}ms: {len(state.open_orders)} open, "
+                     f"{len(state.sl_orders)} stops, {len(state.positions)} positions")
+        return state
+
+    async def _cancel_dropped(self, orders: List['KniteOrder']):
+        """Cancel the working orders a DROP_ALL restart abandoned"""
+        results = await asyncio.gather(*(self.cancel_order(order) for order in orders),
+                                       return_exceptions=True)
+        live = [order.broker_order_id for order, ok in zip(orders, results) if ok is not True]
+        if live:
+            logging.error(f"DROP_ALL could not cancel {len(live)} orders; still live at the broker: {live}")
+    #endregion
+
+    #region Metrics
+    def _stamp(self, order: 'KniteOrder', point: int):
+        """Record a lifecycle timestamp for an order (a dict hit and a list store)"""
+        if not self.METRICS_ENABLED:
+            return
+        ts = self._order_ts.get(order.id)
+        if ts is None:
+            ts = self._order_ts[order.id] = [0, 0, 0, 0, 0, 0]
+        ts[point] = time.perf_counter_ns()
+
+    def _close_timeline(self, order: 'KniteOrder'):
+        """Fold an order's timestamps into the per-stage histograms"""
+        ts = self._order_ts.pop(order.id, None)
+        if ts is None:
+            return
+        for span, (begin, end) in LATENCY_SPANS.items():
+            if ts[begin] and ts[end] >= ts[begin]:
+                hist = self._latency_hist.get(span)
+                if hist is None:
+                    hist = self._latency_hist[span] = LatencyHistogram()
+                hist.record(ts[end] - ts[begin])
+
+    def metrics_snapshot(self) -> dict:
+        """Per-stage latency percentiles plus rate-limit and amend counters"""
+        return {
+            "latency_us": {span: hist.summary() for span, hist in self._latency_hist.items()},
+            "rate_limits": self.rate_limit_stats(),
+            "amends": self.amend_stats(),
+            "open_orders": len(self._open_orders),
+            "queued_orders": len(self.scheduler()),
+            "risk": self.risk().stats(),
+            "blotter": self.order_store().stats(),
+            "websocket": self.ws_stats(),
+            "event_log": self._event_log.stats() if self._event_log is not None else None,
+            "reconciliation": dict(self._book.stats(), errored=len(self._errored_orders),
+                                   orphaned=len(self._orphaned_orders)),
+            "startup": self.startup_report(),
+            "scheduler": self.scheduler().stats(),
+        }
+
+    def metrics_text(self) -> str:
+        """Prometheus text exposition of the latency histograms"""
+        lines = []
+        for span, hist in self._latency_hist.items():
+            for q, value in hist.quantiles_us((0.5, 0.9, 0.99, 0.999)):
+                lines.append(f'oms_latency_us{{stage="{span}",quantile="{q}"}} {value}')
+            lines.append(f'oms_latency_us_count{{stage="{span}"}} {hist.count}')
+            lines.append(f'oms_latency_us_sum{{stage="{span}"}} {hist.total / 1000:.1f}')
+        for lane, stats in self.rate_limit_stats().items():
+            lines.append(f'oms_rate_limit_throttled_sec{{lane="{lane}"}} {stats["throttled_sec"]:.6f}')
+        for name, stats in self.scheduler().stats().items():
+            lines.append(f'oms_queue_depth{{class="{name}"}} {stats["depth"]}')
+            lines.append(f'oms_queue_wait_us{{class="{name}",quantile="0.99"}} {stats["wait_us"]["p99"]}')
+        return "\n".join(lines) + "\n"
 
-        while not cls._cts.is_set():
+    async def dump_metrics(self, path: str):
+        """Write a JSON metrics snapshot from a worker thread"""
+        snapshot = self.metrics_snapshot()
+
+        def write():
+            with open(path, "w") as f:
+                json.dump(snapshot, f, indent=2)
+
+        await asyncio.get_running_loop().run_in_executor(None, write)
+
+    async def serve_metrics(self, port: int, host: str = "127.0.0.1") -> 'aiohttp.web.AppRunner':
+        """Expose /metrics (Prometheus text) and /metrics.json for scraping"""
+        from aiohttp import web
+
+        async def text(request):
+            return web.Response(text=self.metrics_text())
+
+        async def snapshot(request):
+            return web.json_response(self.metrics_snapshot())
+
+        app = web.Application()
+        app.router.add_get("/metrics", text)
+        app.router.add_get("/metrics.json", snapshot)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+    #endregion
+
+    def rate_limit_stats(self) -> Dict[str, dict]:
+        """Time spent throttled per rate-limit lane"""
+        return {
+            lane: {
+                "throttled_sec": bucket.throttled_sec,
+                "throttled_count": bucket.throttled_count,
+                "waiting": len(bucket._waiters),
+            }
+            for lane, bucket in self._rate_limits.items()
+        }
+
+    #region Scheduling
+    def _signal(self, stage: str):
+        """Wake the order loop for a stage that has work"""
+        self._pending_stages.add(stage)
+        self._wakeup.set()
+
+    def _schedule(self, stage: str, delay: float):
+        """Arm a deadline for a stage, keeping the earliest one"""
+        due = time.monotonic() + delay
+        if due < self._deadlines.get(stage, float("inf")):
+            self._deadlines[stage] = due
+            # Let the loop recompute its sleep timeout
+            self._wakeup.set()
+
+    def _next_deadline_in(self) -> Optional[float]:
+        """Seconds until the earliest stage deadline, None if no timer is armed"""
+        if not self._deadlines:
+            return None
+        return max(0.0, min(self._deadlines.values()) - time.monotonic())
+
+    def _collect_due_stages(self) -> Set[str]:
+        """Take signalled stages plus any whose deadline has expired"""
+        stages = self._pending_stages
+        self._pending_stages = set()
+        now = time.monotonic()
+        for stage, due in list(self._deadlines.items()):
+            if due <= now:
+                del self._deadlines[stage]
+                stages.add(stage)
+        return stages
+    #endregion
+
+    async def _ws_listener(self):
+        """Primary WebSocket: promotes the hot standby on a drop, else reconnects with jittered backoff"""
+        if self.WS_STANDBY:
+            asyncio.create_task(self._ws_standby_keeper())
+        attempt = 0
+        while not self._cts.is_set():
+            ws = None
+            up_since = 0.0
+            self._ws_authed = False
             try:
-                async with websockets.connect(FLATTRADE_WS_URL, create_protocol=lambda: CustomClientProtocol()) as ws:
-                    cls._ws = ws
-                    logging.info("Flattrade WebSocket connected. Authenticating...")
-
-                    # Authenticate WebSocket session
-                    await ws.send(json.dumps({
-                        "t": "c",
-                        "uid": cls._user_id,
-                        "actid": cls._user_id,
-                        "susertoken": cls._access_token
-                    }))
-
-                    # Listen for messages
-                    while not cls._cts.is_set():
-                        message = await ws.recv()
-                        data = json.loads(message)
-                        await cls._handle_ws_message(data)
+                ws = await self._take_standby()
+                if ws is not None:
+                    self._ws_stats["failovers"] += 1
+                    self._event(EV_WS_PROMOTED)
+                else:
+                    ws = await self._ws_open()
+                    self._event(EV_WS_CONNECTED)
+                self._ws = ws
+
+                # Resubscribe market data for instruments we trade
+                if self._md_subscriptions:
+                    await self._send_subscriptions(list(self._md_subscriptions))
+                self._ws_connected.set()
+                up_since = time.monotonic()
+                if self._ws_down_at:
+                    self._ws_gap_fill()
+                await self._ws_read(ws)
+                if not self._cts.is_set():
+                    self._event(EV_WS_CLOSED, b="closed by peer")
 
             except websockets.exceptions.ConnectionClosed as e:
-                logging.warning(f"WebSocket connection closed: {e}")
+                self._event(EV_WS_CLOSED, b=str(e))
             except Exception as e:
-                logging.error(f"WebSocket error: {e}")
+                self._event(EV_WS_ERROR, b=str(e))
             finally:
-                cls._ws = None
-                if not cls._cts.is_set():
-                    logging.info("Reconnecting WebSocket in 5 seconds...")
-                    await asyncio.sleep(5)
+                self._ws = None
+                self._ws_connected.clear()
+                if ws is not None:
+                    await ws.close()
+                if not self._cts.is_set():
+                    # Only a link that really came up ends the escalation, not one dropped after login
+                    if self._ws_authed or (up_since and time.monotonic() - up_since >= self.WS_STABLE_SEC):
+                        attempt = 0
+                    if not self._ws_down_at:
+                        self._ws_down_at = time.perf_counter()
+                        self._ws_stats["disconnects"] += 1
+                    if self._ws_standby is not None:
+                        delay = 0.0
+                    else:
+                        delay = self._ws_backoff(attempt)
+                        attempt += 1
+                    self._event(EV_WS_RECONNECT, num=attempt, value=delay * 1000)
+                    await asyncio.sleep(delay)
 
-    @classmethod
-    async def _handle_ws_message(cls, data: dict):
-        """Process WebSocket messages"""
-        if data.get("t") == "om":
-            # Order update message
-            order_id = data.get("n")
-            status = data.get("status")
-            filled_qty = int(data.get("filledqty", "0"))
-            
-            if order_id in cls._open_orders:
-                knite_order = cls._open_orders[order_id]
-                knite_order.filled_qty = filled_qty
-                
-                if status in ["REJECTED", "CANCELLED"]:
-                    knite_order.status = ORDER_STATUS_REJECTED
-                elif status == "COMPLETE":
-                    knite_order.status = ORDER_STATUS_COMPLETE
-                elif status in ["OPEN", "PENDING"]:
-                    knite_order.status = ORDER_STATUS_OPEN
+    async def _ws_open(self):
+        """Connect and authenticate one WebSocket carrying the REST session cookies"""
+        # Rebuilt per attempt: a re-login during warm-up replaces the session cookies
+        cookie_header = "; ".join([f"{c.name}={c.value}" for c in self._http_client.cookies])
+        ws = await websockets.connect(FLATTRADE_WS_URL, additional_headers={"Cookie": cookie_header})
+        try:
+            await self._token_ready.wait()  # Connect in parallel, authenticate with a good token
+            await ws.send(json.dumps({
+                "t": "c",
+                "uid": self._user_id,
+                "actid": self._user_id,
+                "susertoken": self._access_token
+            }))
+        except BaseException:
+            await ws.close()
+            raise
+        return ws
+
+    async def _ws_read(self, ws):
+        """Reader queues raw frames; each loop turn drains every queued frame"""
+        frames: Deque = deque()
+        ready = asyncio.Event()
+
+        async def reader():
+            try:
+                async for message in ws:
+                    frames.append(message)
+                    ready.set()
+            finally:
+                ready.set()
+
+        reader_task = asyncio.create_task(reader())
+        try:
+            while not self._cts.is_set():
+                await ready.wait()
+                ready.clear()
+                self._drain_ws_frames(frames)
+                if reader_task.done():
+                    reader_task.result()  # Surface ConnectionClosed
+                    break
+        finally:
+            reader_task.cancel()
+
+    def _ws_backoff(self, attempt: int) -> float:
+        """Full jitter: uniform over [0, min(max, base * 2**attempt)]"""
+        return random.uniform(0.0, min(self.WS_RECONNECT_MAX_SEC, self.WS_RECONNECT_BASE_SEC * 2 ** attempt))
+
+    def _ws_gap_fill(self):
+        """Reconcile against a fresh order-book snapshot; only transitions missed while down change state"""
+        self._ws_stats["gap_fills"] += 1
+        self._ws_stats["last_outage_ms"] = round((time.perf_counter() - self._ws_down_at) * 1000, 2)
+        self._ws_down_at = 0.0
+        if self._open_orders:
+            self._schedule(STAGE_POLL, 0)
+        if self._errored_orders or self._orphaned_orders:
+            self._signal(STAGE_ERRORED)
+
+    async def _ws_standby_keeper(self):
+        """Hold a second authenticated connection, replacing it when it is promoted or drops"""
+        attempt = 0
+        while not self._cts.is_set():
+            try:
+                ws = await self._ws_open()
+            except Exception as e:
+                logging.warning(f"Standby WebSocket connect failed: {e}")
+                await asyncio.sleep(self._ws_backoff(attempt))
+                attempt += 1
+                continue
+            up_since = time.monotonic()
+            authed = False
+
+            # The primary handles updates; whatever the standby sees is covered by the gap fill
+            async def idle():
+                nonlocal authed
+                async for message in ws:
+                    if not authed:
+                        data = _json_loads(message)
+                        authed = data.get("t") == "ck" and data.get("s") == "OK"
+
+            standby = (ws, asyncio.create_task(idle()))
+            self._ws_standby = standby
+            await asyncio.wait([standby[1]])
+            if authed or time.monotonic() - up_since >= self.WS_STABLE_SEC:
+                attempt = 0
+            if self._ws_standby is standby:
+                # Dropped while idle rather than promoted
+                self._ws_standby = None
+                await ws.close()
+                delay = self._ws_backoff(attempt)
+                attempt += 1
+                logging.warning(f"Standby WebSocket dropped, reconnecting in {delay * 1000:.0f}ms")
+                await asyncio.sleep(delay)
+
+    async def _take_standby(self):
+        """Detach the standby for promotion, None if there is no live one"""
+        standby, self._ws_standby = self._ws_standby, None
+        if standby is None:
+            return None
+        ws, idle = standby
+        idle.cancel()
+        await asyncio.wait([idle])
+        if idle.cancelled():
+            return ws
+        await ws.close()
+        return None
+
+    def ws_stats(self) -> dict:
+        """Disconnect, failover and gap-fill counters"""
+        return dict(self._ws_stats, connected=self._ws_connected.is_set(),
+                    standby=self._ws_standby is not None)
+
+    def _drain_ws_frames(self, frames: Deque):
+        """Decode and dispatch every queued frame in one pass"""
+        loads = _json_loads
+        handlers = self._ws_handlers
+        while frames:
+            try:
+                data = loads(frames.popleft())
+                handler = handlers.get(data.get("t"))
+                if handler is not None:
+                    handler(data)
+            except Exception as e:
+                self._event(EV_WS_FRAME_DROPPED, b=str(e))
+
+    def _on_ws_auth(self, data: dict):
+        """Login acknowledgement ("ck")"""
+        self._ws_authed = data.get("s") == "OK"
+        if not self._ws_authed:
+            self._event(EV_WS_AUTH_REJECTED, b=str(data.get("emsg") or data.get("s")))
+
+    def _on_order_update(self, data: dict):
+        """Order update ("om"); fields are only parsed for orders we own"""
+        order_id = data.get("n")
+        knite_order = self._open_orders.get(order_id)
+        if knite_order is None:
+            return
+        ts = self._order_ts.get(knite_order.id)
+        if ts is not None and not ts[TS_ACK]:
+            ts[TS_ACK] = time.perf_counter_ns()
+            self._close_timeline(knite_order)
+
+        filled_qty = int(data.get("filledqty", "0"))
+        avg_price = float(data.get("avgprc") or 0)
+        if filled_qty > knite_order.filled_qty:
+            fill_price = float(data.get("flprc") or 0) or avg_price or self._fallback_fill_price(knite_order)
+            self._apply_fill(knite_order, filled_qty, fill_price)
+        knite_order.filled_qty = filled_qty
+        knite_order.status = self._map_order_status(data.get("status"), knite_order.status)
+        self._journal_order(knite_order)
+
+        self._ws_updates[order_id] = Order(
+            id=order_id,
+            status=knite_order.status,
+            type=knite_order.order_type,
+            filled_qty=filled_qty,
+            price=knite_order.price,
+            quantity=knite_order.quantity,
+            avg_price=avg_price
+        )
+        self._signal(STAGE_OPEN)
+
+    def _fallback_fill_price(self, order: 'KniteOrder') -> float:
+        """Fill reported without a traded price: last trade, else the order's own price"""
+        return self.get_ltp(order.instrument_key) or order.price
+
+    def _on_tick(self, data: dict):
+        """Touchline/depth tick: refresh the cache, then fire any stops the price crossed"""
+        key = f"{data.get('e')}|{data.get('tk')}"
+        ltp = self.market_data().update(key, data.get("lp"), data.get("bp1"), data.get("sp1"))
+        if ltp is not None:
+            self.on_tick(key, ltp)
+
+    #region Market Data
+    def market_data(self) -> 'MarketDataCache':
+        """Return the process-wide LTP/bid/ask cache"""
+        if self._md_cache is None:
+            self._md_cache = MarketDataCache()
+        return self._md_cache
+
+    def subscribe_instrument(self, instrument_key: str):
+        """Stream ticks for an "EXCH|token" instrument into the cache"""
+        if "|" not in instrument_key or instrument_key in self._md_subscriptions:
+            return
+        self._md_subscriptions.add(instrument_key)
+        self.market_data().slot(instrument_key)
+        if self._ws is not None:
+            asyncio.create_task(self._send_subscriptions([instrument_key]))
+
+    async def _send_subscriptions(self, instrument_keys: List[str]):
+        """Send one touchline/depth subscribe frame for a batch of instruments"""
+        try:
+            await self._ws.send(json.dumps({
+                "t": "d" if self.MARKET_DATA_DEPTH else "t",
+                "k": "#".join(instrument_keys)
+            }))
+        except Exception as e:
+            logging.warning(f"Market data subscribe failed for {instrument_keys}: {e}")
+
+    def get_ltp(self, instrument_key: str) -> Optional[float]:
+        """Last traded price from the cache, None if missing or stale"""
+        return self.market_data().ltp(instrument_key, self.MD_STALE_SEC)
+    #endregion
 
     #region Core Processing
-    @classmethod
-    async def process_sl_orders(cls):
-        """Process stop-loss orders with O(1) operations"""
-        if not cls._sl_orders:
+    async def process_sl_orders(self):
+        """Send exits for stop-losses fired by ticks"""
+        if not self._triggered_sl_orders:
             return
-            
-        # Process from newest to oldest
-        for idx in range(len(cls._sl_orders)-1, -1, -1):
-            order = cls._sl_orders[idx]
-            if order.stop_breached and order.is_open:
-                await cls.exit_orders([order])
-                cls._sl_orders.remove(order)
 
-    @classmethod
-    async def process_open_orders(cls):
-        """Poll and update order statuses"""
-        if cls.SIMULATED or not cls._open_orders:
+        fired = list(self._triggered_sl_orders)
+        self._triggered_sl_orders.clear()
+        await self.exit_orders(fired)
+
+    def on_tick(self, instrument_key: str, ltp: float):
+        """Mark positions, then fire the resting stops this price crossed (O(log n) each)"""
+        if self._live_pos_mgr is not None:
+            self._live_pos_mgr.mark(instrument_key, ltp)
+        book = self._sl_orders.get(instrument_key)
+        if not book:
             return
-            
-        # Batch fetch all orders
-        orders = await cls.get_orders(list(cls._open_orders.keys()))
-        
+
+        fired = book.on_tick(ltp)
+        if fired:
+            for order in fired:
+                order.stop_breached = True
+                self._sl_by_parent.pop(order.parent.id, None)
+                self._journal_id(REC_SL_REMOVE, order.id)
+            self._triggered_sl_orders.extend(fired)
+            self._signal(STAGE_SL)
+
+    def add_sl_order(self, sl_order: 'KniteOrder'):
+        """Rest a stop-loss in its instrument's trigger index"""
+        book = self._sl_orders.get(sl_order.instrument_key)
+        if book is None:
+            book = self._sl_orders[sl_order.instrument_key] = SlTriggerBook()
+        book.add(sl_order)
+        self._sl_by_parent[sl_order.parent.id] = sl_order
+        self._journal_order(sl_order, REC_SL_ADD)
+
+    async def process_sl_exit(self, order: 'KniteOrder'):
+        """Pull the resting stop of a position that is being exited"""
+        if order.is_sl_order:
+            return
+        parent = order.parent or order
+        sl_order = self._sl_by_parent.pop(parent.id, None)
+        if sl_order is not None:
+            book = self._sl_orders.get(sl_order.instrument_key)
+            if book is not None and book.cancel(sl_order):
+                self._journal_id(REC_SL_REMOVE, sl_order.id)
+
+    async def process_ws_updates(self):
+        """Apply order updates pushed by the WebSocket"""
+        updates = self._ws_updates
+        self._ws_updates = {}
+
+        for order_id, order in updates.items():
+            if order_id in self._open_orders and await self.process_open_order(order):
+                self._settle_open_order(order_id)
+
+    async def process_open_orders(self):
+        """Reconcile open orders against a single order-book snapshot"""
+        if self.SIMULATED or not self._open_orders:
+            return
+
+        # Orders the WebSocket already reported terminal are settled by process_ws_updates
+        order_ids = [oid for oid, ko in self._open_orders.items()
+                     if ko.status not in ORDER_STATUSES_TERMINAL]
+        if not order_ids:
+            return
+
+        orders = await self.get_orders(order_ids)
+
         for order in orders:
-            knite_order = cls._open_orders.get(order.id)
-            if knite_order and await cls.process_open_order(order):
+            knite_order = self._open_orders.get(order.id)
+            if not knite_order:
+                continue
+            # Only act on orders whose broker state moved since we last saw them
+            if order.status == knite_order.status and order.filled_qty == knite_order.filled_qty:
+                continue
+            knite_order.status = order.status
+            knite_order.filled_qty = order.filled_qty
+            self._journal_order(knite_order)
+            if await self.process_open_order(order):
                 # Remove completed orders
-                del cls._open_orders[order.id]
+                self._settle_open_order(order.id)
 
-    @classmethod
-    async def process_open_order(cls, order: 'Order') -> bool:
+        # Re-arm the reconciliation timer while orders are working
+        if self._open_orders:
+            self._schedule(STAGE_POLL, self.OPEN_ORDER_POLL_SEC)
+
+    def _settle_open_order(self, order_id: str):
+        """Drop an order that reached a terminal state"""
+        knite_order = self._open_orders.pop(order_id)
+        self.risk().release(knite_order)
+        self._close_timeline(knite_order)
+        self._journal_id(REC_CLOSE, knite_order.id)
+        self._drop_amend(knite_order)
+
+    async def process_open_order(self, order: 'Order') -> bool:
         """Returns True if order reaches terminal state"""
-        knite_order = cls._open_orders[order.id]
+        knite_order = self._open_orders[order.id]
         status = order.status
         
         if status == ORDER_STATUS_REJECTED:
-            await cls.fill_orders(knite_order, order, knite_order.is_sl_order)
+            await self.fill_orders(knite_order, order, knite_order.is_sl_order)
             return True
             
         elif status == ORDER_STATUS_COMPLETE:
-            await cls.fill_orders(knite_order, order, False)
+            await self.fill_orders(knite_order, order, False)
             return True
             
         elif status == ORDER_STATUS_OPEN:
-            if order.type == ORDER_TYPE_LIMIT:
-                # Low-latency modification
-                asyncio.create_task(cls.modify_order(knite_order))
+            if order.type == ORDER_TYPE_LIMIT and self.LIMIT_REPRICE_MAX_TICKS > 0:
+                # Opt-in: reprice toward the touch; no-ops and superseded targets are dropped
+                target = self._limit_reprice_target(knite_order)
+                if target is not None:
+                    self.request_amend(knite_order, target)
             return False
 
-    @classmethod
-    async def process_errored_orders(cls):
-        """Recover from errored order states"""
-        if not cls._errored_orders:
+    def _limit_reprice_target(self, order: 'KniteOrder') -> Optional[float]:
+        """Best bid for buys, best ask for sells, from the tick cache, capped LIMIT_REPRICE_MAX_TICKS from the placed price"""
+        quote = self.market_data().quote(order.instrument_key)
+        if quote is None or quote[4] > self.MD_STALE_SEC:
+            return None
+        price = quote[1] if order.quantity > 0 else quote[2]
+        if not price:
+            return None
+        if not order.limit_price:
+            order.limit_price = order.price
+        cap = self.LIMIT_REPRICE_MAX_TICKS * order.tick_size
+        return min(max(price, order.limit_price - cap), order.limit_price + cap)
+
+    @staticmethod
+    def _same_tick(price: float, other: float, tick_size: float) -> bool:
+        """Prices compared in whole ticks, so float noise never reads as a move"""
+        return round(price / tick_size) == round(other / tick_size)
+
+    def request_amend(self, order: 'KniteOrder', price: float):
+        """Move a working order to price, keeping one modify in flight per order"""
+        if order.id in self._amend_inflight:
+            if order.id in self._amend_pending:
+                self._amend_stats["coalesced"] += 1
+            self._amend_pending[order.id] = price
             return
-            
-        # Process timeout checks
+
+        if self._same_tick(price, order.price, order.tick_size):
+            self._amend_stats["suppressed"] += 1
+            return
+
+        # Dispatched from the scheduler ahead of entries, behind exits
+        self._amend_inflight.add(order.id)
+        self._amend_pending[order.id] = price
+        self.scheduler().push(order, SCHED_AMEND)
+        self._signal(STAGE_NEW)
+
+    def _dispatch_amend(self, order: 'KniteOrder'):
+        """Start the amend queued for order with its latest target"""
+        price = self._amend_pending.pop(order.id, None)
+        if price is None or order.status in ORDER_STATUSES_TERMINAL:
+            self._amend_stats["suppressed"] += 1
+            self._amend_inflight.discard(order.id)
+            return
+        asyncio.create_task(self._run_amend(order, price))
+
+    async def _run_amend(self, order: 'KniteOrder', price: float):
+        """Send the amend, then the latest target that arrived meanwhile"""
+        stats = self._amend_stats
+        try:
+            while price is not None:
+                start = time.perf_counter()
+                ok = await self.modify_order(order, price)
+                elapsed = time.perf_counter() - start
+                stats["sent"] += 1
+                stats["latency_sec_total"] += elapsed
+                stats["latency_sec_max"] = max(stats["latency_sec_max"], elapsed)
+                if not ok:
+                    stats["failed"] += 1
+
+                price = self._amend_pending.pop(order.id, None)
+                if price is not None and (order.status in ORDER_STATUSES_TERMINAL
+                                          or self._same_tick(price, order.price, order.tick_size)):
+                    stats["suppressed"] += 1
+                    price = None
+        except Exception as e:
+            logging.error(f"Amend for {order.id} failed: {e}")
+        finally:
+            self._amend_pending.pop(order.id, None)
+            self._amend_inflight.discard(order.id)
+
+    def _drop_amend(self, order: 'KniteOrder'):
+        """Forget an order's pending amend; a queued one leaves the scheduler, one on the wire stops after it"""
+        self._amend_pending.pop(order.id, None)
+        if order.id in self._amend_inflight and self.scheduler().remove(SCHED_AMEND, order):
+            self._amend_inflight.discard(order.id)
+
+    def amend_stats(self) -> dict:
+        """Amend counters with mean/max modify round-trip latency"""
+        stats = dict(self._amend_stats)
+        stats["latency_sec_mean"] = stats["latency_sec_total"] / stats["sent"] if stats["sent"] else 0.0
+        stats["inflight"] = len(self._amend_inflight)
+        return stats
+
+    async def process_errored_orders(self):
+        """Recover errored and orphaned orders from one cached order-book snapshot"""
+        if not self._errored_orders and not self._orphaned_orders:
+            return
+
+        # Past the timeout an order stops holding risk and is only looked for at the broker
         current_time = time.time()
-        cls._errored_orders = [
-            o for o in cls._errored_orders 
-            if not o.order_timed_out(current_time, cls.ERROR_ORDER_TIMEOUT_SEC)
-        ]
-        
-        # Batch process remaining orders
-        if cls._errored_orders:
-            orders = await cls.get_orders_by_tags([o.tag for o in cls._errored_orders])
-            for order in orders:
-                # Handle recovery logic
-                if order.status == ORDER_STATUS_OPEN:
-                    cls._errored_orders.remove(order)
-                    cls._open_orders[order.id] = order
+        live = []
+        for o in self._errored_orders:
+            if o.order_timed_out(current_time, self.ERROR_ORDER_TIMEOUT_SEC):
+                self.risk().release(o)
+                self._orphaned_orders.append(o)
+                logging.warning(f"Order {o.id} unconfirmed after {self.ERROR_ORDER_TIMEOUT_SEC}s, orphaned")
+            else:
+                live.append(o)
+        self._errored_orders = live
+        self._orphaned_orders = [o for o in self._orphaned_orders
+                                 if not o.order_timed_out(current_time, self.ORPHAN_TTL_SEC)]
+
+        # One snapshot, then a tag lookup per parked order
+        if await self._refresh_book(self.RECON_MAX_AGE_SEC):
+            adopted = set()  # By identity: an adopted order may settle
+            for o in list(self._errored_orders):
+                if await self._adopt(o, orphaned=False):
+                    adopted.add(id(o))
+            for o in list(self._orphaned_orders):
+                if await self._adopt(o, orphaned=True):
+                    adopted.add(id(o))
+            if adopted:
+                self._errored_orders = [o for o in self._errored_orders if id(o) not in adopted]
+                self._orphaned_orders = [o for o in self._orphaned_orders if id(o) not in adopted]
+
+        # Poll again, or expire the oldest order, whichever comes first
+        if self._errored_orders:
+            oldest = min(o.created_at for o in self._errored_orders)
+            expires_in = oldest + self.ERROR_ORDER_TIMEOUT_SEC - time.time()
+            self._schedule(STAGE_ERRORED, max(0.0, min(self.ERROR_ORDER_POLL_SEC, expires_in)))
+        elif self._orphaned_orders:
+            self._schedule(STAGE_ERRORED, self.ORPHAN_POLL_SEC)
+
+    async def _adopt(self, order: 'KniteOrder', orphaned: bool) -> bool:
+        """Track a parked order the broker turns out to have; False if it is not in the book"""
+        row = self._book.by_tag.get(order.client_tag)
+        if row is None:
+            return False
+        broker_id = row["orderid"]
+        if broker_id in self._open_orders:
+            return True
+        broker_order = self._parse_order(row)
+        logging.info(f"Recovered {'orphaned' if orphaned else 'errored'} order {order.id} "
+                     f"as {broker_id} ({broker_order.status})")
+        if orphaned:
+            self.risk().track(order)  # Released when it timed out
+        order.broker_order_id = broker_id
+        order.status = broker_order.status
+        order.filled_qty = broker_order.filled_qty
+        self._open_orders[broker_id] = order
+        self._journal_order(order)
+        if await self.process_open_order(broker_order):
+            self._settle_open_order(broker_id)
+        else:
+            self._schedule(STAGE_POLL, self.OPEN_ORDER_POLL_SEC)
+        return True
+
+    async def handle_order_failure(self, order: 'KniteOrder'):
+        """Park a failed order for recovery by client tag"""
+        self._order_ts.pop(order.id, None)
+        self._errored_orders.append(order)
+        self._signal(STAGE_ERRORED)
     #endregion
 
     #region Order Execution
-    @classmethod
-    def panic(cls):
-        """Emergency shutdown procedure"""
+    def panic(self):
+        """Emergency shutdown procedure; safe to call from any thread"""
         logging.error("PANIC EXIT TRIGGERED!")
-        cls.exit_all_orders()
+        self.exit_all_orders(SCHED_PANIC)
 
-    @classmethod
-    def exit_all_orders(cls):
-        """Close all open positions"""
-        open_orders = list(cls._open_orders.values())
-        asyncio.create_task(cls.exit_orders(open_orders))
+    def exit_all_orders(self, sched_class: Optional[int] = None):
+        """Close all open positions; safe to call from any thread"""
+        if threading.get_ident() != self._loop_thread:
+            self._post(INBOX_EXIT_ALL, sched_class)
+            return
+        asyncio.create_task(self.flatten_all(sched_class))
 
-    @classmethod
-    async def exit_orders(cls, orders: List['KniteOrder']):
-        """Execute batch exit orders with priority"""
+    async def flatten_all(self, sched_class: Optional[int] = None):
+        """Cancel queued and working orders and resting stops, then exit every net position"""
+        # Queued entries and exits are dropped; the exits below are sized from positions instead
+        scheduler = self.scheduler()
+        for klass in (SCHED_SL_EXIT, SCHED_EXIT, SCHED_ENTRY):
+            for order in scheduler.drop(klass):
+                self._drop_queued(order)
+        for order in scheduler.drop(SCHED_AMEND):
+            self._amend_inflight.discard(order.id)
+        self._amend_pending.clear()  # Modifies on the wire stop after their current round trip
+        self._triggered_sl_orders.clear()
+        for sl_order in self._sl_by_parent.values():
+            book = self._sl_orders.get(sl_order.instrument_key)
+            if book is not None and book.cancel(sl_order):
+                self._journal_id(REC_SL_REMOVE, sl_order.id)
+        self._sl_by_parent.clear()
+
+        # Exits go out first; working entries are cancelled behind them
+        exits = self._flatten_exits([])
+        if exits:
+            await self.exit_orders(exits, sched_class)
+        entries = [o for o in self._open_orders.values()
+                   if not o.is_exit_order and o.status not in ORDER_STATUSES_TERMINAL]
+        results = await asyncio.gather(*(self.cancel_order(o) for o in entries), return_exceptions=True)
+        failed = sum(ok is not True for ok in results)
+        if failed:
+            logging.error(f"Flatten could not cancel {failed} of {len(entries)} working entries")
+
+        # Entries that filled while their cancel was on the wire leave a residual
+        residual = self._flatten_exits(exits)
+        if residual:
+            await self.exit_orders(residual, sched_class)
+
+    def _flatten_exits(self, pending: List['KniteOrder']) -> List['KniteOrder']:
+        """Exits taking every net position to flat, less what working or pending exits already cover"""
+        covered: Dict[str, int] = {}
+        seen: Set[int] = set()
+        for order in itertools.chain(self._open_orders.values(), pending):
+            if order.is_exit_order and order.id not in seen and order.status not in ORDER_STATUSES_TERMINAL:
+                seen.add(order.id)
+                left = abs(order.quantity) - order.filled_qty
+                key = order.instrument_key
+                covered[key] = covered.get(key, 0) + (left if order.quantity > 0 else -left)
+
+        exits = []
+        for key, quantity in self._live_pos_mgr.positions_to_flatten():
+            needed = quantity - covered.get(key, 0)
+            if needed and (needed > 0) == (quantity > 0):
+                exit_order = self.create_exit_order(key, needed)
+                if exit_order is not None:
+                    exits.append(exit_order)
+        return exits
+
+    def _drop_queued(self, order: 'KniteOrder'):
+        """Settle an order removed from the scheduler before it was placed"""
+        if not order.is_barrier:
+            order.status = ORDER_STATUS_REJECTED
+            self._order_ts.pop(order.id, None)
+
+    async def exit_orders(self, orders: List['KniteOrder'], sched_class: Optional[int] = None):
+        """Execute batch exit orders with priority, p1 fully placed before p2"""
         # Split by priority
         p1_orders = [o for o in orders if o.is_high_priority]
         p2_orders = [o for o in orders if not o.is_high_priority]
         
         # Add barriers
         if p1_orders:
-            p1_orders.append(cls.get_barrier_order())
+            p1_orders.append(self.get_barrier_order())
         if p2_orders:
-            p2_orders.append(cls.get_barrier_order())
+            p2_orders.append(self.get_barrier_order())
             
-        # Atomic queue update
-        with cls._lock:
-            cls._orders_to_place.extendleft(reversed(p1_orders))
-            cls._orders_to_place.extendleft(reversed(p2_orders))
+        for order in orders:
+            self._stamp(order, TS_ENQUEUE)
+
+        # Each batch ends in a barrier within its class, so p2 waits for p1
+        for batch, klass in ((p1_orders, SCHED_SL_EXIT), (p2_orders, SCHED_EXIT)):
+            for order in batch:
+                self.scheduler().push(order, klass if sched_class is None else sched_class)
         
-        await cls.process_new_orders()
+        await self.process_new_orders()
 
-    @classmethod
-    async def place_orders_from_file(cls, file_path: str):
-        """Load and execute orders from file"""
-        export_orders = deserialize_orders(file_path)
-        for eo in export_orders:
-            ko = KniteOrder(ORDER_TYPE_LIMIT)
-            if ko.parse_order(eo):
-                await cls.place_new_order(ko)
+    async def place_orders_from_file(self, file_path: str) -> int:
+        """Stream a CSV/JSONL basket into the scheduler chunk by chunk"""
+        placed = 0
+        for chunk in BasketReader(file_path).chunks():
+            for eo in chunk:
+                ko = KniteOrder(ORDER_TYPE_LIMIT)
+                if ko.parse_order(eo):
+                    await self.place_new_order(ko)
+                    placed += 1
+            # Let the loop dispatch this chunk while the next one is parsed
+            await asyncio.sleep(0)
+        return placed
+
+    async def place_new_order(self, order: 'KniteOrder'):
+        """Queue an order for placement and wake the submit stage"""
+        self._stamp(order, TS_ENQUEUE)
+        self.scheduler().push(order, OrderScheduler.classify(order))
+        self._signal(STAGE_NEW)
+    #endregion
+
+    #region Thread-Safe Submission
+    def submit_threadsafe(self, order: 'KniteOrder'):
+        """Queue an order from a strategy thread; the loop picks it up with the rest of its batch"""
+        self._post(INBOX_ORDER, order)
+
+    def submit_many_threadsafe(self, orders: List['KniteOrder']):
+        """Queue several orders with a single handoff"""
+        self._post(INBOX_ORDERS, list(orders))
+
+    def command_threadsafe(self, command: str):
+        """Post an external command (e.g. "ExitAll") from any thread"""
+        self._post(INBOX_COMMAND, command)
+
+    def _post(self, kind: int, payload):
+        """Append to the inbox and wake the loop, once per batch rather than once per item"""
+        if self._loop is None:
+            raise RuntimeError("OrderManager is not running")
+        self._inbox.append((kind, payload, time.perf_counter_ns()))
+        if not self._inbox_scheduled:
+            self._inbox_scheduled = True
+            self._loop.call_soon_threadsafe(self._drain_inbox)
+
+    def _drain_inbox(self):
+        """Runs on the loop: hand everything posted since the last drain to the scheduler"""
+        # Cleared before draining, so a post racing with this drain schedules another one
+        self._inbox_scheduled = False
+        inbox = self._inbox
+        scheduler = self.scheduler()
+        metrics = self.METRICS_ENABLED
+        hist = self._latency_hist.get("thread_handoff")
+        if hist is None and metrics:
+            hist = self._latency_hist["thread_handoff"] = LatencyHistogram()
+        now = time.perf_counter_ns()
+        queued = False
+        while inbox:
+            kind, payload, posted = inbox.popleft()
+            if metrics:
+                hist.record(now - posted)
+            if kind == INBOX_ORDER or kind == INBOX_ORDERS:
+                for order in (payload,) if kind == INBOX_ORDER else payload:
+                    if metrics:
+                        self._order_ts[order.id] = [posted, 0, 0, 0, 0, 0]
+                    scheduler.push(order, OrderScheduler.classify(order))
+                queued = True
+            elif kind == INBOX_EXIT_ALL:
+                self.exit_all_orders(payload)
+            else:
+                self.submit_command(payload)
+        if queued:
+            self._signal(STAGE_NEW)
     #endregion
 
     #region Low-Latency Optimizations
-    @classmethod
-    async def process_new_orders(cls):
-        """Order placement with nanosecond precision"""
-        if cls.BLOCK_ALL_ORDERS or not cls._orders_to_place:
+    def scheduler(self) -> 'OrderScheduler':
+        """Return the placement scheduler"""
+        if self._scheduler is None:
+            self._scheduler = OrderScheduler()
+        return self._scheduler
+
+    def risk(self) -> 'RiskEngine':
+        """Return the pre-trade risk engine"""
+        if self._risk is None:
+            self._risk = RiskEngine(self.RISK_LIMITS, self.RISK_INSTRUMENT_LIMITS)
+        return self._risk
+
+    def order_store(self) -> 'OrderStore':
+        """Return the session order blotter"""
+        if self._orders is None:
+            self._orders = OrderStore(self.BLOTTER_CAPACITY)
+        return self._orders
+
+    async def process_new_orders(self):
+        """Dispatch queued orders into a window of concurrent placements"""
+        scheduler = self.scheduler()
+        if self.BLOCK_ALL_ORDERS or not scheduler:
             return
             
-        # Process up to 100 orders per cycle
-        for _ in range(min(100, len(cls._orders_to_place))):
-            if not cls.can_place_new_order(cls._orders_to_place[0]):
+        # Dispatch up to 100 orders per cycle
+        for _ in range(100):
+            head = scheduler.peek()
+            if head is None:
+                return
+            klass, order = head
+            if klass == SCHED_AMEND:
+                scheduler.pop(klass)
+                self._dispatch_amend(order)
+                continue
+            if not self.can_place_new_order(order):
                 return
-                
-            order = cls._orders_to_place.popleft()
-            await cls.process_new_order(order)
+            if not order.is_barrier and len(self._inflight) >= self.SUBMIT_WINDOW:
+                return  # Resumed when a placement completes
 
-    @classmethod
-    async def process_new_order(cls, order: 'KniteOrder'):
+            scheduler.pop(klass)
+            if order.is_barrier:
+                await self.process_new_order(order)
+                continue
+            task = asyncio.create_task(self.process_new_order(order))
+            self._inflight.add(task)
+            task.add_done_callback(self._on_placement_done)
+
+        # Per-cycle cap hit: come straight back for the rest
+        if scheduler:
+            self._signal(STAGE_NEW)
+
+    def _on_placement_done(self, task: asyncio.Task):
+        """Free a window slot; a waiting barrier or queued order may now go"""
+        self._inflight.discard(task)
+        if self.scheduler():
+            self._signal(STAGE_NEW)
+
+    async def process_new_order(self, order: 'KniteOrder'):
         """Execute single order with minimal latency"""
         if order.is_barrier:
-            logging.info("Barrier processed")
-            cls._barrier_orders.discard(order.id)
+            self._event(EV_BARRIER, order.id)
+            self._signal(STAGE_NEW)
             return
+        self._stamp(order, TS_DEQUEUE)
+        store = self.order_store()
+        store.record(order)
+        if not order.token:
+            self._resolve_instrument(order)
             
+        # Make sure ticks are flowing before the fill needs a price
+        self.subscribe_instrument(order.instrument_key)
+
         # SL handling
         if order.is_exit_order:
-            await cls.process_sl_exit(order)
+            await self.process_sl_exit(order)
             
         # Execute order
         try:
-            if order.quantity > 0:
-                broker_order = await cls.place_order(cls._api, order)
-                await cls.fill_orders(order, broker_order, False)
+            if order.quantity != 0:
+                reason = self.risk().check(order, self.get_ltp(order.instrument_key), self.METRICS_ENABLED)
+                if reason is not None:
+                    self._event(EV_RISK_REJECT, order.id, reason, order.quantity, order.price)
+                    order.status = ORDER_STATUS_REJECTED
+                    self._order_ts.pop(order.id, None)
+                    store.sync(order)
+                    return
+                order_id = await self.place_order(self._api, order)
+                if not order_id:
+                    await self.handle_order_failure(order)
+                    return
+                # Fills are applied once the WebSocket (or the poll) reports a terminal state
+                order.broker_order_id = order_id
+                self._open_orders[order_id] = order
+                self._journal_order(order)
+                self._schedule(STAGE_POLL, self.OPEN_ORDER_POLL_SEC)
         except Exception as e:
             logging.warning(f"Order {order.id} placement failed: {e}")
-            await cls.handle_order_failure(order)
+            await self.handle_order_failure(order)
 
-    @classmethod
-    def can_place_new_order(cls, order: 'KniteOrder') -> bool:
-        """Check for barrier conditions"""
-        return not order.is_barrier or not cls._barrier_orders
+    def can_place_new_order(self, order: 'KniteOrder') -> bool:
+        """A barrier only passes once every placement dispatched ahead of it has finished"""
+        return not order.is_barrier or not self._inflight
     #endregion
 
     #region Helper Methods
-    @classmethod
-    def get_barrier_order(cls) -> 'KniteOrder':
+    def get_barrier_order(self) -> 'KniteOrder':
         """Create order barrier for synchronization"""
         barrier = KniteOrder(ORDER_TYPE_LIMIT)
         barrier.tag = "BARRIER"
         barrier.is_barrier = True
-        cls._barrier_orders.add(barrier.id)
         return barrier
 
-    @classmethod
-    async def fill_orders(cls, knite_order: 'KniteOrder', 
+    async def fill_orders(self, knite_order: 'KniteOrder', 
                          broker_order: 'Order', retry: bool):
         """Handle order fills with position management"""
-        # Position management logic
+        # Position management logic; fills already applied from the WebSocket are skipped
+        if broker_order.filled_qty > 0:
+            self._apply_fill(knite_order, broker_order.filled_qty,
+                             broker_order.avg_price or self._fallback_fill_price(knite_order))
+
+    def _apply_fill(self, knite_order: 'KniteOrder', cum_filled: int, price: float):
+        """Book the not-yet-applied part of an order's cumulative fill"""
+        pos_mgr = self._live_pos_mgr
+        if pos_mgr is None:
+            return
         if knite_order.is_exit_order:
-            # Closing position
-            pass
+            delta = pos_mgr.close_position(knite_order, cum_filled, price)
         else:
-            # Opening position
-            pass
-            
-        # SL order creation
-        if knite_order.sl_price and broker_order.filled_qty > 0:
-            # Create SL order only if price hasn't breached
-            current_price = await knite_order.instrument.get_ltp()
-            if current_price and current_price < knite_order.sl_price:
-                sl_order = cls.create_sl_order(knite_order)
-                with cls._lock:
-                    cls._sl_orders.append(sl_order)
+            delta = pos_mgr.open_position(knite_order, cum_filled, price)
+        if delta:
+            if knite_order.instrument_key not in pos_mgr.legs:
+                pos_mgr.legs[knite_order.instrument_key] = PositionMgr.leg(knite_order)
+            self.risk().on_fill(knite_order, delta)
+            if self._orders is not None:
+                self._orders.on_fill(knite_order, delta, price)
+        if delta and self._journal is not None:
+            self._journal.append_fill(knite_order, delta, price)
+            self._arm_journal_flush()
+        if delta and knite_order.sl_price and not knite_order.is_exit_order:
+            self._size_stop(knite_order, cum_filled, delta)
 
-    @classmethod
-    def create_sl_order(cls, parent_order: 'KniteOrder') -> 'KniteOrder':
-        """Generate SL order with parent linkage"""
+    def _size_stop(self, parent: 'KniteOrder', cum_filled: int, delta: int):
+        """Rest the parent's stop on its first fill and grow it with later ones"""
+        sl_order = self._sl_by_parent.get(parent.id)
+        if sl_order is not None:
+            sl_order.quantity -= delta
+            self._journal_order(sl_order, REC_SL_ADD)
+            return
+        if cum_filled != abs(delta):
+            return  # The stop already fired or was pulled; its exit is sized separately
+        # Create SL order only if price hasn't breached; with no fresh price
+        # the trigger index fires it on the first tick instead
+        current_price = self.get_ltp(parent.instrument_key)
+        if current_price is None or not SlTriggerBook.crossed(-parent.quantity, parent.sl_price, current_price):
+            self.add_sl_order(self.create_sl_order(parent, delta))
+
+    def create_exit_order(self, instrument_key: str, quantity: int) -> Optional['KniteOrder']:
+        """Fresh MARKET order that moves the position in instrument_key by quantity"""
+        leg = self._live_pos_mgr.legs.get(instrument_key)
+        if leg is None:
+            exchange, _, token = instrument_key.partition("|")
+            instrument = self._instruments.by_token(exchange, token) if token and self._instruments is not None else None
+            if instrument is None:
+                logging.error(f"Cannot exit {instrument_key}: instrument unknown")
+                return None
+            leg = (instrument.tsym, instrument.exchange, instrument.token, instrument.tick_size, "I")
+        symbol, exchange, token, tick_size, product_type = leg
+        order = KniteOrder(ORDER_TYPE_MARKET, product_type)
+        order.symbol, order.exchange, order.token, order.tick_size = symbol, exchange, token, tick_size
+        order.quantity = quantity
+        order.price = order.expected_price = self.get_ltp(instrument_key) or 0.0
+        order.is_exit_order = True
+        return order
+
+    def create_sl_order(self, parent_order: 'KniteOrder', filled: Optional[int] = None) -> 'KniteOrder':
+        """Generate SL order with parent linkage, covering the signed quantity filled so far"""
         sl_order = KniteOrder(ORDER_TYPE_SL)
         sl_order.parent = parent_order
         sl_order.instrument = parent_order.instrument
-        sl_order.quantity = parent_order.quantity
+        sl_order.symbol = parent_order.symbol
+        sl_order.exchange = parent_order.exchange
+        sl_order.token = parent_order.token
+        sl_order.quantity = -(parent_order.quantity if filled is None else filled)  # Flattens the parent position
         sl_order.price = parent_order.sl_price
+        sl_order.is_exit_order = True
+        sl_order.is_high_priority = True
         return sl_order
     #endregion
 
     #region Broker API Methods
-    @classmethod
-    async def place_order(cls, flattrade_broker: FlattradeAPI, order: 'KniteOrder'):
+    async def place_order(self, flattrade_broker: FlattradeAPI, order: 'KniteOrder'):
         """Place order through Flattrade API. No internal state tracking. Strictly follow docs. Rely on WebSocket/API for order state."""
         try:
-            order_type = cls._map_order_type(order.order_type)
-            side = "B" if order.quantity > 0 else "S"
-            qty = abs(order.quantity)
-
-            # Adjust symbol format for Flattrade API compatibility
-            symbol = order.symbol.replace("MCX:", "")  # Remove 'MCX:' prefix if present
-
-            # Prepare order payload per Flattrade docs and your logic
-            order_payload = {
-                "uid": str(flattrade_broker.creds['USER']),
-                "actid": str(flattrade_broker.creds['USER']),
-                "exch": "MCX",
-                "tsym": str(symbol),
-                "qty": str(qty),
-                "prd": str(order.product_type if order.product_type is not None else "I"),
-                "trantype": str(side),
-                "ret": "DAY"
-            }
-
-            # Order type logic
-            if order.order_type == "SL-M":
-                order_payload["prctyp"] = "SL-M"
-                order_payload["trigprc"] = str(order.price if order.price is not None else "0")
-                order_payload["prc"] = "0"
-            elif order.order_type == ORDER_TYPE_SL:
-                order_payload["prctyp"] = "SL"
-                order_payload["trigprc"] = str(order.price if order.price is not None else "0")
-                order_payload["prc"] = str(order.price if order.price is not None else "0")
-            elif order.order_type == ORDER_TYPE_LIMIT:
-                order_payload["prctyp"] = "LIMIT"
-                order_payload["prc"] = str(order.price if order.price is not None else "0")
-            else:
-                order_payload["prctyp"] = "MARKET"
-                order_payload["prc"] = "0"
+            # Copy the cached per-account/instrument template; only the per-order fields change
+            order_type, price = order.order_type, order.price
+            if order.stop_breached:
+                order_type, price = self._fired_stop_terms(order)
+            order_payload = dict(self._payload_template(
+                flattrade_broker.creds['USER'], order.exchange, order.symbol, order.product_type, order_type))
+            order_payload["qty"] = str(abs(order.quantity))
+            order_payload["trantype"] = "B" if order.quantity > 0 else "S"
+            order_payload["remarks"] = order.client_tag  # Lets recovery find the order by its id
+            prctyp = order_payload["prctyp"]
+            if prctyp != "MARKET":
+                price = "0" if price is None else str(price)
+                if prctyp != "LIMIT":
+                    order_payload["trigprc"] = price
+                if prctyp != "SL-M":
+                    order_payload["prc"] = price
 
-            # Remove any None values
-            order_payload = {k: v for k, v in order_payload.items() if v is not None}
-
-            # Log payload
-            try:
-                payload_json = json.dumps(order_payload)
-                logging.info(f"Order payload for {order.symbol}: {payload_json}")
-            except Exception as e:
-                logging.error(f"Failed to serialize order payload for {order.symbol}: {order_payload}, error: {e}")
-                raise ValueError(f"Order payload serialization failed: {e}")
+            # Formatted only when debug logging is on
+            logging.debug("Order payload for %s: %s", order.symbol, order_payload)
 
             # Place order via Flattrade API
+            self._stamp(order, TS_PAYLOAD)
+            await self._rate_limiter(LANE_PLACE, order.priority)
+            self._stamp(order, TS_RATE_LIMIT)
             response = await flattrade_broker.place_order(**order_payload)
-            logging.info(f"Order response for {order.symbol}: {response}")
+            self._stamp(order, TS_RESPONSE)
+            logging.debug("Order response for %s: %s", order.symbol, response)
 
             if response and "norenordno" in response:
                 order_id = response["norenordno"]
                 # Do NOT update internal state. Let WebSocket drive state.
                 # Return order_id for position manager to track.
-                logging.info(f"Placed order {order_id} for {order.symbol}")
+                self._event(EV_PLACED, order.id, order_id, order.quantity, order.price)
                 return order_id
             else:
-                logging.error(f"Failed to place order for {order.symbol}: {response}")
+                self._event(EV_PLACE_REJECTED, order.id, (response or {}).get("emsg", str(response)),
+                            order.quantity, order.price)
                 return None
         except Exception as e:
-            logging.error(f"Error placing order: {str(e)}")
+            self._event(EV_PLACE_ERROR, order.id, str(e), order.quantity, order.price)
             order.status = ORDER_STATUS_REJECTED
             raise ValueError(f"Order placement failed: {str(e)}")
 
-    @classmethod
-    async def modify_order(cls, order: 'KniteOrder'):
+    def _fired_stop_terms(self, order: 'KniteOrder') -> Tuple[str, Optional[float]]:
+        """Order type and price for a stop the trigger index already fired"""
+        if self.SL_FIRE_LIMIT_PCT is None:
+            return ORDER_TYPE_MARKET, None
+        # Marketable limit: priced through the last trade so it crosses the book
+        ltp = self.get_ltp(order.instrument_key) or order.price
+        buffer = ltp * self.SL_FIRE_LIMIT_PCT / 100
+        ticks = (ltp + buffer if order.quantity > 0 else max(ltp - buffer, 0.0)) / order.tick_size
+        ticks = math.ceil(ticks) if order.quantity > 0 else math.floor(ticks)
+        return ORDER_TYPE_LIMIT, round(ticks * order.tick_size, 8)
+
+    def _payload_template(self, user: str, exchange: str, symbol: str, product_type: Optional[str],
+                          order_type: str) -> dict:
+        """Static part of a place-order payload, built once per account/exchange/instrument/type"""
+        key = (user, exchange, symbol, product_type, order_type)
+        template = self._payload_templates.get(key)
+        if template is None:
+            prctyp = order_type if order_type in ("SL-M", ORDER_TYPE_SL, ORDER_TYPE_LIMIT) else "MARKET"
+            instrument = self.instrument(symbol, exchange)
+            if instrument is not None:
+                exch, tsym = instrument.exchange, instrument.tsym
+            elif ":" in symbol:
+                exch, tsym = symbol.split(":", 1)
+            else:
+                exch, tsym = exchange, symbol  # Not in the scrip master
+            template = {
+                "uid": str(user),
+                "actid": str(user),
+                "exch": exch,
+                "tsym": tsym,
+                "qty": "0",
+                "prd": str(product_type if product_type is not None else "I"),
+                "trantype": "B",
+                "ret": "DAY",
+                "prctyp": prctyp,
+            }
+            if prctyp in ("MARKET", "SL-M"):
+                template["prc"] = "0"
+            self._payload_templates[key] = template
+        return template
+
+    async def modify_order(self, order: 'KniteOrder', price: Optional[float] = None) -> bool:
         """Modify existing order through Flattrade API"""
-        await cls._rate_limiter()
+        await self._rate_limiter(LANE_MODIFY, order.priority)
+        price = order.price if price is None else price
         
         payload = {
             "quantity": abs(order.quantity),
-            "price": order.price,
+            "price": price,
             "triggerprice": order.sl_price
         }
         
-        headers = {"Authorization": f"Bearer {cls._access_token}"}
+        headers = {"Authorization": f"Bearer {self._access_token}"}
         
-        async with cls._session.put(
-            f"{FLATTRADE_BASE_URL}/orders/{order.id}", 
+        async with self._session.put(
+            f"{FLATTRADE_BASE_URL}/orders/{order.broker_order_id or order.id}", 
             json=payload, 
             headers=headers
         ) as resp:
             data = await resp.json()
             if data.get("status") != "success":
                 logging.error(f"Order modification failed: {data}")
+                return False
+        order.price = price
+        return True
 
-    @classmethod
-    async def get_orders(cls, order_ids: List[str]) -> List['Order']:
-        """Batch fetch order statuses"""
-        await cls._rate_limiter()
-        headers = {"Authorization": f"Bearer {cls._access_token}"}
-        orders = []
-        
-        for order_id in order_ids:
-            async with cls._session.get(
-                f"{FLATTRADE_BASE_URL}/orders/{order_id}", 
-                headers=headers
-            ) as resp:
-                data = await resp.json()
-                if data.get("status") == "success":
-                    order_data = data["data"]
-                    orders.append(
-                        Order(
-                            id=order_data["orderid"],
-                            status=order_data["status"],
-                            type=order_data["ordertype"],
-                            filled_qty=int(order_data["filledqty"]),
-                            price=float(order_data["price"]),
-                            quantity=int(order_data["quantity"])
-                        )
-                    )
-        return orders
+    async def cancel_order(self, order: 'KniteOrder') -> bool:
+        """Cancel a working order through Flattrade API"""
+        self._drop_amend(order)
+        await self._rate_limiter(LANE_CANCEL, order.priority)
+        headers = {"Authorization": f"Bearer {self._access_token}"}
 
-    @classmethod
-    async def get_orders_by_tags(cls, tags: List[str]) -> List['Order']:
-        """Fetch orders by their tags"""
-        await cls._rate_limiter()
-        headers = {"Authorization": f"Bearer {cls._access_token}"}
-        all_orders = []
-        
-        async with cls._session.get(
-            f"{FLATTRADE_BASE_URL}/orders", 
+        async with self._session.delete(
+            f"{FLATTRADE_BASE_URL}/orders/{order.broker_order_id or order.id}",
             headers=headers
         ) as resp:
             data = await resp.json()
-            if data.get("status") == "success":
-                for order_data in data["data"]:
-                    if order_data.get("tag") in tags:
-                        all_orders.append(Order(
-                            id=order_data["orderid"],
-                            status=order_data["status"],
-                            type=order_data["ordertype"],
-                            filled_qty=int(order_data["filledqty"]),
-                            price=float(order_data["price"]),
-                            quantity=int(order_data["quantity"])))
-        return all_orders
+            if data.get("status") != "success":
+                logging.error(f"Order cancellation failed: {data}")
+                return False
+        return True
 
-    @classmethod
-    def _map_order_type(cls, knite_type: str) -> str:
-        """Convert Knite order types to Flattrade types"""
-        return {
-            ORDER_TYPE_LIMIT: "L",
-            ORDER_TYPE_SL: "SL-L",
-            ORDER_TYPE_MARKET: "MKT"
-        }[knite_type]
-    #endregion
+    async def get_orders(self, order_ids: List[str]) -> List['Order']:
+        """Batch fetch order statuses with one order-book round trip"""
+        if await self._refresh_book():
+            by_id = self._book.by_id
+            return [self._parse_order(by_id[oid]) for oid in order_ids if oid in by_id]
 
-    #region Daily Cycle
-    @classmethod
-    async def sod(cls):
-        """Start-of-day initialization"""
-        # Pre-fetch critical data
-        await cls._live_pos_mgr.initialize()
-        logging.info("SOD processing complete")
+        # Order book unavailable: bounded concurrent fan-out over the pooled session
+        logging.warning("Order book fetch failed, falling back to per-order status")
+        headers = {"Authorization": f"Bearer {self._access_token}"}
+        sem = asyncio.Semaphore(self.STATUS_FANOUT)
 
-    @classmethod
-    def get_api_client(cls) -> Optional[FlattradeAPI]:
-        """Return the authenticated FlattradeAPI instance."""
-        return cls._api
+        async def fetch(order_id: str) -> Optional['Order']:
+            async with sem:
+                await self._rate_limiter()  # Every GET spends its own query token
+                async with self._session.get(
+                    f"{FLATTRADE_BASE_URL}/orders/{order_id}",
+                    headers=headers
+                ) as resp:
+                    data = await resp.json()
+                    if data.get("status") == "success":
+                        return self._parse_order(data["data"])
+            return None
 
-    @classmethod
-    async def eod(cls):
-        """End-of-day processing"""
-        # Flush all pending orders
-        with cls._lock:
-            cls._orders_to_place.clear()
-            cls._open_orders.clear()
-            
-        # Close WebSocket
-        if cls._ws:
-            await cls._ws.close()
-            
-        logging.info("EOD processing complete")
-    #endregion
+        results = await asyncio.gather(*(fetch(oid) for oid in set(order_ids)), return_exceptions=True)
+        return [o for o in results if isinstance(o, Order)]
 
-#region Supporting Classes
-class PositionState:
-    """
-    Simple position-centric state tracking for OMS. Relies on WebSocket/API for order status.
+    async def get_order_book(self) -> Optional[List[dict]]:
+        """Fetch the full order book in one call and re-index the cache, None on failure"""
+        await self._rate_limiter()
+        headers = {"Authorization": f"Bearer {self._access_token}"}
+        if self._book.etag:
+            headers["If-None-Match"] = self._book.etag
+        try:
+            async with self._session.get(
+                f"{FLATTRADE_BASE_URL}/orders",
+                headers=headers
+            ) as resp:
+                if resp.status == 304:
+                    self._book.touch()
+                    return self._book.rows
+                data = await resp.json()
+                etag = resp.headers.get("ETag")
+        except Exception as e:
+            logging.error(f"Order book request failed: {e}")
+            return None
+        if data.get("status") != "success":
+            return None
+        self._book.load(data["data"], etag)
+        return data["data"]
+
+    async def _refresh_book(self, max_age: float = 0.0) -> bool:
+        """Make the cached order book at most max_age old; concurrent callers share one fetch"""
+        if self._book.age() <= max_age:
+            return True
+        task = self._book_refresh
+        if task is None:
+            task = self._book_refresh = asyncio.ensure_future(self.get_order_book())
+        try:
+            return await asyncio.shield(task) is not None
+        finally:
+            if self._book_refresh is task and task.done():
+                self._book_refresh = None
+
+    def _parse_order(self, order_data: dict) -> 'Order':
+        """Build an Order from a broker order-book row"""
+        return Order(
+            id=order_data["orderid"],
+            status=self._map_order_status(order_data["status"], order_data["status"]),
+            type=BROKER_ORDER_TYPES.get(order_data["ordertype"], order_data["ordertype"]),
+            filled_qty=int(order_data["filledqty"]),
+            price=float(order_data["price"]),
+            quantity=int(order_data["quantity"]),
+            avg_price=float(order_data.get("avgprc") or order_data.get("flprc") or 0)
+        )
+
+    def _map_order_status(self, status: str, default: str) -> str:
+        """Convert Flattrade order statuses to internal ones"""
+        if status in ("REJECTED", "CANCELLED", "CANCELED"):
+            return ORDER_STATUS_REJECTED
+        elif status == "COMPLETE":
+            return ORDER_STATUS_COMPLETE
+        elif status in ("OPEN", "PENDING", "TRIGGER_PENDING"):
+            return ORDER_STATUS_OPEN
+        return default
+    #endregion
+
+    #region Daily Cycle
+    async def warm_up(self, creds: dict, restart_type: Optional[str] = None):
+        """Run the SOD steps concurrently, then start dispatching within STARTUP_BUDGET_SEC"""
+        self._open_event_log()
+        asyncio.create_task(self._ws_listener())
+        steps = {
+            "token": self._validate_token(creds, seed_positions=restart_type is None),
+            "sod": self.sod(),
+            "websocket": self._ws_connected.wait(),
+            "http_prewarm": self._prewarm_http(),
+            "order_book": self._prefetch_order_book(),
+        }
+        tasks = {name: asyncio.create_task(self._timed(name, coro)) for name, coro in steps.items()}
+
+        # Trading needs a good token and the SOD tables; the rest may finish after the budget
+        await asyncio.gather(tasks["token"], tasks["sod"])
+        begin = time.perf_counter()
+        self._open_journal(restart_type)
+        self._mark("journal", begin)
+        remaining = self.STARTUP_BUDGET_SEC - (time.perf_counter() - self._launched_at)
+        optional = [t for name, t in tasks.items() if name not in ("token", "sod")]
+        if remaining > 0:
+            await asyncio.wait(optional, timeout=remaining)
+        late = [name for name, t in tasks.items() if not t.done()]
+
+        ready_ms = (time.perf_counter() - self._launched_at) * 1000
+        self._startup_timeline["ready"] = (ready_ms, ready_ms)
+        self._ready.set()
+        timeline = ", ".join(f"{name} {begin:.0f}-{end:.0f}ms" for name, (begin, end) in self._startup_timeline.items())
+        if ready_ms > self.STARTUP_BUDGET_SEC * 1000 or late:
+            logging.warning(f"Startup over budget ({ready_ms:.0f}ms, still running: {late}): {timeline}")
+        else:
+            logging.info(f"Ready in {ready_ms:.0f}ms: {timeline}")
+
+    async def _timed(self, step: str, coro):
+        """Await a startup step, recording when it ran relative to launch"""
+        begin = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self._mark(step, begin)
+
+    def _mark(self, step: str, begin: float):
+        self._startup_timeline[step] = ((begin - self._launched_at) * 1000,
+                                       (time.perf_counter() - self._launched_at) * 1000)
+
+    async def _validate_token(self, creds: dict, seed_positions: bool):
+        """Check the session with a positions call, logging in again if stale; the result seeds positions"""
+        positions = None
+        try:
+            await self._rate_limiter()
+            positions = await self._api.get_positions()
+        except Exception as e:
+            logging.warning(f"Token check failed: {e}")
+        if not isinstance(positions, list) and not self._token_verified:
+            logging.warning("Cached Flattrade token is invalid or expired. Re-authenticating.")
+            await self._login(creds)
+            positions = await self._api.get_positions()
+        self._token_verified = True
+        self._token_ready.set()
+        if seed_positions:
+            await self._live_pos_mgr.initialize(positions if isinstance(positions, list) else [])
+
+    async def _prewarm_http(self):
+        """Open keep-alive connections to the REST host before the first order needs one"""
+        async def touch():
+            try:
+                await self._rate_limiter()  # Counted against the query lane like any other request
+                async with self._session.head(FLATTRADE_BASE_URL) as response:
+                    await response.read()
+            except Exception as e:
+                logging.debug("HTTP pre-warm request failed: %s", e)
+
+        await asyncio.gather(*(touch() for _ in range(min(self.HTTP_PREWARM_CONNECTIONS, self.HTTP_POOL_SIZE))))
+
+    async def _prefetch_order_book(self):
+        """Snapshot the broker's order book once the token is known to be good"""
+        await self._token_ready.wait()
+        self._startup_order_book = await self.get_order_book() or []
+        working = sum(1 for o in self._startup_order_book
+                      if self._map_order_status(o.get("status"), "") == ORDER_STATUS_OPEN)
+        logging.info(f"Order book at startup: {len(self._startup_order_book)} orders, {working} working")
+
+    def startup_report(self) -> dict:
+        """Startup timeline in ms since launch, with the budget"""
+        return {
+            "budget_ms": self.STARTUP_BUDGET_SEC * 1000,
+            "ready_ms": round(self._startup_timeline.get("ready", (0.0, 0.0))[1], 2),
+            "steps_ms": {name: (round(begin, 2), round(end, 2))
+                         for name, (begin, end) in self._startup_timeline.items() if name != "ready"},
+        }
+
+    async def sod(self):
+        """Start-of-day initialization"""
+        # Scrip master first: payload templates resolve exchange/tsym through it
+        await self.load_instruments()
+
+        # Resolve risk limits into flat per-instrument tables
+        self._risk = RiskEngine(self.RISK_LIMITS, self.RISK_INSTRUMENT_LIMITS)
+
+        # A fresh blotter for the session
+        self._orders = OrderStore(self.BLOTTER_CAPACITY)
+
+        # Prebuild place-order payload templates off the submit path
+        user = self._api.creds['USER']
+        for symbol in self.TRADED_SYMBOLS:
+            exchange = symbol.split(":", 1)[0] if ":" in symbol else DEFAULT_EXCHANGE
+            for order_type in (ORDER_TYPE_LIMIT, ORDER_TYPE_SL, ORDER_TYPE_MARKET):
+                self._payload_template(user, exchange, symbol, 'I', order_type)
+        logging.info("SOD processing complete")
+
+    async def load_instruments(self) -> Optional['InstrumentMaster']:
+        """Open today's compiled instrument index, compiling it from the scrip master first if needed"""
+        path = os.path.join(self.INSTRUMENT_DIR, f"instruments_{date.today().isoformat()}.idx")
+        if not os.path.exists(path):
+            sources = list(self.SCRIP_MASTER_FILES)
+            for url in self.SCRIP_MASTER_URLS:
+                source = await self._download_scrip_master(url)
+                if source:
+                    sources.append(source)
+            if not sources:
+                logging.warning("No scrip master configured; instruments resolve from order fields only")
+                return None
+            start = time.perf_counter()
+            count = await asyncio.get_running_loop().run_in_executor(None, InstrumentMaster.compile, sources, path)
+            logging.info(f"Compiled {count} instruments into {path} in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        if self._instruments is not None:
+            self._instruments.close()
+        self._instruments = InstrumentMaster(path)
+        return self._instruments
+
+    async def _download_scrip_master(self, url: str) -> Optional[str]:
+        """Fetch one scrip master file into INSTRUMENT_DIR"""
+        target = os.path.join(self.INSTRUMENT_DIR, url.rstrip("/").rsplit("/", 1)[-1] or "scripmaster.txt")
+        self._ensure_session()
+        try:
+            async with self._session.get(url) as response:
+                response.raise_for_status()
+                data = await response.read()
+        except Exception as e:
+            logging.error(f"Scrip master download from {url} failed: {e}")
+            return None
+        with open(target, "wb") as f:
+            f.write(data)
+        return target
+
+    def instrument(self, symbol: str, exchange: Optional[str] = None) -> Optional['Instrument']:
+        """Scrip master entry for "EXCH:TSYM" or a bare trading symbol"""
+        if self._instruments is None:
+            return None
+        return self._instruments.by_symbol(symbol, exchange)
+
+    def _resolve_instrument(self, order: 'KniteOrder'):
+        """Fill in exchange, token and tick size from the scrip master"""
+        instrument = self.instrument(order.symbol, order.exchange)
+        if instrument is not None:
+            # Same as order.exchange unless the symbol itself is "EXCH:TSYM"
+            order.exchange = instrument.exchange
+            order.token = instrument.token
+            order.tick_size = instrument.tick_size
+
+    def get_api_client(self) -> Optional[FlattradeAPI]:
+        """Return the authenticated FlattradeAPI instance."""
+        return self._api
+
+    async def eod(self):
+        """End-of-day processing"""
+        # Flush all pending orders
+        self.scheduler().clear()
+        self._amend_pending.clear()
+        self._amend_inflight.clear()
+        self._open_orders.clear()
+        self._errored_orders.clear()
+        self._orphaned_orders.clear()
+        self._book.clear()
+            
+        # Close WebSockets
+        if self._ws:
+            await self._ws.close()
+        standby, self._ws_standby = self._ws_standby, None
+        if standby is not None:
+            standby[1].cancel()
+            await standby[0].close()
+
+        # Commit and close the journal
+        if self._journal_flusher is not None:
+            self._journal_flusher.cancel()
+            self._journal_flusher = None
+        if self._journal_sync is not None:
+            await asyncio.wait([self._journal_sync])  # close() must not unmap under a running msync
+            self._journal_sync = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self._event_log is not None:
+            self._event_log.close()
+            self._event_log = None
+
+        if self._instruments is not None:
+            self._instruments.close()
+            self._instruments = None
+        self._ready.clear()
+        self._token_ready.clear()
+
+        # Release pooled HTTP connections
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            
+        logging.info("EOD processing complete")
+    #endregion
+
+#region Supporting Classes
+class PositionState:
+    """
+    Simple position-centric state tracking for OMS. Relies on WebSocket/API for order status.
     """
     def __init__(self):
         self.active = False
@@ -602,21 +1937,73 @@ class PositionState:
         self.sl_trigger_price = None
 
 class Order:
-    __slots__ = ('id', 'status', 'type', 'filled_qty', 'price', 'quantity')
+    __slots__ = ('id', 'status', 'type', 'filled_qty', 'price', 'quantity', 'avg_price')
     
-    def __init__(self, id: str, status: str, type: str, filled_qty: int, price: float, quantity: int):
+    def __init__(self, id: str, status: str, type: str, filled_qty: int, price: float, quantity: int,
+                 avg_price: float = 0.0):
         self.id = id
         self.status = status
         self.type = type
         self.filled_qty = filled_qty
-        self.price = price
+        self.price = price  # Limit price as placed; 0 for MARKET
         self.quantity = quantity
+        self.avg_price = avg_price  # Average traded price of filled_qty
+
+class OrderBookCache:
+    """Last broker order-book snapshot, indexed by order id and by client tag.
+
+    A refresh re-indexes the book once; reconciling k local orders is then k
+    dict hits instead of a scan of the whole book per order.
+    """
+    __slots__ = ('rows', 'by_id', 'by_tag', 'etag', 'fetched_at', 'refreshes', 'not_modified')
+
+    def __init__(self):
+        self.clear()
+
+    def load(self, rows: List[dict], etag: Optional[str] = None):
+        by_id = {}
+        by_tag = {}
+        for row in rows:
+            by_id[row["orderid"]] = row
+            tag = row.get("remarks") or row.get("tag")
+            if tag:
+                by_tag[tag] = row
+        self.rows = rows
+        self.by_id = by_id
+        self.by_tag = by_tag
+        self.etag = etag
+        self.fetched_at = time.monotonic()
+        self.refreshes += 1
+
+    def touch(self):
+        """The broker answered 304: the snapshot is current again"""
+        self.fetched_at = time.monotonic()
+        self.not_modified += 1
+
+    def age(self) -> float:
+        """Seconds since the snapshot was taken, inf before the first one"""
+        return time.monotonic() - self.fetched_at if self.fetched_at else float("inf")
+
+    def clear(self):
+        self.rows: List[dict] = []
+        self.by_id: Dict[str, dict] = {}
+        self.by_tag: Dict[str, dict] = {}
+        self.etag: Optional[str] = None
+        self.fetched_at = 0.0
+        self.refreshes = 0
+        self.not_modified = 0
+
+    def stats(self) -> dict:
+        return {"orders": len(self.rows), "tags": len(self.by_tag), "refreshes": self.refreshes,
+                "not_modified": self.not_modified,
+                "age_sec": round(self.age(), 3) if self.fetched_at else None}
 
 class KniteOrder:
     __slots__ = ('id', 'order_type', 'quantity', 'price', 'instrument', 
                  'status', 'created_at', 'tag', 'sl_price', 'parent', 
                  'is_retried', 'is_barrier', 'is_exit_order', 'expected_price',
-                 'filled_qty', 'exchange', 'symbol', 'is_high_priority', 'stop_breached', 'product_type')
+                 'filled_qty', 'exchange', 'symbol', 'is_high_priority', 'stop_breached', 'product_type',
+                 'token', 'broker_order_id', 'tick_size', 'deadline', 'row', 'limit_price')
     
     def __init__(self, order_type: str, product_type: str = 'I'):
         self.id = generate_order_id()
@@ -635,19 +2022,28 @@ class KniteOrder:
         self.is_exit_order = False
         self.expected_price = 0.0
         self.filled_qty = 0
-        self.exchange = "NSE"
+        self.exchange = DEFAULT_EXCHANGE
         self.symbol = ""
         self.is_high_priority = False
         self.stop_breached = False
+        self.token = ""
+        self.broker_order_id = None
+        self.tick_size = 0.05
+        self.deadline = 0.0  # time.monotonic() to be on the wire by; 0 uses the class budget
+        self.row = -1  # OrderStore blotter row, -1 until it reaches the submit path
+        self.limit_price = 0.0  # Price as placed; opt-in repricing stays within LIMIT_REPRICE_MAX_TICKS of it
         
     def parse_order(self, export_order) -> bool:
         """Convert export order to executable order"""
-        # Parsing logic
         self.quantity = export_order.quantity
         self.price = export_order.price
         self.symbol = export_order.symbol
         self.tag = export_order.tag
-        return True
+        if export_order.exchange:
+            self.exchange = export_order.exchange
+        self.token = export_order.token or ""
+        self.sl_price = export_order.sl_price or 0.0
+        return bool(self.symbol) and self.quantity != 0
         
     def order_timed_out(self, current_time: float, timeout: int) -> bool:
         return current_time - self.created_at > timeout
@@ -660,37 +2056,1621 @@ class KniteOrder:
     def is_open(self) -> bool:
         return self.status == ORDER_STATUS_OPEN
 
-class PositionMgr:
-    async def initialize(self):
-        """Pre-load position data"""
-        pass
-        
-    def open_position(self, order: KniteOrder) -> bool:
-        """Atomic position opening"""
+    @property
+    def instrument_key(self) -> str:
+        """Feed key "EXCH|token" used by ticks, falling back to the symbol"""
+        if self.token:
+            return f"{self.exchange}|{self.token}"
+        return self.symbol
+
+    @property
+    def client_tag(self) -> str:
+        """Unique per order; sent as the broker order's remarks so recovery can match it exactly.
+
+        The strategy's tag is not unique and stays local to the OMS.
+        """
+        return str(self.id)
+
+    @property
+    def priority(self) -> int:
+        """Rate-limit priority: exits and stop-losses go first"""
+        if self.is_exit_order or self.is_high_priority or self.is_sl_order:
+            return PRIORITY_EXIT
+        return PRIORITY_NORMAL
+
+class OrderStore:
+    """Session order store: a columnar blotter of every order placed.
+
+    Every order that reaches the submit path gets a row (KniteOrder.row) in a
+    NumPy structured array, refreshed at each state transition and fill, so
+    intraday queries are array operations over all session orders rather than
+    loops over dicts of objects.
+    """
+    DTYPE = np.dtype([
+        ("id", "i8"), ("sym", "i4"), ("status", "u1"), ("flags", "u1"),
+        ("quantity", "i8"), ("price", "f8"), ("expected_price", "f8"),
+        ("filled_qty", "i8"), ("fill_value", "f8"), ("created_at", "f8"),
+    ])
+    STATUS_PENDING, STATUS_OPEN, STATUS_COMPLETE, STATUS_REJECTED = range(4)
+    STATUS_CODES = {ORDER_STATUS_OPEN: STATUS_OPEN, ORDER_STATUS_COMPLETE: STATUS_COMPLETE,
+                    ORDER_STATUS_REJECTED: STATUS_REJECTED}
+    FLAG_EXIT, FLAG_SL = 1, 2
+
+    def __init__(self, capacity: int = 1 << 14):
+        self._rows = np.zeros(max(1, capacity), dtype=self.DTYPE)
+        self._bind_columns()
+        self._n = 0
+        self._symbols: List[str] = []
+        self._sym_index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _bind_columns(self):
+        # Column views for the per-transition updates; rebound when the array grows
+        rows = self._rows
+        self._id, self._status, self._filled, self._fill_value = (
+            rows["id"], rows["status"], rows["filled_qty"], rows["fill_value"])
+
+    #region Blotter
+    def record(self, order: 'KniteOrder'):
+        """Give an order its blotter row (once)"""
+        if order.row >= 0 and order.row < self._n and self._id[order.row] == order.id:
+            return
+        n = self._n
+        if n == len(self._rows):
+            self._rows = np.concatenate((self._rows, np.zeros(n, dtype=self.DTYPE)))
+            self._bind_columns()
+        sym = self._sym_index.get(order.symbol)
+        if sym is None:
+            sym = self._sym_index[order.symbol] = len(self._symbols)
+            self._symbols.append(order.symbol)
+        flags = (self.FLAG_EXIT if order.is_exit_order else 0) | (self.FLAG_SL if order.is_sl_order else 0)
+        self._rows[n] = (order.id, sym, self.STATUS_CODES.get(order.status, self.STATUS_PENDING), flags,
+                         order.quantity, order.price or 0.0, order.expected_price or 0.0,
+                         order.filled_qty, 0.0, order.created_at)
+        order.row = n
+        self._n = n + 1
+
+    def sync(self, order: 'KniteOrder'):
+        """Copy status and cumulative fill into the order's row"""
+        row = order.row
+        if row < 0 or row >= self._n or self._id[row] != order.id:
+            return  # Never recorded, or recorded in an earlier session
+        self._status[row] = self.STATUS_CODES.get(order.status, self.STATUS_PENDING)
+        self._filled[row] = order.filled_qty
+
+    def on_fill(self, order: 'KniteOrder', delta: int, price: float):
+        """Accumulate the traded value of a fill, for average fill prices"""
+        row = order.row
+        if row < 0 or row >= self._n or self._id[row] != order.id:
+            return
+        self._fill_value[row] += abs(delta) * price
+
+    def view(self) -> np.ndarray:
+        """The session's rows (a view; do not hold across submissions)"""
+        return self._rows[:self._n]
+
+    def fills_by_symbol(self) -> Dict[str, Tuple[int, float]]:
+        """Signed filled quantity and average fill price per symbol"""
+        rows = self.view()
+        mask = rows["filled_qty"] > 0
+        sym = rows["sym"][mask]
+        filled = rows["filled_qty"][mask].astype(np.float64)
+        n_sym = len(self._symbols)
+        net = np.bincount(sym, weights=filled * np.sign(rows["quantity"][mask]), minlength=n_sym)
+        gross = np.bincount(sym, weights=filled, minlength=n_sym)
+        value = np.bincount(sym, weights=rows["fill_value"][mask], minlength=n_sym)
+        return {self._symbols[i]: (int(net[i]), float(value[i] / gross[i])) for i in np.flatnonzero(gross)}
+
+    def slippage(self) -> Dict[str, Tuple[float, float]]:
+        """Per symbol: slippage per unit against expected_price and its total cost; positive is adverse"""
+        rows = self.view()
+        mask = (rows["filled_qty"] > 0) & (rows["expected_price"] > 0) & (rows["fill_value"] > 0)
+        sym = rows["sym"][mask]
+        filled = rows["filled_qty"][mask].astype(np.float64)
+        avg = rows["fill_value"][mask] / filled
+        cost = (avg - rows["expected_price"][mask]) * np.sign(rows["quantity"][mask]) * filled
+        n_sym = len(self._symbols)
+        cost_by = np.bincount(sym, weights=cost, minlength=n_sym)
+        qty_by = np.bincount(sym, weights=filled, minlength=n_sym)
+        return {self._symbols[i]: (float(cost_by[i] / qty_by[i]), float(cost_by[i]))
+                for i in np.flatnonzero(qty_by)}
+
+    def open_exposure(self) -> Dict[str, Tuple[int, float]]:
+        """Signed unfilled quantity and notional of working orders, per symbol"""
+        rows = self.view()
+        mask = rows["status"] <= self.STATUS_OPEN
+        qty = rows["quantity"][mask]
+        remaining = (np.abs(qty) - rows["filled_qty"][mask]).clip(min=0) * np.sign(qty)
+        sym = rows["sym"][mask]
+        n_sym = len(self._symbols)
+        working = np.bincount(sym, weights=remaining, minlength=n_sym)
+        notional = np.bincount(sym, weights=remaining * rows["price"][mask], minlength=n_sym)
+        return {self._symbols[i]: (int(working[i]), float(notional[i])) for i in np.flatnonzero(working)}
+
+    def stats(self) -> dict:
+        return {"orders": self._n, "symbols": len(self._symbols), "capacity": len(self._rows)}
+    #endregion
+
+class TokenBucket:
+    """Token bucket for one API lane with priority-ordered waiters"""
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.throttled_sec = 0.0
+        self.throttled_count = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = 0
+        self._drainer: Optional[asyncio.Task] = None
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL):
+        """Take a token, queueing behind higher-priority waiters if empty"""
+        start = time.monotonic()
+        self._refill(start)
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._waiters, (priority, self._seq, fut))
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.create_task(self._drain())
+        try:
+            await fut
+        finally:
+            self.throttled_sec += time.monotonic() - start
+            self.throttled_count += 1
+
+    async def _drain(self):
+        """Hand out tokens to waiters in priority order as they refill"""
+        while self._waiters:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                _, _, fut = heapq.heappop(self._waiters)
+                if fut.done():  # Waiter was cancelled
+                    continue
+                self.tokens -= 1
+                fut.set_result(None)
+            else:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class OrderScheduler:
+    """Priority classes of placement work, each a heap keyed by (epoch, deadline, seq).
+
+    Classes are served strictly in SCHED_* order, earliest deadline first
+    within a class. A barrier closes its class's epoch, so nothing queued
+    after it can sort ahead of it. A lower class whose head has overshot
+    its MAX_WAIT_SEC budget is promoted, at most once every PROMOTE_EVERY
+    dispatches, never while panic or stop-loss exits are queued and never
+    past a class that still has a barrier queued.
+    """
+    MAX_WAIT_SEC = {SCHED_EXIT: 0.5, SCHED_AMEND: 0.25, SCHED_ENTRY: 1.0}
+    PROMOTE_EVERY = 4
+
+    def __init__(self):
+        self._heaps: List[list] = [[] for _ in SCHED_CLASS_NAMES]
+        self._epochs = [0] * len(SCHED_CLASS_NAMES)
+        self._barriers = [0] * len(SCHED_CLASS_NAMES)  # Queued barriers per class (open epochs)
+        self._seq = 0
+        self._since_promotion = self.PROMOTE_EVERY
+        self._size = 0
+        self.enqueued = [0] * len(SCHED_CLASS_NAMES)
+        self.dispatched = [0] * len(SCHED_CLASS_NAMES)
+        self.promoted = [0] * len(SCHED_CLASS_NAMES)
+        self.wait_hist = [LatencyHistogram() for _ in SCHED_CLASS_NAMES]
+
+    @staticmethod
+    def classify(order: 'KniteOrder') -> int:
+        if order.is_sl_order or (order.is_exit_order and order.is_high_priority):
+            return SCHED_SL_EXIT
+        if order.is_exit_order:
+            return SCHED_EXIT
+        return SCHED_ENTRY
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, order: 'KniteOrder', klass: int):
+        now = time.monotonic()
+        epoch = self._epochs[klass]
+        if order.is_barrier:
+            deadline = math.inf
+            self._epochs[klass] += 1
+            self._barriers[klass] += 1
+        else:
+            deadline = order.deadline or now + self.MAX_WAIT_SEC.get(klass, 0.0)
+        self._seq += 1
+        heapq.heappush(self._heaps[klass], (epoch, deadline, self._seq, now, order))
+        self.enqueued[klass] += 1
+        self._size += 1
+
+    def _top(self) -> int:
+        for klass, heap in enumerate(self._heaps):
+            if heap:
+                return klass
+        return -1
+
+    def peek(self) -> Optional[Tuple[int, 'KniteOrder']]:
+        """(class, order) that should go next, without removing it"""
+        klass = self._top()
+        if klass < 0:
+            return None
+        top = klass
+        if top > SCHED_SL_EXIT and not self._barriers[top] and self._since_promotion >= self.PROMOTE_EVERY:
+            now = time.monotonic()
+            worst = 0.0
+            for lower in range(top + 1, len(self._heaps)):
+                heap = self._heaps[lower]
+                if heap and now - heap[0][1] > worst:
+                    klass, worst = lower, now - heap[0][1]
+                if self._barriers[lower]:
+                    break  # Classes below wait for this batch
+        return klass, self._heaps[klass][0][4]
+
+    def pop(self, klass: int) -> 'KniteOrder':
+        now = time.monotonic()
+        _, _, _, enqueued_at, order = heapq.heappop(self._heaps[klass])
+        self._size -= 1
+        if order.is_barrier:
+            self._barriers[klass] -= 1
+        top = self._top()
+        if 0 <= top < klass:  # Served ahead of a higher class
+            self.promoted[klass] += 1
+            self._since_promotion = 0
+        else:
+            self._since_promotion += 1
+        self.dispatched[klass] += 1
+        self.wait_hist[klass].record(int((now - enqueued_at) * 1e9))
+        return order
+
+    def drop(self, klass: int) -> List['KniteOrder']:
+        """Remove and return everything queued in one class"""
+        heap = self._heaps[klass]
+        orders = [entry[4] for entry in heap]
+        heap.clear()
+        self._size -= len(orders)
+        self._barriers[klass] = 0
+        return orders
+
+    def remove(self, klass: int, order: 'KniteOrder') -> bool:
+        """Take one queued order out of a class; False if it is not queued there"""
+        heap = self._heaps[klass]
+        kept = [entry for entry in heap if entry[4] is not order]
+        if len(kept) == len(heap):
+            return False
+        heap[:] = kept
+        heapq.heapify(heap)
+        self._size -= 1
         return True
-        
-    def close_position(self, order: KniteOrder) -> bool:
-        """Atomic position closing"""
+
+    def clear(self):
+        for heap in self._heaps:
+            heap.clear()
+        self._barriers = [0] * len(SCHED_CLASS_NAMES)
+        self._size = 0
+
+    def stats(self) -> dict:
+        """Depth, throughput and wait-time percentiles per class"""
+        return {
+            name: {
+                "depth": len(self._heaps[k]),
+                "enqueued": self.enqueued[k],
+                "dispatched": self.dispatched[k],
+                "promoted": self.promoted[k],
+                "wait_us": self.wait_hist[k].summary(),
+            }
+            for k, name in enumerate(SCHED_CLASS_NAMES)
+        }
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of nanosecond values.
+
+    Each power of two is split into 16 linear sub-buckets, so any recorded
+    value is reported within ~6% using a fixed 976-slot counts array;
+    recording is a bit_length, a shift and an array increment.
+    """
+    SUB_BITS = 4
+    SUB_COUNT = 1 << SUB_BITS
+
+    def __init__(self):
+        self.counts = array('q', bytes(8 * 61 * self.SUB_COUNT))
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value_ns: int):
+        if value_ns < self.SUB_COUNT:
+            idx = max(0, value_ns)
+        else:
+            shift = value_ns.bit_length() - self.SUB_BITS - 1
+            idx = ((shift + 1) << self.SUB_BITS) + ((value_ns >> shift) - self.SUB_COUNT)
+        self.counts[idx] += 1
+        if not self.count or value_ns < self.min:
+            self.min = value_ns
+        if value_ns > self.max:
+            self.max = value_ns
+        self.count += 1
+        self.total += value_ns
+
+    def _bucket_value(self, idx: int) -> int:
+        if idx < self.SUB_COUNT:
+            return idx
+        shift = (idx >> self.SUB_BITS) - 1
+        return (self.SUB_COUNT + (idx & (self.SUB_COUNT - 1))) << shift
+
+    def quantiles_us(self, quantiles: Tuple[float, ...]) -> List[Tuple[float, float]]:
+        """(quantile, value in microseconds) pairs, one pass over the buckets"""
+        out = []
+        if not self.count:
+            return [(q, 0.0) for q in quantiles]
+        targets = sorted(quantiles)
+        seen = 0
+        t = 0
+        for idx, n in enumerate(self.counts):
+            if not n:
+                continue
+            seen += n
+            while t < len(targets) and seen >= targets[t] * self.count:
+                out.append((targets[t], min(self._bucket_value(idx), self.max) / 1000))
+                t += 1
+            if t == len(targets):
+                break
+        return out
+
+    def summary(self) -> dict:
+        q = dict(self.quantiles_us((0.5, 0.9, 0.99, 0.999)))
+        return {
+            "n": self.count,
+            "mean": round(self.total / self.count / 1000, 2) if self.count else 0.0,
+            "p50": q[0.5], "p90": q[0.9], "p99": q[0.99], "p999": q[0.999],
+            "max": self.max / 1000,
+        }
+
+class MarketDataCache:
+    """Per-instrument LTP/bid/ask cache in flat columns indexed by slot.
+
+    Each instrument key gets a slot on first sight; ticks overwrite the
+    fields they carry (Flattrade sends partial updates), bump the slot's
+    sequence number and stamp it with time.monotonic() for staleness checks.
+    """
+    def __init__(self):
+        self._slots: Dict[str, int] = {}
+        self.ltps = array('d')
+        self.bids = array('d')
+        self.asks = array('d')
+        self.updated = array('d')
+        self.seqs = array('q')
+
+    def slot(self, key: str) -> int:
+        """Slot index for a key, allocating one if needed"""
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = len(self.seqs)
+            self.ltps.append(0.0)
+            self.bids.append(0.0)
+            self.asks.append(0.0)
+            self.updated.append(0.0)
+            self.seqs.append(0)
+        return slot
+
+    def update(self, key: str, ltp=None, bid=None, ask=None) -> Optional[float]:
+        """Apply a (possibly partial) tick; returns the new LTP if it carried one"""
+        slot = self.slot(key)
+        if bid is not None:
+            self.bids[slot] = float(bid)
+        if ask is not None:
+            self.asks[slot] = float(ask)
+        self.seqs[slot] += 1
+        self.updated[slot] = time.monotonic()
+        if ltp is None:
+            return None
+        ltp = self.ltps[slot] = float(ltp)
+        return ltp
+
+    def ltp(self, key: str, max_age: Optional[float] = None) -> Optional[float]:
+        slot = self._slots.get(key)
+        if slot is None or not self.seqs[slot] or not self.ltps[slot]:
+            return None
+        if max_age is not None and time.monotonic() - self.updated[slot] > max_age:
+            return None
+        return self.ltps[slot]
+
+    def quote(self, key: str) -> Optional[Tuple[float, float, float, int, float]]:
+        """(ltp, bid, ask, seq, age_sec) for a key, None if never ticked"""
+        slot = self._slots.get(key)
+        if slot is None or not self.seqs[slot]:
+            return None
+        return (self.ltps[slot], self.bids[slot], self.asks[slot], self.seqs[slot],
+                time.monotonic() - self.updated[slot])
+
+class Instrument:
+    """One scrip master row"""
+    __slots__ = ('exchange', 'token', 'tsym', 'lot_size', 'tick_size', 'lower_band', 'upper_band')
+
+    def __init__(self, exchange: str, token: str, tsym: str, lot_size: int, tick_size: float,
+                 lower_band: float = 0.0, upper_band: float = 0.0):
+        self.exchange = exchange
+        self.token = token
+        self.tsym = tsym
+        self.lot_size = lot_size
+        self.tick_size = tick_size
+        self.lower_band = lower_band  # 0 when the scrip master has no circuit limits
+        self.upper_band = upper_band
+
+    @property
+    def key(self) -> str:
+        return f"{self.exchange}|{self.token}"
+
+class InstrumentMaster:
+    """Scrip master compiled into a memory-mapped, open-addressed index.
+
+    File layout: header, fixed-size records, a symbol table and a token
+    table (int32 record numbers, -1 empty, linear probing on crc32) and
+    the trading-symbol strings. The symbol table holds "EXCH:TSYM" and,
+    for the first exchange listing it, the bare tsym; the token table
+    holds "EXCH|token". Opening is an mmap and a header read, and a
+    lookup hashes the key and decodes the one record it lands on.
+    """
+    MAGIC = b"OMSIDX01"
+    HEADER = struct.Struct("<8sIII")  # magic, records, slots per table, strings offset
+    RECORD = struct.Struct("<8sIidddII")  # exch, token, lot, tick, lower, upper, tsym offset, tsym length
+    COLUMNS = {
+        "exchange": "exch", "exch": "exch", "token": "token",
+        "lotsize": "lot", "ls": "lot", "tradingsymbol": "tsym", "tsym": "tsym",
+        "ticksize": "tick", "ti": "tick",
+        "lowercircuit": "lower", "lc": "lower", "uppercircuit": "upper", "uc": "upper",
+    }
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._slots, self._strings = self.HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not an instrument index")
+        sym_off = self.HEADER.size + self.count * self.RECORD.size
+        tok_off = sym_off + 4 * self._slots
+        view = memoryview(self._mm)
+        self._sym_table = view[sym_off:tok_off].cast('i')
+        self._tok_table = view[tok_off:tok_off + 4 * self._slots].cast('i')
+        view.release()
+        self._cache: Dict[str, Optional[Instrument]] = {}
+
+    def close(self):
+        for name in ("_sym_table", "_tok_table"):
+            table = getattr(self, name, None)
+            if table is not None:
+                table.release()
+                setattr(self, name, None)
+        if not self._mm.closed:
+            self._mm.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _record(self, rec: int) -> Tuple[bytes, int, bytes]:
+        exch, token, _, _, _, _, off, length = self.RECORD.unpack_from(
+            self._mm, self.HEADER.size + rec * self.RECORD.size)
+        return exch.rstrip(b"\0"), token, self._mm[self._strings + off:self._strings + off + length]
+
+    def _decode(self, rec: int) -> 'Instrument':
+        exch, token, lot, tick, lower, upper, off, length = self.RECORD.unpack_from(
+            self._mm, self.HEADER.size + rec * self.RECORD.size)
+        tsym = self._mm[self._strings + off:self._strings + off + length].decode()
+        return Instrument(exch.rstrip(b"\0").decode(), str(token), tsym, lot, tick, lower, upper)
+
+    def _probe(self, table, key: str, by_token: bool) -> Optional['Instrument']:
+        cached = self._cache.get(key, False)
+        if cached is not False:
+            return cached
+        raw = key.encode()
+        mask = self._slots - 1
+        i = zlib.crc32(raw) & mask
+        found = None
+        while True:
+            rec = table[i]
+            if rec < 0:
+                break
+            exch, token, tsym = self._record(rec)
+            if by_token:
+                hit = raw == exch + b"|" + str(token).encode()
+            else:
+                hit = raw == tsym or raw == exch + b":" + tsym
+            if hit:
+                found = self._decode(rec)
+                break
+            i = (i + 1) & mask
+        self._cache[key] = found
+        return found
+
+    def by_symbol(self, symbol: str, exchange: Optional[str] = None) -> Optional['Instrument']:
+        """Lookup by "EXCH:TSYM", or by tsym on one exchange, or by bare tsym"""
+        if exchange and ":" not in symbol:
+            symbol = f"{exchange}:{symbol}"
+        return self._probe(self._sym_table, symbol, False)
+
+    def by_token(self, exchange: str, token: str) -> Optional['Instrument']:
+        return self._probe(self._tok_table, f"{exchange}|{token}", True)
+
+    @classmethod
+    def _rows(cls, source: str) -> Iterator[dict]:
+        """Rows of a scrip master CSV/TXT (or the first file in a .zip), keyed by canonical column"""
+        if source.lower().endswith(".zip"):
+            with zipfile.ZipFile(source) as archive:
+                text = archive.read(archive.namelist()[0]).decode("utf-8", "replace")
+        else:
+            with open(source, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+        reader = csv.reader(io.StringIO(text))
+        header = [cls.COLUMNS.get(c.strip().lower()) for c in next(reader, [])]
+        for row in reader:
+            yield {name: value.strip() for name, value in zip(header, row) if name}
+
+    @classmethod
+    def compile(cls, sources: List[str], path: str) -> int:
+        """Parse scrip master files into an index at path (written atomically); returns records kept"""
+        records = []
+        strings = bytearray()
+        sym_keys: Dict[bytes, int] = {}
+        tok_keys: Dict[bytes, int] = {}
+        for source in sources:
+            for row in cls._rows(source):
+                exch, token, tsym = row.get("exch", ""), row.get("token", ""), row.get("tsym", "")
+                if not (exch and tsym and token.isdigit()):
+                    continue
+                tok_key = f"{exch}|{token}".encode()
+                if tok_key in tok_keys:
+                    continue
+                try:
+                    lot = int(float(row.get("lot") or 1))
+                    tick = float(row.get("tick") or 0.05)
+                    lower = float(row.get("lower") or 0.0)
+                    upper = float(row.get("upper") or 0.0)
+                except ValueError:
+                    continue
+                rec = len(records)
+                raw_tsym = tsym.encode()
+                records.append((exch.encode(), int(token), lot, tick, lower, upper, len(strings), len(raw_tsym)))
+                strings += raw_tsym
+                tok_keys[tok_key] = rec
+                sym_keys.setdefault(exch.encode() + b":" + raw_tsym, rec)
+                sym_keys.setdefault(raw_tsym, rec)
+
+        slots = 1 << max(4, (2 * len(sym_keys)).bit_length())  # Load factor <= 0.5
+        mask = slots - 1
+        tables = []
+        for keys in (sym_keys, tok_keys):
+            table = array('i', [-1]) * slots
+            for key, rec in keys.items():
+                i = zlib.crc32(key) & mask
+                while table[i] >= 0:
+                    i = (i + 1) & mask
+                table[i] = rec
+            tables.append(table)
+
+        strings_off = cls.HEADER.size + len(records) * cls.RECORD.size + 2 * 4 * slots
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, len(records), slots, strings_off))
+            for record in records:
+                f.write(cls.RECORD.pack(*record))
+            for table in tables:
+                f.write(table.tobytes())
+            f.write(strings)
+        os.replace(tmp, path)
+        return len(records)
+
+class SlTriggerBook:
+    """Resting stop-losses for one instrument, indexed by trigger price.
+
+    Sell stops (protecting longs) fire when the price falls to the trigger and
+    sit in a max-heap; buy stops (protecting shorts) fire when it rises to the
+    trigger and sit in a min-heap. A tick only pops the stops it crossed, and
+    cancels are lazy so nothing is ever removed from the middle of a heap.
+    """
+    def __init__(self):
+        self._sell_stops: List[Tuple[float, int, 'KniteOrder']] = []  # (-trigger, seq, order)
+        self._buy_stops: List[Tuple[float, int, 'KniteOrder']] = []   # (trigger, seq, order)
+        self._live: Set[int] = set()
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    @staticmethod
+    def crossed(exit_qty: int, trigger: float, ltp: float) -> bool:
+        """True if a stop flattening with exit_qty would fire at ltp"""
+        return ltp <= trigger if exit_qty < 0 else ltp >= trigger
+
+    def add(self, order: 'KniteOrder'):
+        self._seq += 1
+        if order.quantity < 0:
+            heapq.heappush(self._sell_stops, (-order.price, self._seq, order))
+        else:
+            heapq.heappush(self._buy_stops, (order.price, self._seq, order))
+        self._live.add(order.id)
+
+    def cancel(self, order: 'KniteOrder') -> bool:
+        """Drop a resting stop; returns False if it already fired or was cancelled"""
+        if order.id not in self._live:
+            return False
+        self._live.discard(order.id)
+        # Rebuild once cancelled entries dominate the heaps
+        if len(self._sell_stops) + len(self._buy_stops) > 2 * len(self._live) + 64:
+            self._sell_stops = [e for e in self._sell_stops if e[2].id in self._live]
+            self._buy_stops = [e for e in self._buy_stops if e[2].id in self._live]
+            heapq.heapify(self._sell_stops)
+            heapq.heapify(self._buy_stops)
         return True
+
+    def on_tick(self, ltp: float) -> List['KniteOrder']:
+        """Pop every live stop crossed by ltp"""
+        fired = []
+        sells = self._sell_stops
+        while sells and ltp <= -sells[0][0]:
+            order = heapq.heappop(sells)[2]
+            if order.id in self._live:
+                self._live.discard(order.id)
+                fired.append(order)
+        buys = self._buy_stops
+        while buys and ltp >= buys[0][0]:
+            order = heapq.heappop(buys)[2]
+            if order.id in self._live:
+                self._live.discard(order.id)
+                fired.append(order)
+        return fired
+
+class ExportOrder:
+    """One validated basket leg"""
+    __slots__ = ('symbol', 'quantity', 'price', 'tag', 'exchange', 'token', 'sl_price')
+
+    def __init__(self, symbol: str, quantity: int, price: float, tag: str,
+                 exchange: str = None, token: str = None, sl_price: float = 0.0):
+        self.symbol = symbol
+        self.quantity = quantity
+        self.price = price
+        self.tag = tag
+        self.exchange = exchange
+        self.token = token
+        self.sl_price = sl_price
+
+class BasketReader:
+    """Streams validated legs out of a memory-mapped CSV or JSONL basket.
+
+    Lines are taken CHUNK_ROWS at a time and each chunk's qty/price
+    columns are converted and range-checked as NumPy arrays, so the
+    first chunk can be queued while the rest of the file is still unread.
+    """
+    REQUIRED = ("symbol", "qty", "price", "tag")
+    OPTIONAL = ("exchange", "token", "sl_price")
+    ALIASES = {"quantity": "qty", "tsym": "symbol", "tradingsymbol": "symbol", "exch": "exchange"}
+    CHUNK_ROWS = 256
+
+    def __init__(self, path: str):
+        self.path = path
+        self.is_jsonl = path.lower().endswith((".jsonl", ".ndjson"))
+        self.rows = 0
+        self.rejected = 0
+
+    @classmethod
+    def _column(cls, name: str) -> str:
+        name = name.strip().lower()
+        return cls.ALIASES.get(name, name)
+
+    def _lines(self, mm: mmap.mmap) -> Iterator[Tuple[int, bytes]]:
+        """(first line number, record) pairs; a quoted CSV field may run over several lines"""
+        pos, lineno, size = 0, 0, len(mm)
+        csv_quotes = not self.is_jsonl
+        while pos < size:
+            end = mm.find(b"\n", pos)
+            if end < 0:
+                end = size
+            first = lineno = lineno + 1
+            line = mm[pos:end]
+            # An odd quote count means a quoted CSV field continues on the next line
+            while csv_quotes and end < size and line.count(b'"') % 2:
+                next_end = mm.find(b"\n", end + 1)
+                end = size if next_end < 0 else next_end
+                line = mm[pos:end]
+                lineno += 1
+            line = line.strip()
+            pos = end + 1
+            if line:
+                yield first, line
+
+    def chunks(self) -> Iterator[List['ExportOrder']]:
+        """Lists of valid legs in file order; raises ValueError if required columns are missing"""
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                lines = self._lines(mm)
+                columns = None
+                if not self.is_jsonl:
+                    _, header = next(lines, (0, b""))
+                    columns = [self._column(c) for c in next(csv.reader([header.decode()]))]
+                    missing = [c for c in self.REQUIRED if c not in columns]
+                    if missing:
+                        raise ValueError(f"{self.path}: basket is missing columns {missing}")
+
+                chunk = []
+                for item in lines:
+                    chunk.append(item)
+                    if len(chunk) >= self.CHUNK_ROWS:
+                        yield self._parse_chunk(chunk, columns)
+                        chunk = []
+                if chunk:
+                    yield self._parse_chunk(chunk, columns)
+
+    def _parse_chunk(self, chunk: List[Tuple[int, bytes]], columns: Optional[List[str]]) -> List['ExportOrder']:
+        """Split a chunk into columns, then validate it in bulk"""
+        linenos = []
+        cols = {name: [] for name in self.REQUIRED + self.OPTIONAL}
+        if columns is None:
+            for lineno, line in chunk:
+                try:
+                    rec = {self._column(k): v for k, v in _json_loads(line).items()}
+                except (ValueError, AttributeError):
+                    self._reject(lineno, "not a JSON object")
+                    continue
+                if any(rec.get(c) is None for c in self.REQUIRED):
+                    self._reject(lineno, "missing required field")
+                    continue
+                linenos.append(lineno)
+                for name, values in cols.items():
+                    values.append(rec.get(name))
+        else:
+            index = [(name, columns.index(name)) for name in cols if name in columns]
+            width = len(columns)
+            for (lineno, _), row in zip(chunk, csv.reader(line.decode() for _, line in chunk)):
+                if len(row) < width:
+                    self._reject(lineno, "short row")
+                    continue
+                linenos.append(lineno)
+                for name, i in index:
+                    cols[name].append(row[i].strip())
+
+        self.rows += len(chunk)
+        if not linenos:
+            return []
+        for name in self.OPTIONAL:
+            if not cols[name]:
+                cols[name] = [None] * len(linenos)
+        cols["sl_price"] = [v or 0.0 for v in cols["sl_price"]]
+        try:
+            qty = np.asarray(cols["qty"], dtype=np.float64)
+            price = np.asarray(cols["price"], dtype=np.float64)
+            sl_price = np.asarray(cols["sl_price"], dtype=np.float64)
+        except (ValueError, TypeError):
+            return self._parse_rows(linenos, cols)  # Locate the bad values row by row
+
+        valid = ((qty != 0) & (qty == np.round(qty)) & np.isfinite(price) & (price >= 0)
+                 & np.isfinite(sl_price)).tolist()
+        return self._build(linenos, cols, qty.tolist(), price.tolist(), sl_price.tolist(), valid)
+
+    def _parse_rows(self, linenos: List[int], cols: Dict[str, list]) -> List['ExportOrder']:
+        qty, price, sl_price, valid = [], [], [], []
+        for i in range(len(linenos)):
+            try:
+                q, p, sl = float(cols["qty"][i]), float(cols["price"][i]), float(cols["sl_price"][i])
+            except (ValueError, TypeError):
+                q, p, sl = 0.0, 0.0, 0.0
+            qty.append(q)
+            price.append(p)
+            sl_price.append(sl)
+            valid.append(q != 0 and q == int(q) and p >= 0)
+        return self._build(linenos, cols, qty, price, sl_price, valid)
+
+    def _build(self, linenos: List[int], cols: Dict[str, list], qty: List[float], price: List[float],
+               sl_price: List[float], valid: List[bool]) -> List['ExportOrder']:
+        orders = []
+        symbols, tags, exchanges, tokens = cols["symbol"], cols["tag"], cols["exchange"], cols["token"]
+        for i, lineno in enumerate(linenos):
+            if not valid[i] or not symbols[i]:
+                self._reject(lineno, "bad symbol, qty or price")
+                continue
+            orders.append(ExportOrder(str(symbols[i]), int(qty[i]), price[i], str(tags[i]),
+                                      exchanges[i] or None, str(tokens[i]) if tokens[i] else None, sl_price[i]))
+        return orders
+
+    def _reject(self, lineno: int, reason: str):
+        self.rejected += 1
+        logging.warning(f"{self.path}:{lineno}: skipped basket leg ({reason})")
+
+class JournalState:
+    """OMS state rebuilt from a journal replay"""
+    def __init__(self):
+        self.open_orders: Dict[str, 'KniteOrder'] = {}  # broker order id -> order
+        self.sl_orders: List['KniteOrder'] = []
+        self.positions: Dict[str, int] = {}  # instrument key -> net quantity
+        self.fills: List[Tuple[int, str, int, float]] = []  # (order id, instrument key, signed qty, price)
+        self.legs: Dict[str, Tuple[str, str, str, float, str]] = {}  # instrument key -> PositionMgr.leg()
+        self.records = 0
+
+class RiskEngine:
+    """Pre-trade limits and exposure in flat per-instrument tables.
+
+    Each instrument gets a slot whose limits are resolved once (defaults
+    overlaid with its overrides); net position and working buy/sell
+    quantity sit in parallel arrays that move with accepts, fills and
+    completions. A check is one dict lookup and a few array reads.
+    Exits and stop-losses are never blocked.
+    """
+    CHECKS = ("max_qty", "max_notional", "position", "price_band", "order_rate")
+
+    def __init__(self, limits: dict, overrides: Optional[Dict[str, dict]] = None):
+        self.limits = limits
+        self.overrides = overrides or {}
+        self._slots: Dict[str, int] = {}
+        self.max_qty = array('q')
+        self.max_notional = array('d')
+        self.max_position = array('q')
+        self.price_band = array('d')
+        self.position = array('q')
+        self.working_buy = array('q')
+        self.working_sell = array('q')
+        self._working: Dict[int, int] = {}  # KniteOrder.id -> signed quantity still working
+        self.max_orders_per_sec = limits["max_orders_per_sec"]
+        self._rate_second = 0
+        self._rate_count = 0
+        self.passed = 0
+        self.rejects = dict.fromkeys(self.CHECKS, 0)
+        self.check_hist = {name: LatencyHistogram() for name in self.CHECKS}
+        self._checks = tuple((name, getattr(self, f"_check_{name}")) for name in self.CHECKS)
+        for key in self.overrides:
+            self.slot(key)
+
+    def slot(self, key: str) -> int:
+        i = self._slots.get(key)
+        if i is None:
+            limits = {**self.limits, **self.overrides.get(key, {})}
+            i = self._slots[key] = len(self.position)
+            self.max_qty.append(int(limits["max_qty"]))
+            self.max_notional.append(float(limits["max_notional"]))
+            self.max_position.append(int(limits["max_position"]))
+            self.price_band.append(float(limits["price_band_pct"]))
+            self.position.append(0)
+            self.working_buy.append(0)
+            self.working_sell.append(0)
+        return i
+
+    def check(self, order: 'KniteOrder', ltp: Optional[float] = None, timed: bool = False) -> Optional[str]:
+        """Name of the first failed check, or None once the order is accepted"""
+        if order.is_exit_order or order.is_sl_order:
+            return None
+        i = self.slot(order.instrument_key)
+        qty = order.quantity
+        price = order.price or ltp or 0.0
+        for name, check in self._checks:
+            if timed:
+                start = time.perf_counter_ns()
+                ok = check(i, qty, price, ltp)
+                self.check_hist[name].record(time.perf_counter_ns() - start)
+            else:
+                ok = check(i, qty, price, ltp)
+            if not ok:
+                self.rejects[name] += 1
+                return name
+        self.passed += 1
+        self._rate_count += 1
+        self._add_working(order.id, i, qty)
+        return None
+
+    def _check_max_qty(self, i: int, qty: int, price: float, ltp: Optional[float]) -> bool:
+        return abs(qty) <= self.max_qty[i]
+
+    def _check_max_notional(self, i: int, qty: int, price: float, ltp: Optional[float]) -> bool:
+        return abs(qty) * price <= self.max_notional[i]
+
+    def _check_position(self, i: int, qty: int, price: float, ltp: Optional[float]) -> bool:
+        # Worst case: every working order on the same side fills
+        if qty > 0:
+            return self.position[i] + self.working_buy[i] + qty <= self.max_position[i]
+        return self.position[i] - self.working_sell[i] + qty >= -self.max_position[i]
+
+    def _check_price_band(self, i: int, qty: int, price: float, ltp: Optional[float]) -> bool:
+        # Without a fresh reference price there is nothing to compare against
+        return not ltp or abs(price - ltp) <= ltp * self.price_band[i]
+
+    def _check_order_rate(self, i: int, qty: int, price: float, ltp: Optional[float]) -> bool:
+        second = int(time.monotonic())
+        if second != self._rate_second:
+            self._rate_second = second
+            self._rate_count = 0
+        return self._rate_count < self.max_orders_per_sec
+
+    def _add_working(self, order_id: str, i: int, qty: int):
+        self._working[order_id] = self._working.get(order_id, 0) + qty
+        if qty > 0:
+            self.working_buy[i] += qty
+        else:
+            self.working_sell[i] -= qty
+
+    def _reduce_working(self, order: 'KniteOrder', i: int, qty: int):
+        """Stop counting up to |qty| of an order's working quantity"""
+        rem = self._working.get(order.id)
+        if not rem:
+            return
+        used = min(abs(qty), abs(rem))
+        if rem > 0:
+            self.working_buy[i] -= used
+            rem -= used
+        else:
+            self.working_sell[i] -= used
+            rem += used
+        if rem:
+            self._working[order.id] = rem
+        else:
+            del self._working[order.id]
+
+    def on_fill(self, order: 'KniteOrder', signed_qty: int):
+        i = self.slot(order.instrument_key)
+        self.position[i] += signed_qty
+        self._reduce_working(order, i, signed_qty)
+
+    def release(self, order: 'KniteOrder'):
+        """Order is done; whatever did not fill stops counting as exposure"""
+        rem = self._working.get(order.id)
+        if rem:
+            self._reduce_working(order, self.slot(order.instrument_key), rem)
+
+    def track(self, order: 'KniteOrder'):
+        """Count a recovered working order's unfilled quantity"""
+        if order.is_exit_order or order.is_sl_order:
+            return
+        filled = order.filled_qty if order.quantity > 0 else -order.filled_qty
+        if order.quantity - filled:
+            self._add_working(order.id, self.slot(order.instrument_key), order.quantity - filled)
+
+    def restore(self, pos_mgr: 'PositionMgr'):
+        """Seed net positions from the position manager"""
+        for key, slot in pos_mgr._slots.items():
+            self.position[self.slot(key)] = int(pos_mgr.net_qty[slot])
+
+    def stats(self) -> dict:
+        return {
+            "passed": self.passed,
+            "rejects": dict(self.rejects),
+            "check_us": {name: hist.summary() for name, hist in self.check_hist.items() if hist.count},
+        }
+
+class EventLog:
+    """Fixed-layout binary event records, written by the loop and drained by a thread.
+
+    emit() packs one record into a preallocated ring (a struct pack_into: no
+    formatting, no allocation beyond encoding one short string, no syscall)
+    and never blocks: if the writer falls a whole ring behind, records are
+    dropped and counted, and the writer notes the loss in the file. The writer
+    thread copies the filled span to the current file every flush_sec and
+    rotates to prefix.NNN.bin past max_file_bytes. Single producer, single
+    consumer: only the loop moves head, only the writer moves tail.
+    """
+    MAGIC = b"OMSEVT01"
+    RECORD = struct.Struct("<QHHIqqd40s")  # time_ns, event, reserved, seq, order, num, value, b
+
+    def __init__(self, prefix: str, capacity: int = 1 << 16, flush_sec: float = 0.05,
+                 max_file_bytes: int = 64 * 1024 * 1024):
+        capacity = 1 << max(0, capacity - 1).bit_length()  # Power of two, so a slot is head & mask
+        self.prefix = prefix
+        self.flush_sec = flush_sec
+        self.max_file_bytes = max_file_bytes
+        self._mask = capacity - 1
+        self._size = self.RECORD.size
+        self._pack_into = self.RECORD.pack_into
+        self._buf = bytearray(capacity * self._size)
+        self._head = 0
+        self._tail = 0
+        self.dropped = 0
+        self._reported_dropped = 0
+        self.files: List[str] = []
+        self._file = None
+        self._file_bytes = 0
+        self._stop = threading.Event()
+        self._open_next()
+        self._thread = threading.Thread(target=self._run, name="oms-event-log", daemon=True)
+        self._thread.start()
+
+    def emit(self, event: int, order_id: int = 0, b: str = "", num: int = 0, value: float = 0.0):
+        head = self._head
+        if head - self._tail > self._mask:
+            self.dropped += 1
+            return
+        self._pack_into(self._buf, (head & self._mask) * self._size, time.time_ns(),
+                        event, 0, head & 0xFFFFFFFF, order_id, num, value, b.encode())
+        self._head = head + 1  # Published only once the record is complete
+
+    def _run(self):
+        while not self._stop.wait(self.flush_sec):
+            self._drain()
+        self._drain()
+        self._file.close()
+
+    def _drain(self):
+        """Copy every record between tail and head to the file"""
+        head = self._head
+        tail = self._tail
+        if head != tail:
+            size = self._size
+            view = memoryview(self._buf)
+            start = (tail & self._mask) * size
+            end = (head & self._mask) * size
+            if end > start:
+                self._write(view[start:end])
+            else:
+                self._write(view[start:])
+                self._write(view[:end])
+            self._tail = head
+        dropped = self.dropped
+        if dropped != self._reported_dropped:
+            self._write(self.RECORD.pack(time.time_ns(), EV_LOST, 0, 0, 0, dropped - self._reported_dropped,
+                                         0.0, b""))
+            self._reported_dropped = dropped
+        self._file.flush()
+        if self._file_bytes >= self.max_file_bytes:
+            self._file.close()
+            self._open_next()
+
+    def _write(self, data):
+        self._file.write(data)
+        self._file_bytes += len(data)
+
+    def _open_next(self):
+        path = f"{self.prefix}.{len(self.files):03d}.bin"
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(self.MAGIC + struct.pack("<H", self.RECORD.size))
+        self._file_bytes = self._file.tell()
+        self.files.append(path)
+
+    def close(self):
+        """Stop the writer after a final drain"""
+        self._stop.set()
+        self._thread.join()
+
+    def stats(self) -> dict:
+        return {"records": self._head, "pending": self._head - self._tail, "dropped": self.dropped,
+                "files": len(self.files)}
+
+    @classmethod
+    def read(cls, path: str) -> Iterator[Tuple[int, str, int, int, int, float, str]]:
+        """Yield (time_ns, event name, seq, order id, num, value, b) for every record in one file"""
+        with open(path, "rb") as f:
+            data = f.read()
+        header = len(cls.MAGIC) + 2
+        if data[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError(f"{path} is not an OMS event log")
+        (size,) = struct.unpack_from("<H", data, len(cls.MAGIC))
+        if size != cls.RECORD.size:
+            raise ValueError(f"{path} has {size}-byte records, expected {cls.RECORD.size}")
+        for offset in range(header, len(data) - size + 1, size):
+            ts, event, _, seq, order_id, num, value, b = cls.RECORD.unpack_from(data, offset)
+            name = EVENTS[event][0] if event < len(EVENTS) else f"event_{event}"
+            yield ts, name, seq, order_id, num, value, b.rstrip(b"\0").decode(errors="replace")
+
+
+class OrderJournal:
+    """Append-only, memory-mapped binary journal of order state transitions.
+
+    Records are [len u32][crc32 u32][type u8][time_ns u64][payload] written
+    straight into a preallocated mmap, so an append is a struct pack and a
+    memory copy with no syscall; sync() (msync) is group-committed from a
+    worker thread. A zero length marks the end of the log, and a record whose
+    CRC does not match (torn write) ends replay.
+    """
+    HEADER = struct.Struct("<IIBQ")
+    ORDER_FIXED = struct.Struct("<qqdddB")  # quantity, filled, price, sl_price, expected, flags
+    FILL_FIXED = struct.Struct("<qdd")  # signed qty, price, tick size
+    INITIAL_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, path: str):
+        self.path = path
+        exists = os.path.exists(path)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size < self.INITIAL_SIZE:
+            os.ftruncate(self._fd, self.INITIAL_SIZE)
+            size = self.INITIAL_SIZE
+        self._mm = mmap.mmap(self._fd, size)
+        self._remap_lock = threading.Lock()  # sync() runs on a worker thread
+        self._offset = self._scan_end() if exists else 0
+        self.dirty = False
+
+    def _scan_end(self) -> int:
+        """Offset just past the last intact record"""
+        offset = 0
+        for offset, _, _ in self._records():
+            pass
+        return offset
+
+    def _records(self):
+        """Yield (end_offset, type, payload) for every intact record"""
+        mm = self._mm
+        header = self.HEADER
+        offset = 0
+        limit = len(mm) - header.size
+        while offset <= limit:
+            length, crc, rec_type, _ = header.unpack_from(mm, offset)
+            start = offset + header.size
+            if length == 0 or start + length > len(mm):
+                return
+            payload = mm[start:start + length]
+            if zlib.crc32(payload) != crc:
+                return
+            offset = start + length
+            yield offset, rec_type, payload
+
+    def _append(self, rec_type: int, payload: bytes):
+        end = self._offset + self.HEADER.size + len(payload)
+        if end + self.HEADER.size > len(self._mm):
+            self._grow(end)
+        self.HEADER.pack_into(self._mm, self._offset, len(payload), zlib.crc32(payload),
+                              rec_type, time.time_ns())
+        self._mm[self._offset + self.HEADER.size:end] = payload
+        self._offset = end
+        self.dirty = True
+
+    def _grow(self, needed: int):
+        size = len(self._mm)
+        while size < needed + self.HEADER.size:
+            size *= 2
+        with self._remap_lock:
+            self._mm.flush()
+            self._mm.close()
+            os.ftruncate(self._fd, size)
+            self._mm = mmap.mmap(self._fd, size)
+
+    @staticmethod
+    def _pack_strs(*values) -> bytes:
+        parts = []
+        for value in values:
+            raw = value.encode() if value else b""
+            parts.append(len(raw).to_bytes(2, "little"))
+            parts.append(raw)
+        return b"".join(parts)
+
+    @staticmethod
+    def _raw_str(payload: bytes, offset: int) -> bytes:
+        """Undecoded string at offset, for cheap dict keys during replay"""
+        n = payload[offset] | payload[offset + 1] << 8
+        return payload[offset + 2:offset + 2 + n]
+
+    @staticmethod
+    def _unpack_strs(payload: bytes, offset: int, count: int) -> List[str]:
+        values = []
+        for _ in range(count):
+            n = payload[offset] | payload[offset + 1] << 8
+            offset += 2 + n
+            values.append(payload[offset - n:offset].decode())
+        return values
+
+    def append_order(self, rec_type: int, order: 'KniteOrder'):
+        flags = (order.is_exit_order | order.is_high_priority << 1
+                 | order.stop_breached << 2 | order.is_barrier << 3)
+        fixed = self.ORDER_FIXED.pack(order.quantity, order.filled_qty, order.price or 0.0,
+                                      order.sl_price or 0.0, order.expected_price or 0.0, flags)
+        parent_id = str(order.parent.id) if order.parent is not None else ""
+        self._append(rec_type, fixed + self._pack_strs(
+            str(order.id), order.broker_order_id, parent_id, order.symbol, order.exchange, order.token,
+            order.tag, order.order_type, order.product_type, order.status))
+
+    def append_id(self, rec_type: int, order_id: int):
+        self._append(rec_type, self._pack_strs(str(order_id)))
+
+    def append_fill(self, order: 'KniteOrder', signed_qty: int, price: float):
+        # Carries the instrument fields too, so a replayed position can still be exited
+        self._append(REC_FILL, self.FILL_FIXED.pack(signed_qty, price or 0.0, order.tick_size)
+                     + self._pack_strs(str(order.id), order.instrument_key, order.symbol, order.exchange,
+                                       order.token, order.product_type))
+
+    def _decode_order(self, payload: bytes) -> Tuple['KniteOrder', int]:
+        quantity, filled, price, sl_price, expected, flags = self.ORDER_FIXED.unpack_from(payload)
+        (order_id, broker_id, parent_id, symbol, exchange, token, tag,
+         order_type, product_type, status) = self._unpack_strs(payload, self.ORDER_FIXED.size, 10)
+        order = KniteOrder(order_type, product_type)
+        order.id = int(order_id)
+        order.broker_order_id = broker_id or None
+        order.symbol, order.exchange, order.token, order.tag = symbol, exchange, token, tag
+        order.quantity, order.filled_qty, order.status = quantity, filled, status
+        order.price, order.sl_price, order.expected_price = price, sl_price, expected
+        order.is_exit_order = bool(flags & 1)
+        order.is_high_priority = bool(flags & 2)
+        order.stop_breached = bool(flags & 4)
+        order.is_barrier = bool(flags & 8)
+        return order, int(parent_id) if parent_id else 0
+
+    def replay(self) -> JournalState:
+        """Fold the journal into open orders, resting stops and net positions.
+
+        Only the order id is read while scanning; snapshots are decoded into
+        KniteOrders once, for the orders that survive to the end of the log.
+        """
+        state = JournalState()
+        raw_str = self._raw_str
+        id_offset = self.ORDER_FIXED.size
+        snapshots: Dict[bytes, bytes] = {}
+        live_sl: Dict[bytes, bytes] = {}
+        closed: Set[bytes] = set()
+
+        for _, rec_type, payload in self._records():
+            state.records += 1
+            if rec_type == REC_ORDER:
+                snapshots[raw_str(payload, id_offset)] = payload
+            elif rec_type == REC_SL_ADD:
+                live_sl[raw_str(payload, id_offset)] = payload
+            elif rec_type == REC_CLOSE:
+                closed.add(raw_str(payload, 0))
+            elif rec_type == REC_SL_REMOVE:
+                live_sl.pop(raw_str(payload, 0), None)
+            elif rec_type == REC_FILL:
+                signed_qty, price, tick_size = self.FILL_FIXED.unpack_from(payload)
+                order_id, key, symbol, exchange, token, product_type = self._unpack_strs(
+                    payload, self.FILL_FIXED.size, 6)
+                state.positions[key] = state.positions.get(key, 0) + signed_qty
+                state.fills.append((int(order_id), key, signed_qty, price))
+                if key not in state.legs:
+                    state.legs[key] = (symbol, exchange, token, tick_size, product_type)
+
+        orders: Dict[int, 'KniteOrder'] = {}
+        for order_id, payload in snapshots.items():
+            if order_id in closed:
+                continue
+            order, _ = self._decode_order(payload)
+            orders[order.id] = order
+            if order.broker_order_id and order.status not in ORDER_STATUSES_TERMINAL:
+                state.open_orders[order.broker_order_id] = order
+        for payload in live_sl.values():
+            sl_order, parent_id = self._decode_order(payload)
+            parent = orders.get(parent_id)
+            if parent is None:
+                # Settled parent: only its id is needed to link the stop
+                parent = KniteOrder(ORDER_TYPE_LIMIT)
+                parent.id = parent_id
+            sl_order.parent = parent
+            state.sl_orders.append(sl_order)
+        state.positions = {k: q for k, q in state.positions.items() if q}
+        return state
+
+    def sync(self):
+        """Durably commit everything appended so far"""
+        self.dirty = False
+        with self._remap_lock:
+            self._mm.flush()
+
+    def close(self):
+        self.sync()
+        self._mm.close()
+        os.close(self._fd)
+
+class PositionMgr:
+    """Net positions and P&L in preallocated columns indexed by instrument slot.
+
+    Fills update one slot incrementally (average price on adds, realized P&L
+    on reductions) and ticks overwrite the slot's mark, so portfolio queries
+    are single NumPy passes over the first `count` rows.
+    """
+    INITIAL_CAPACITY = 256
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self._slots: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._applied: Dict[int, int] = {}  # KniteOrder.id -> cumulative qty booked
+        self.legs: Dict[str, Tuple[str, str, str, float, str]] = {}  # key -> (tsym, exch, token, tick, product)
+        self.count = 0
+        self.net_qty = np.zeros(capacity, dtype=np.int64)
+        self.avg_price = np.zeros(capacity, dtype=np.float64)
+        self.realized = np.zeros(capacity, dtype=np.float64)
+        self.marks = np.zeros(capacity, dtype=np.float64)
+
+    async def initialize(self, positions: Optional[List[dict]] = None):
+        """Seed net positions from the broker's position book"""
+        for p in positions or ():
+            net_qty = int(p.get("netqty", 0) or 0)
+            if net_qty:
+                key = f"{p.get('exch')}|{p.get('token')}" if p.get("token") else p.get("tsym", "")
+                self.apply_fill(key, net_qty, float(p.get("netavgprc", 0) or 0))
+                self.legs[key] = (p.get("tsym", ""), p.get("exch", DEFAULT_EXCHANGE), p.get("token", ""),
+                                  float(p.get("ti") or 0.05), p.get("prd") or "I")
+
+    @staticmethod
+    def leg(order: KniteOrder) -> Tuple[str, str, str, float, str]:
+        """The fields an exit for this order's position needs"""
+        return order.symbol, order.exchange, order.token, order.tick_size, order.product_type
+
+    def slot(self, key: str) -> int:
+        slot = self._slots.get(key)
+        if slot is None:
+            if self.count == len(self.net_qty):
+                self._grow()
+            slot = self._slots[key] = self.count
+            self._keys.append(key)
+            self.count += 1
+        return slot
+
+    def _grow(self):
+        size = len(self.net_qty) * 2
+        for name in ("net_qty", "avg_price", "realized", "marks"):
+            column = getattr(self, name)
+            grown = np.zeros(size, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def open_position(self, order: KniteOrder, cum_filled: int, price: float) -> int:
+        """Book an entry fill; returns the signed quantity applied"""
+        return self._book(order, cum_filled, price)
+
+    def close_position(self, order: KniteOrder, cum_filled: int, price: float) -> int:
+        """Book an exit fill; returns the signed quantity applied"""
+        return self._book(order, cum_filled, price)
+
+    def _book(self, order: KniteOrder, cum_filled: int, price: float) -> int:
+        delta = cum_filled - self._applied.get(order.id, 0)
+        if delta <= 0:
+            return 0
+        self._applied[order.id] = cum_filled
+        signed = delta if order.quantity > 0 else -delta
+        self.apply_fill(order.instrument_key, signed, price)
+        return signed
+
+    def apply_fill(self, key: str, signed_qty: int, price: float):
+        """Incrementally update one slot's net quantity, average price and realized P&L"""
+        i = self.slot(key)
+        pos = int(self.net_qty[i])
+        new_pos = pos + signed_qty
+        if pos == 0 or (pos > 0) == (signed_qty > 0):
+            # Adding to (or opening) a position
+            self.avg_price[i] = (self.avg_price[i] * abs(pos) + price * abs(signed_qty)) / abs(new_pos)
+        else:
+            closed = min(abs(signed_qty), abs(pos))
+            direction = 1 if pos > 0 else -1
+            self.realized[i] += closed * (price - self.avg_price[i]) * direction
+            if new_pos == 0:
+                self.avg_price[i] = 0.0
+            elif (new_pos > 0) != (pos > 0):
+                self.avg_price[i] = price  # Flipped through flat
+        self.net_qty[i] = new_pos
+        if not self.marks[i]:
+            self.marks[i] = price
+
+    def mark(self, key: str, ltp: float):
+        slot = self._slots.get(key)
+        if slot is not None:
+            self.marks[slot] = ltp
+
+    def restore(self, fills: List[Tuple[int, str, int, float]]):
+        """Rebuild positions by replaying fills recovered from the order journal"""
+        applied = self._applied
+        for order_id, key, signed_qty, price in fills:
+            self.apply_fill(key, signed_qty, price)
+            # Recovered orders report cumulative fills; only the part past this is new
+            applied[order_id] = applied.get(order_id, 0) + abs(signed_qty)
+
+    def unrealized_pnl(self) -> np.ndarray:
+        n = self.count
+        return (self.marks[:n] - self.avg_price[:n]) * self.net_qty[:n]
+
+    def total_pnl(self) -> float:
+        return float(self.realized[:self.count].sum() + self.unrealized_pnl().sum())
+
+    def total_exposure(self) -> float:
+        """Gross notional at the latest marks"""
+        n = self.count
+        return float(np.abs(self.net_qty[:n]) @ self.marks[:n])
+
+    def positions_to_flatten(self) -> List[Tuple[str, int]]:
+        """(instrument key, quantity that flattens it) for every non-flat slot"""
+        net = self.net_qty[:self.count]
+        return [(self._keys[i], -int(net[i])) for i in np.flatnonzero(net)]
+
+    def position(self, key: str) -> Optional[dict]:
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        return {
+            "net_qty": int(self.net_qty[slot]),
+            "avg_price": float(self.avg_price[slot]),
+            "realized": float(self.realized[slot]),
+            "unrealized": float((self.marks[slot] - self.avg_price[slot]) * self.net_qty[slot]),
+            "mark": float(self.marks[slot]),
+        }
+#endregion
+
+#region Multi-Account Supervisor
+class AccountSupervisor:
+    """Spreads accounts over worker processes, one event loop per core.
+
+    Each worker runs an OrderManager per account in its shard. Workers
+    write every account's STATS row into a shared double array (one writer
+    per row, so no locking) and take commands ("ExitAll", "Block",
+    "Unblock", "Stop") over a pipe watched by their event loop. The
+    supervisor sums the rows and flattens every account once gross
+    exposure crosses MAX_GROSS_EXPOSURE.
+    """
+    STATS = ("exposure", "pnl", "open_orders", "heartbeat")
+    MAX_GROSS_EXPOSURE = 0.0  # 0 disables the aggregate check
+    PUBLISH_SEC = 0.1
+
+    def __init__(self, accounts: List[dict], workers: Optional[int] = None,
+                 restart_type: Optional[str] = None, config: Optional[dict] = None):
+        self.accounts = accounts
+        self.workers = max(1, min(len(accounts), workers or os.cpu_count() or 1))
+        self.restart_type = restart_type
+        self.config = config or {}  # OrderManager settings applied to every account
+        self._ctx = multiprocessing.get_context("spawn")
+        self.stats = self._ctx.Array('d', len(accounts) * len(self.STATS), lock=False)
+        self._conns = []
+        self._procs = []
+        self.flattened = False
+
+    def start(self):
+        """Launch one worker process per shard"""
+        for w in range(self.workers):
+            shard = [(i, self.accounts[i]) for i in range(w, len(self.accounts), self.workers)]
+            parent, child = self._ctx.Pipe()
+            proc = self._ctx.Process(
+                target=_run_account_shard, name=f"oms-shard-{w}", daemon=True,
+                args=(shard, self.stats, child, self.restart_type, self.config, self.PUBLISH_SEC))
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        logging.info(f"Started {len(self.accounts)} accounts on {self.workers} workers")
+
+    def broadcast(self, command: str):
+        """Send a command to every worker"""
+        for conn in self._conns:
+            try:
+                conn.send(command)
+            except (BrokenPipeError, OSError) as e:
+                logging.error(f"Command {command} not delivered: {e}")
+
+    def flatten_all(self):
+        logging.error(f"Flatten-all across {len(self.accounts)} accounts")
+        self.broadcast("ExitAll")
+
+    def aggregate(self) -> dict:
+        """Per-account stats rows and their totals"""
+        width = len(self.STATS)
+        accounts = {}
+        for i, creds in enumerate(self.accounts):
+            accounts[creds.get("USER", str(i))] = dict(zip(self.STATS, self.stats[i * width:(i + 1) * width]))
+        return {
+            "gross_exposure": sum(a["exposure"] for a in accounts.values()),
+            "pnl": sum(a["pnl"] for a in accounts.values()),
+            "open_orders": int(sum(a["open_orders"] for a in accounts.values())),
+            "accounts": accounts,
+        }
+
+    def check_limits(self) -> bool:
+        """Flatten everything once if aggregate gross exposure is over the limit"""
+        if not self.MAX_GROSS_EXPOSURE or self.flattened:
+            return False
+        exposure = self.aggregate()["gross_exposure"]
+        if exposure <= self.MAX_GROSS_EXPOSURE:
+            return False
+        logging.error(f"Aggregate exposure {exposure:.0f} over {self.MAX_GROSS_EXPOSURE:.0f}")
+        self.flattened = True
+        self.flatten_all()
+        return True
+
+    def run(self):
+        """Start the shards and watch aggregate risk until the workers exit"""
+        self.start()
+        try:
+            while any(proc.is_alive() for proc in self._procs):
+                self.check_limits()
+                time.sleep(self.PUBLISH_SEC)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 10.0):
+        self.broadcast("Stop")
+        deadline = time.monotonic() + timeout
+        for proc in self._procs:
+            proc.join(max(0.0, deadline - time.monotonic()))
+            if proc.is_alive():
+                logging.warning(f"{proc.name} did not stop in time; terminating")
+                proc.terminate()
+        for conn in self._conns:
+            conn.close()
+        self._procs.clear()
+        self._conns.clear()
+
+def _run_account_shard(shard: List[Tuple[int, dict]], stats, conn, restart_type: Optional[str],
+                       config: dict, publish_sec: float):
+    """Worker process entry point: one event loop for a shard of accounts"""
+    asyncio.run(_account_shard_main(shard, stats, conn, restart_type, config, publish_sec))
+
+async def _account_shard_main(shard: List[Tuple[int, dict]], stats, conn, restart_type: Optional[str],
+                              config: dict, publish_sec: float):
+    loop = asyncio.get_running_loop()
+    managers = [(index, OrderManager(**config)) for index, _ in shard]
+    runs = []
+    for (index, creds), (_, manager) in zip(shard, managers):
+        task = asyncio.create_task(manager.start(creds, restart_type))
+        task.add_done_callback(
+            lambda t, user=creds.get("USER"): t.cancelled() or t.exception() is None
+            or logging.error(f"Account {user} stopped: {t.exception()}"))
+        runs.append(task)
+
+    commands: asyncio.Queue = asyncio.Queue()
+
+    def on_command():
+        try:
+            commands.put_nowait(conn.recv())
+        except (EOFError, OSError):  # Supervisor went away
+            loop.remove_reader(conn.fileno())
+            commands.put_nowait("Stop")
+
+    loop.add_reader(conn.fileno(), on_command)
+
+    async def publish():
+        width = len(AccountSupervisor.STATS)
+        while True:
+            for index, manager in managers:
+                pos_mgr = manager._live_pos_mgr
+                row = index * width
+                stats[row] = pos_mgr.total_exposure() if pos_mgr is not None else 0.0
+                stats[row + 1] = pos_mgr.total_pnl() if pos_mgr is not None else 0.0
+                stats[row + 2] = len(manager._open_orders)
+                stats[row + 3] = time.time()
+            await asyncio.sleep(publish_sec)
+
+    publisher = asyncio.create_task(publish())
+    try:
+        while True:
+            command = await commands.get()
+            if command == "Stop":
+                break
+            for _, manager in managers:
+                if command == "Block":
+                    manager.BLOCK_ALL_ORDERS = True
+                elif command == "Unblock":
+                    manager.BLOCK_ALL_ORDERS = False
+                    manager._signal(STAGE_NEW)  # Dispatch whatever queued while blocked
+                else:
+                    manager.submit_command(command)
+    finally:
+        loop.remove_reader(conn.fileno())
+        publisher.cancel()
+        for _, manager in managers:
+            await manager.stop()
+        await asyncio.gather(*runs, return_exceptions=True)
 #endregion
 
 # Utility Functions
-def generate_order_id() -> str:
-    """Nanosecond precision order ID"""
-    return f"ORD_{time.time_ns()}"
+# Seeded from the clock in microseconds so an intraday restart does not reuse ids; next() is atomic
+_order_ids = itertools.count(time.time_ns() // 1000)
+
+def generate_order_id() -> int:
+    """Process-unique integer order ID from a monotonic counter"""
+    return next(_order_ids)
 
-def deserialize_orders(file_path: str) -> List[dict]:
-    """Mock deserialization function"""
-    return []
+def deserialize_orders(file_path: str) -> Iterator['ExportOrder']:
+    """Validated legs of a CSV/JSONL basket file, streamed"""
+    for chunk in BasketReader(file_path).chunks():
+        yield from chunk
 
 async def main():
-    # Initialize with your Flattrade credentials
-    await OrderManager.start(
-        api_key="YOUR_API_KEY",
-        api_secret="YOUR_API_SECRET",
-        client_id="YOUR_CLIENT_ID",
-        password="YOUR_PASSWORD"
-    )
+    # Initialize with your Flattrade credentials; use AccountSupervisor for several accounts
+    await OrderManager().start({
+        "USER": "YOUR_CLIENT_ID",
+        "PASSWORD": "YOUR_PASSWORD",
+        "API_KEY": "YOUR_API_KEY",
+        "API_SECRET": "YOUR_API_SECRET",
+    })
 
 if __name__ == "__main__":
     asyncio.run(main())
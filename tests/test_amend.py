@@ -0,0 +1,84 @@
+"""Working LIMIT amends: strategy prices only by default, whole-tick no-op checks, cleared on cancel/flatten"""
+import asyncio
+
+import pytest
+
+from omsflatradejiddi import (KniteOrder, Order, OrderManager, PositionMgr, ORDER_STATUS_OPEN, ORDER_TYPE_LIMIT,
+                              SCHED_AMEND)
+
+
+def _manager(**config) -> OrderManager:
+    om = OrderManager(BLOCK_ALL_ORDERS=True, JOURNAL_ENABLED=False, **config)
+    om._live_pos_mgr = PositionMgr()
+    return om
+
+
+def _working(om: OrderManager, quantity: int = 5, price: float = 100.0) -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    order.quantity = quantity
+    order.price = price
+    order.symbol = "SYM1-EQ"
+    order.token = "1"
+    order.broker_order_id = "B1"
+    order.status = ORDER_STATUS_OPEN
+    om._open_orders["B1"] = order
+    return order
+
+
+def _open_update() -> Order:
+    return Order("B1", ORDER_STATUS_OPEN, ORDER_TYPE_LIMIT, 0, 100.0, 5)
+
+
+def _quote(om: OrderManager, bid: float, ask: float):
+    om.market_data().update("NSE|1", ltp=bid, bid=bid, ask=ask)
+
+
+def test_open_limit_keeps_strategy_price_by_default():
+    om = _manager()
+    order = _working(om)
+    _quote(om, 101.0, 101.05)
+
+    asyncio.run(om.process_open_order(_open_update()))
+
+    assert not om.scheduler() and not om._amend_pending
+    assert order.price == 100.0
+
+
+def test_opt_in_reprice_is_capped_from_placed_price():
+    om = _manager(LIMIT_REPRICE_MAX_TICKS=4)
+    order = _working(om)
+    _quote(om, 101.0, 101.05)
+
+    asyncio.run(om.process_open_order(_open_update()))
+
+    assert om._amend_pending[order.id] == 100.2
+    assert om.scheduler().peek() == (SCHED_AMEND, order)
+
+
+def test_amend_within_float_noise_of_a_tick_is_suppressed():
+    om = _manager()
+    order = _working(om, price=100.1)
+
+    om.request_amend(order, 100.0 + 0.1)  # 100.1 != 100.0 + 0.1 in floats
+    assert not om.scheduler() and om.amend_stats()["suppressed"] == 1
+
+    om.request_amend(order, 100.15)
+    assert om._amend_pending[order.id] == 100.15
+
+
+def test_cancel_and_flatten_drop_queued_amends():
+    om = _manager()
+    order = _working(om)
+    om.request_amend(order, 101.0)
+
+    def delete(*args, **kwargs):
+        raise RuntimeError("not sent")
+    om._session = type("Session", (), {"delete": staticmethod(delete)})()
+    with pytest.raises(RuntimeError):
+        asyncio.run(om.cancel_order(order))
+    assert not om.scheduler() and not om._amend_pending and not om._amend_inflight
+
+    om.request_amend(order, 102.0)
+    om.cancel_order = lambda o: asyncio.sleep(0, True)
+    asyncio.run(om.flatten_all())
+    assert not om.scheduler() and not om._amend_pending and not om._amend_inflight
@@ -0,0 +1,63 @@
+"""Basket files stream in chunks without losing or splitting records at chunk boundaries"""
+import json
+import os
+
+import pytest
+
+from omsflatradejiddi import BasketReader
+
+
+def _read(path: str, chunk_rows: int, monkeypatch) -> tuple:
+    monkeypatch.setattr(BasketReader, "CHUNK_ROWS", chunk_rows)
+    reader = BasketReader(path)
+    chunks = list(reader.chunks())
+    return reader, chunks, [leg for chunk in chunks for leg in chunk]
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 7])
+def test_csv_records_survive_any_chunk_size(tmp_path, monkeypatch, chunk_rows):
+    path = os.path.join(tmp_path, "basket.csv")
+    with open(path, "wb") as f:
+        f.write(b"symbol,qty,price,tag\r\n")
+        for i in range(6):
+            f.write(f"SYM{i}-EQ,{i + 1},10{i}.5,T{i}\r\n".encode())
+        f.write(b"LAST-EQ,-9,99.0,TAIL")  # No trailing newline
+
+    reader, chunks, legs = _read(path, chunk_rows, monkeypatch)
+
+    assert [(leg.symbol, leg.quantity, leg.tag) for leg in legs] == (
+        [(f"SYM{i}-EQ", i + 1, f"T{i}") for i in range(6)] + [("LAST-EQ", -9, "TAIL")])
+    assert legs[0].price == 100.5 and legs[-1].price == 99.0
+    assert max(len(chunk) for chunk in chunks) <= chunk_rows
+    assert reader.rows == 7 and reader.rejected == 0
+
+
+def test_csv_quoted_newline_stays_in_one_record(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "basket.csv")
+    with open(path, "w", newline="") as f:
+        f.write('symbol,qty,price,tag\nA-EQ,1,10,"two\nlines"\nB-EQ,2,20,plain\nC-EQ,3,30,"x,y"\n')
+
+    reader, _, legs = _read(path, 1, monkeypatch)
+
+    assert [(leg.symbol, leg.tag) for leg in legs] == [("A-EQ", "two\nlines"), ("B-EQ", "plain"), ("C-EQ", "x,y")]
+    assert reader.rejected == 0
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 4])
+def test_jsonl_records_and_bad_lines_across_chunks(tmp_path, monkeypatch, chunk_rows):
+    path = os.path.join(tmp_path, "basket.jsonl")
+    records = [{"tsym": f"SYM{i}-EQ", "quantity": i + 1, "price": 100 + i, "tag": f"T{i}", "exch": "NFO"}
+               for i in range(5)]
+    with open(path, "w") as f:
+        for i, rec in enumerate(records):
+            f.write(json.dumps(rec) + "\n")
+            if i == 2:
+                f.write('{"tsym": "BROKEN-EQ", "quantity": \n')  # Torn record
+                f.write("\n")
+        f.write(json.dumps({"symbol": "NOQTY-EQ", "price": 1, "tag": "X"}))
+
+    reader, _, legs = _read(path, chunk_rows, monkeypatch)
+
+    assert [(leg.symbol, leg.quantity, leg.exchange) for leg in legs] == [
+        (f"SYM{i}-EQ", i + 1, "NFO") for i in range(5)]
+    assert reader.rejected == 2
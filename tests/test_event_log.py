@@ -0,0 +1,55 @@
+"""Binary event log: ring overflow is counted and recorded, the writer flushes and rotates"""
+import os
+import time
+
+from omsflatradejiddi import EventLog, EV_BARRIER, EV_PLACED
+
+
+def _records(log: EventLog) -> list:
+    return [record for path in log.files for record in EventLog.read(path)]
+
+
+def test_full_ring_drops_and_writer_records_the_loss(tmp_path):
+    log = EventLog(os.path.join(tmp_path, "events"), capacity=4, flush_sec=60)
+    for i in range(10):
+        log.emit(EV_PLACED, order_id=i, b=f"B{i}", num=i, value=100.0 + i)
+    assert log.stats() == {"records": 4, "pending": 4, "dropped": 6, "files": 1}
+
+    log.close()  # Final drain
+
+    records = _records(log)
+    assert [(name, seq, order_id, b) for _, name, seq, order_id, _, _, b in records[:4]] == [
+        ("placed", i, i, f"B{i}") for i in range(4)]
+    assert records[4][1] == "lost" and records[4][4] == 6
+    assert len(records) == 5
+
+
+def test_writer_flushes_without_close_and_wraps_the_ring(tmp_path):
+    log = EventLog(os.path.join(tmp_path, "events"), capacity=4, flush_sec=0.001)
+    try:
+        for i in range(12):  # Three trips around the ring, drained between batches
+            log.emit(EV_BARRIER, order_id=i)
+            if i % 3 == 2:
+                deadline = time.monotonic() + 2.0
+                while log.stats()["pending"] and time.monotonic() < deadline:
+                    time.sleep(0.001)
+        deadline = time.monotonic() + 2.0
+        while len(_records(log)) < 12 and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+        assert [order_id for _, _, _, order_id, _, _, _ in _records(log)] == list(range(12))
+        assert log.dropped == 0
+    finally:
+        log.close()
+
+
+def test_rotates_past_max_file_bytes(tmp_path):
+    log = EventLog(os.path.join(tmp_path, "events"), capacity=8, flush_sec=60,
+                   max_file_bytes=EventLog.RECORD.size * 2)
+    for i in range(3):
+        log.emit(EV_PLACED, order_id=i)
+        log._drain()  # What the writer does each flush_sec
+    log.close()
+
+    assert len(log.files) >= 2
+    assert [order_id for _, _, _, order_id, _, _, _ in _records(log)] == [0, 1, 2]
@@ -0,0 +1,60 @@
+"""Fills are booked at the broker's traded price, not the order's limit (0 for MARKET)"""
+import asyncio
+import json
+from collections import deque
+
+from flattrade_simulator import SimOrder
+from omsflatradejiddi import KniteOrder, OrderManager, PositionMgr, ORDER_STATUS_OPEN, ORDER_TYPE_MARKET
+
+
+def _manager() -> OrderManager:
+    om = OrderManager(BLOCK_ALL_ORDERS=True, JOURNAL_ENABLED=False)
+    om._live_pos_mgr = PositionMgr()
+    return om
+
+
+def _market(om: OrderManager) -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_MARKET)
+    order.quantity = 10
+    order.symbol = "SYM1-EQ"
+    order.token = "1"
+    order.broker_order_id = "B1"
+    order.status = ORDER_STATUS_OPEN
+    om._open_orders["B1"] = order
+    return order
+
+
+def _sim_order() -> SimOrder:
+    return SimOrder("B1", {"tsym": "SYM1-EQ", "exch": "NSE", "trantype": "B", "qty": "10", "prctyp": "MARKET"})
+
+
+def test_ws_fills_use_traded_prices():
+    om = _manager()
+    _market(om)
+    sim_order = _sim_order()
+    sim_order.status = "OPEN"
+
+    sim_order.trade(4, 101.0)
+    om._drain_ws_frames(deque([json.dumps(sim_order.to_update())]))
+    sim_order.trade(10, 102.0)
+    sim_order.status = "COMPLETE"
+    om._drain_ws_frames(deque([json.dumps(sim_order.to_update())]))
+    asyncio.run(om.process_ws_updates())
+
+    position = om._live_pos_mgr.position("NSE|1")
+    assert position["net_qty"] == 10
+    assert abs(position["avg_price"] - 101.6) < 1e-9
+
+
+def test_order_book_fill_uses_average_price():
+    om = _manager()
+    _market(om)
+    sim_order = _sim_order()
+    sim_order.trade(10, 99.5)
+    sim_order.status = "COMPLETE"
+
+    broker_order = om._parse_order(sim_order.to_row())
+    assert broker_order.price == 0.0 and broker_order.avg_price == 99.5
+    assert asyncio.run(om.process_open_order(broker_order))
+
+    assert om._live_pos_mgr.position("NSE|1")["avg_price"] == 99.5
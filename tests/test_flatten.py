@@ -0,0 +1,123 @@
+"""exit_all_orders / panic flatten positions with fresh opposite-side exits"""
+import asyncio
+import os
+
+from omsflatradejiddi import (KniteOrder, OrderJournal, OrderManager, PositionMgr, ORDER_STATUS_OPEN,
+                              ORDER_TYPE_LIMIT, ORDER_TYPE_MARKET, RESTART_TYPE_DROP_ALL, SCHED_ENTRY, SCHED_EXIT,
+                              SCHED_PANIC)
+
+
+def _manager() -> OrderManager:
+    """OrderManager holding placements in the scheduler, with cancels recorded instead of sent"""
+    om = OrderManager(BLOCK_ALL_ORDERS=True, JOURNAL_ENABLED=False)
+    om._live_pos_mgr = PositionMgr()
+    om.cancelled = []
+
+    async def cancel_order(order):
+        om.cancelled.append(order.broker_order_id)
+        return True
+    om.cancel_order = cancel_order
+    return om
+
+
+def _order(token: str, quantity: int, broker_id: str = "") -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    order.quantity = quantity
+    order.price = 100.0
+    order.symbol = f"SYM{token}-EQ"
+    order.token = token
+    order.broker_order_id = broker_id or None
+    order.status = ORDER_STATUS_OPEN
+    return order
+
+
+def _queued(om: OrderManager, klass: int):
+    return [o for o in om.scheduler().drop(klass) if not o.is_barrier]
+
+
+def test_flatten_sends_opposite_exits_and_cancels_entries():
+    om = _manager()
+    long_entry, short_entry = _order("1", 5), _order("2", -3)
+    om._apply_fill(long_entry, 5, 100.0)
+    om._apply_fill(short_entry, 3, 50.0)
+    long_entry.sl_price = 95.0
+    om.add_sl_order(om.create_sl_order(long_entry))
+    working = _order("1", 4, "B1")
+    om._open_orders["B1"] = working
+    queued = _order("3", 7)
+    om.scheduler().push(queued, SCHED_ENTRY)
+
+    asyncio.run(om.flatten_all())
+
+    assert om.cancelled == ["B1"]
+    assert not om._sl_by_parent and not om._sl_orders[long_entry.instrument_key]
+    assert not _queued(om, SCHED_ENTRY)
+    exits = _queued(om, SCHED_EXIT)
+    assert sorted((o.instrument_key, o.quantity) for o in exits) == [("NSE|1", -5), ("NSE|2", 3)]
+    for exit_order in exits:
+        assert exit_order.order_type == ORDER_TYPE_MARKET and exit_order.is_exit_order
+        assert exit_order not in (long_entry, short_entry, working)
+        assert exit_order.symbol == f"SYM{exit_order.token}-EQ"
+
+
+def test_panic_on_filled_long_sells_it():
+    om = _manager()
+    om._apply_fill(_order("1", 2), 2, 100.0)
+
+    asyncio.run(om.flatten_all(SCHED_PANIC))
+
+    assert [(o.instrument_key, o.quantity) for o in _queued(om, SCHED_PANIC)] == [("NSE|1", -2)]
+
+
+def test_flatten_covers_fills_racing_the_cancel_and_working_exits():
+    om = _manager()
+    om._apply_fill(_order("1", 5), 5, 100.0)
+    working = _order("1", 4, "B1")
+    om._open_orders["B1"] = working
+    stop_exit = _order("2", -1, "B2")
+    stop_exit.is_exit_order = True
+    om._apply_fill(_order("2", 3), 3, 100.0)
+    om._open_orders["B2"] = stop_exit
+
+    async def cancel_order(order):
+        om._apply_fill(order, 2, 101.0)  # 2 of 4 filled before the cancel landed
+        return True
+    om.cancel_order = cancel_order
+
+    asyncio.run(om.flatten_all())
+
+    # -5 straight away, -2 for the racing fill; the working exit already covers 1 of the short 3
+    exits = _queued(om, SCHED_EXIT)
+    assert [(o.instrument_key, o.quantity) for o in exits] == [("NSE|1", -5), ("NSE|2", -2), ("NSE|1", -2)]
+
+
+def test_flatten_position_seeded_from_broker():
+    om = _manager()
+    asyncio.run(om._live_pos_mgr.initialize([{"exch": "NSE", "token": "2885", "tsym": "RELIANCE-EQ",
+                                              "netqty": "10", "netavgprc": "2500.0", "prd": "C"}]))
+
+    asyncio.run(om.flatten_all(SCHED_PANIC))
+
+    [exit_order] = _queued(om, SCHED_PANIC)
+    assert (exit_order.instrument_key, exit_order.quantity) == ("NSE|2885", -10)
+    assert (exit_order.symbol, exit_order.product_type) == ("RELIANCE-EQ", "C")
+
+
+def test_flatten_position_recovered_from_journal(tmp_path):
+    path = os.path.join(tmp_path, "journal.bin")
+    om = _manager()
+    om._journal = OrderJournal(path)
+    entry = _order("7", -3)
+    entry.product_type = "M"
+    om._apply_fill(entry, 3, 100.0)
+    om._journal.close()
+
+    om = _manager()
+    om._journal = OrderJournal(path)
+    om.recover(RESTART_TYPE_DROP_ALL)
+    asyncio.run(om.flatten_all())
+
+    [exit_order] = _queued(om, SCHED_EXIT)
+    assert (exit_order.instrument_key, exit_order.quantity) == ("NSE|7", 3)
+    assert (exit_order.symbol, exit_order.product_type) == ("SYM7-EQ", "M")
+    om._journal.close()
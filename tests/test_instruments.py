@@ -0,0 +1,43 @@
+"""Scrip master resolution honours the order's exchange"""
+import os
+
+from omsflatradejiddi import InstrumentMaster, KniteOrder, OrderManager, ORDER_TYPE_LIMIT
+
+
+def _master(tmp_path) -> InstrumentMaster:
+    source = os.path.join(tmp_path, "symbols.txt")
+    with open(source, "w") as f:
+        f.write("Exchange,Token,LotSize,TradingSymbol,TickSize\n")
+        f.write("BSE,500325,1,RELIANCE-EQ,0.05\n")  # Listed first, so it owns the bare tsym
+        f.write("NSE,2885,1,RELIANCE-EQ,0.10\n")
+    path = os.path.join(tmp_path, "instruments.idx")
+    InstrumentMaster.compile([source], path)
+    return InstrumentMaster(path)
+
+
+def _order(exchange: str, symbol: str = "RELIANCE-EQ") -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    order.symbol = symbol
+    order.exchange = exchange
+    return order
+
+
+def test_resolve_keeps_order_exchange(tmp_path):
+    om = OrderManager()
+    om._instruments = _master(tmp_path)
+    for exchange, token, tick in (("NSE", "2885", 0.10), ("BSE", "500325", 0.05)):
+        order = _order(exchange)
+        om._resolve_instrument(order)
+        assert (order.exchange, order.token, order.tick_size) == (exchange, token, tick)
+
+
+def test_payload_templates_are_per_exchange(tmp_path):
+    om = OrderManager()
+    om._instruments = _master(tmp_path)
+    nse = om._payload_template("U1", "NSE", "RELIANCE-EQ", "I", ORDER_TYPE_LIMIT)
+    bse = om._payload_template("U1", "BSE", "RELIANCE-EQ", "I", ORDER_TYPE_LIMIT)
+    assert (nse["exch"], bse["exch"]) == ("NSE", "BSE")
+
+    om._instruments = None  # No index: the order's exchange, never a hardcoded one
+    assert om._payload_template("U1", "NSE", "INFY-EQ", "I", ORDER_TYPE_LIMIT)["exch"] == "NSE"
+    assert om._payload_template("U1", "NSE", "MCX:CRUDEOIL25NOVFUT", "I", ORDER_TYPE_LIMIT)["exch"] == "MCX"
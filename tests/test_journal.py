@@ -0,0 +1,155 @@
+"""Order journal append/replay and crash recovery"""
+import asyncio
+import os
+
+from omsflatradejiddi import (KniteOrder, OrderJournal, OrderManager, PositionMgr, ORDER_STATUS_COMPLETE,
+                              ORDER_STATUS_OPEN, ORDER_TYPE_LIMIT, ORDER_TYPE_SL, REC_CLOSE, REC_ORDER, REC_SL_ADD,
+                              REC_SL_REMOVE, RESTART_TYPE_DROP_ALL, RESTART_TYPE_RECREATE_POS)
+
+
+def _manager(path: str) -> OrderManager:
+    """OrderManager wired to a journal file and a position book, without the event loop"""
+    om = OrderManager()
+    om._journal = OrderJournal(path)
+    om._live_pos_mgr = PositionMgr()
+    return om
+
+
+def _order(broker_id: str, quantity: int = 5) -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    order.quantity = quantity
+    order.price = 100.0
+    order.symbol = "RELIANCE-EQ"
+    order.exchange = "NSE"
+    order.token = "2885"
+    order.broker_order_id = broker_id
+    order.status = ORDER_STATUS_OPEN
+    return order
+
+
+def _stop(parent: KniteOrder) -> KniteOrder:
+    stop = KniteOrder(ORDER_TYPE_SL)
+    stop.parent = parent
+    stop.quantity = -parent.quantity
+    stop.price = 95.0
+    stop.symbol, stop.exchange, stop.token = parent.symbol, parent.exchange, parent.token
+    return stop
+
+
+def test_replay_round_trip(tmp_path):
+    journal = OrderJournal(os.path.join(tmp_path, "journal.bin"))
+    working, settled = _order("B1"), _order("B2", quantity=-2)
+    working.tag = "ENTRY_1"
+    working.sl_price = 95.0
+    for order in (working, settled):
+        journal.append_order(REC_ORDER, order)
+    settled.status, settled.filled_qty = ORDER_STATUS_COMPLETE, 2
+    journal.append_order(REC_ORDER, settled)
+    journal.append_fill(settled, -2, 101.0)
+    journal.append_id(REC_CLOSE, settled.id)
+    resting, fired = _stop(working), _stop(settled)
+    journal.append_order(REC_SL_ADD, resting)
+    journal.append_order(REC_SL_ADD, fired)
+    journal.append_id(REC_SL_REMOVE, fired.id)
+
+    state = journal.replay()
+    assert state.records == 8
+    assert list(state.open_orders) == ["B1"]
+    order = state.open_orders["B1"]
+    assert (order.id, order.tag, order.quantity, order.sl_price) == (working.id, "ENTRY_1", 5, 95.0)
+    assert [stop.id for stop in state.sl_orders] == [resting.id]
+    assert state.sl_orders[0].parent is order
+    assert state.fills == [(settled.id, settled.instrument_key, -2, 101.0)]
+    assert state.positions == {settled.instrument_key: -2}
+    assert state.legs == {settled.instrument_key: ("RELIANCE-EQ", "NSE", "2885", 0.05, "I")}
+    journal.close()
+
+
+def test_replay_stops_at_torn_tail(tmp_path):
+    path = os.path.join(tmp_path, "journal.bin")
+    journal = OrderJournal(path)
+    first, second = _order("B1"), _order("B2")
+    journal.append_order(REC_ORDER, first)
+    intact = journal._offset
+    journal.append_order(REC_ORDER, second)
+    journal._mm[journal._offset - 1] ^= 0xFF  # Crash mid-write of the last record
+    journal.close()
+
+    journal = OrderJournal(path)
+    assert journal._offset == intact
+    assert list(journal.replay().open_orders) == ["B1"]
+    # Appends after the restart overwrite the torn record
+    third = _order("B3")
+    journal.append_order(REC_ORDER, third)
+    assert list(journal.replay().open_orders) == ["B1", "B3"]
+    journal.close()
+
+
+def test_drop_all_closes_and_cancels_previous_orders(tmp_path):
+    path = os.path.join(tmp_path, "journal.bin")
+    om = _manager(path)
+    order = _order("B1")
+    om._journal_order(order)
+    om._journal.append_order(REC_SL_ADD, _stop(order))
+    om._journal.close()
+
+    async def restart():
+        om = _manager(path)
+        cancelled = []
+
+        async def cancel_order(order):
+            cancelled.append(order.broker_order_id)
+            return True
+        om.cancel_order = cancel_order
+        om.recover(RESTART_TYPE_DROP_ALL)
+        await asyncio.sleep(0)
+        assert not om._open_orders and not om._sl_orders
+        om._journal.close()
+        return cancelled
+
+    assert asyncio.run(restart()) == ["B1"]
+
+    # The dropped orders stay dropped on a later RECREATE_POS
+    om = _manager(path)
+    state = om.recover(RESTART_TYPE_RECREATE_POS)
+    assert not state.open_orders and not state.sl_orders
+    assert not om._open_orders and not om._sl_orders
+    om._journal.close()
+
+
+def test_recovered_partial_fill_is_not_booked_twice(tmp_path):
+    path = os.path.join(tmp_path, "journal.bin")
+    om = _manager(path)
+    order = _order("B1")
+    om._journal_order(order)
+    om._apply_fill(order, 3, 100.0)
+    order.filled_qty = 3
+    om._journal_order(order)
+    om._journal.close()  # Crash with 3 of 5 filled
+
+    om = _manager(path)
+    om.recover(RESTART_TYPE_RECREATE_POS)
+    recovered = om._open_orders["B1"]
+    assert recovered.id == order.id
+    assert om._live_pos_mgr.position(order.instrument_key)["net_qty"] == 3
+
+    om._apply_fill(recovered, 5, 101.0)  # Broker reports the cumulative fill
+    assert om._live_pos_mgr.position(order.instrument_key)["net_qty"] == 5
+    om._journal.close()
+
+
+def test_group_commit_timer_is_armed_only_by_writes(tmp_path):
+    om = _manager(os.path.join(tmp_path, "journal.bin"))
+    om.JOURNAL_FSYNC_SEC = 0.001
+
+    async def session():
+        om._loop = asyncio.get_running_loop()
+        assert om._journal_flusher is None  # Idle: nothing scheduled
+        om._journal_order(_order("B1"))
+        first = om._journal_flusher
+        om._journal_order(_order("B2"))
+        assert first is not None and om._journal_flusher is first  # One commit per window
+        await asyncio.sleep(0.05)
+        assert om._journal_flusher is None and not om._journal.dirty
+
+    asyncio.run(session())
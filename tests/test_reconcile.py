@@ -0,0 +1,69 @@
+"""Errored and orphaned orders are adopted only by their unique client tag"""
+import asyncio
+
+from omsflatradejiddi import KniteOrder, OrderManager, ORDER_TYPE_LIMIT
+
+
+def _order(tag: str) -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    order.quantity = 1
+    order.price = 100.0
+    order.symbol = "RELIANCE-EQ"
+    order.tag = tag
+    return order
+
+
+def _row(broker_id: str, order: KniteOrder) -> dict:
+    return {"orderid": broker_id, "status": "OPEN", "ordertype": "LMT", "filledqty": "0", "price": "100.0",
+            "quantity": "1", "remarks": order.client_tag, "tag": order.client_tag}
+
+
+def test_adopt_matches_client_tag_not_strategy_tag():
+    om = OrderManager(JOURNAL_ENABLED=False)
+    placed, twin, lost = _order("ENTRY"), _order("ENTRY"), _order("ENTRY")
+    assert len({placed.client_tag, twin.client_tag, lost.client_tag}) == 3
+    om._book.load([_row("B1", placed), _row("B2", twin)])
+
+    async def adopt():
+        return [await om._adopt(order, orphaned=False) for order in (placed, lost)]
+
+    assert asyncio.run(adopt()) == [True, False]
+    assert om._open_orders == {"B1": placed}
+    assert placed.broker_order_id == "B1" and lost.broker_order_id is None
+
+
+def test_status_fallback_spends_a_query_token_per_request():
+    om = OrderManager(JOURNAL_ENABLED=False)
+    tokens, requests = [], []
+
+    async def refresh_book(*args):
+        return False
+
+    async def rate_limiter(*args):
+        tokens.append(args)
+
+    class Response:
+        def __init__(self, order_id):
+            self.order_id = order_id
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def json(self):
+            return {"status": "success", "data": {"orderid": self.order_id, "status": "OPEN", "ordertype": "LMT",
+                                                  "filledqty": "0", "price": "100.0", "quantity": "1"}}
+
+    class Session:
+        def get(self, url, headers):
+            requests.append(url)
+            return Response(url.rsplit("/", 1)[1])
+
+    om._refresh_book, om._rate_limiter, om._session = refresh_book, rate_limiter, Session()
+
+    orders = asyncio.run(om.get_orders(["B1", "B2", "B3"]))
+
+    assert sorted(o.id for o in orders) == ["B1", "B2", "B3"]
+    assert len(tokens) == len(requests) == 3
@@ -0,0 +1,76 @@
+"""Pre-trade risk checks accept within limits and name the first limit breached"""
+import asyncio
+import time
+
+from omsflatradejiddi import KniteOrder, OrderManager, RiskEngine, ORDER_STATUS_REJECTED, ORDER_TYPE_LIMIT
+
+LIMITS = {"max_qty": 100, "max_notional": 50_000.0, "max_position": 150, "price_band_pct": 0.05,
+          "max_orders_per_sec": 1000}
+
+
+def _order(quantity: int, price: float = 100.0, token: str = "1") -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    order.quantity = quantity
+    order.price = price
+    order.symbol = f"SYM{token}-EQ"
+    order.token = token
+    return order
+
+
+def test_accepts_within_limits_and_rejects_each_breach():
+    risk = RiskEngine(LIMITS)
+
+    assert risk.check(_order(100), ltp=100.0) is None
+    assert risk.check(_order(101), ltp=100.0) == "max_qty"
+    assert risk.check(_order(10, price=6000.0), ltp=None) == "max_notional"
+    assert risk.check(_order(10, price=106.0), ltp=100.0) == "price_band"
+    assert risk.check(_order(60), ltp=100.0) == "position"  # 100 working + 60 > 150
+    assert risk.check(_order(-100), ltp=100.0) is None  # Sells count against the other side
+
+    assert risk.passed == 2
+    assert risk.rejects == {"max_qty": 1, "max_notional": 1, "position": 1, "price_band": 1, "order_rate": 0}
+
+
+def test_released_working_quantity_frees_position_room():
+    risk = RiskEngine(LIMITS)
+    working = _order(100)
+    assert risk.check(working) is None
+    assert risk.check(_order(60)) == "position"
+
+    risk.on_fill(working, 40)
+    risk.release(working)  # The other 60 was cancelled
+
+    assert risk.check(_order(100)) is None  # 40 held + 100 <= 150
+
+
+def test_instrument_override_and_rate_limit(monkeypatch):
+    monkeypatch.setattr(time, "monotonic", lambda: 1000.0)  # All checks inside one rate window
+    risk = RiskEngine({**LIMITS, "max_orders_per_sec": 2}, {"NSE|2": {"max_qty": 5}})
+
+    assert risk.check(_order(6, token="2")) == "max_qty"
+    assert risk.check(_order(6)) is None
+    assert risk.check(_order(5, token="2")) is None
+    assert risk.check(_order(1)) == "order_rate"
+
+
+def test_exits_and_stops_are_never_blocked():
+    risk = RiskEngine(LIMITS)
+    exit_order = _order(-10_000)
+    exit_order.is_exit_order = True
+
+    assert risk.check(exit_order, ltp=1.0) is None
+
+
+def test_manager_rejects_before_placing():
+    om = OrderManager(JOURNAL_ENABLED=False, RISK_LIMITS=LIMITS)
+    order = _order(500)
+    placed = []
+
+    async def place_order(api, order):
+        placed.append(order)
+    om.place_order = place_order
+
+    asyncio.run(om.process_new_order(order))
+
+    assert not placed and order.status == ORDER_STATUS_REJECTED
+    assert om.risk().rejects["max_qty"] == 1
@@ -0,0 +1,65 @@
+"""OrderScheduler class ordering, barriers and starvation promotion"""
+import time
+
+from omsflatradejiddi import (KniteOrder, OrderScheduler, ORDER_TYPE_LIMIT, SCHED_AMEND, SCHED_ENTRY,
+                             SCHED_EXIT, SCHED_SL_EXIT)
+
+
+def _order(overdue: bool = False) -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    if overdue:
+        order.deadline = time.monotonic() - 1.0  # Waited past any MAX_WAIT_SEC budget
+    return order
+
+
+def _barrier() -> KniteOrder:
+    barrier = KniteOrder(ORDER_TYPE_LIMIT)
+    barrier.is_barrier = True
+    return barrier
+
+
+def _drain(scheduler: OrderScheduler):
+    served = []
+    while scheduler:
+        klass, order = scheduler.peek()
+        assert scheduler.pop(klass) is order
+        served.append((klass, order))
+    return served
+
+
+def test_exits_never_overtake_stop_loss_batch():
+    scheduler = OrderScheduler()
+    sl_batch = [_order() for _ in range(10)] + [_barrier()]
+    exits = [_order(overdue=True) for _ in range(3)] + [_barrier()]
+    for order in sl_batch:
+        scheduler.push(order, SCHED_SL_EXIT)
+    for order in exits:
+        scheduler.push(order, SCHED_EXIT)
+
+    served = [order for _, order in _drain(scheduler)]
+    assert served == sl_batch + exits
+
+
+def test_no_promotion_across_open_barrier():
+    scheduler = OrderScheduler()
+    exits = [_order() for _ in range(8)] + [_barrier()]
+    for order in exits:
+        scheduler.push(order, SCHED_EXIT)
+    entry = _order(overdue=True)
+    scheduler.push(entry, SCHED_ENTRY)
+
+    served = [order for _, order in _drain(scheduler)]
+    assert served == exits + [entry]
+
+
+def test_starved_class_is_promoted_without_barriers():
+    scheduler = OrderScheduler()
+    exits = [_order() for _ in range(8)]
+    for order in exits:
+        scheduler.push(order, SCHED_EXIT)
+    amend = _order(overdue=True)
+    scheduler.push(amend, SCHED_AMEND)
+
+    served = _drain(scheduler)
+    assert served[0] == (SCHED_AMEND, amend)
+    assert scheduler.promoted[SCHED_AMEND] == 1
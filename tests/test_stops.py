@@ -0,0 +1,58 @@
+"""Resting stops cover what the parent actually filled"""
+import asyncio
+import json
+from collections import deque
+
+from omsflatradejiddi import KniteOrder, OrderManager, PositionMgr, ORDER_STATUS_OPEN, ORDER_TYPE_LIMIT
+
+
+def _manager() -> OrderManager:
+    om = OrderManager(BLOCK_ALL_ORDERS=True, JOURNAL_ENABLED=False)
+    om._live_pos_mgr = PositionMgr()
+    return om
+
+
+def _working(om: OrderManager, quantity: int) -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    order.quantity = quantity
+    order.price = 100.0
+    order.sl_price = 95.0 if quantity > 0 else 105.0
+    order.symbol = "SYM1-EQ"
+    order.token = "1"
+    order.broker_order_id = "B1"
+    order.status = ORDER_STATUS_OPEN
+    om._open_orders["B1"] = order
+    return order
+
+
+def _update(om: OrderManager, status: str, filled: int):
+    frame = {"t": "om", "n": "B1", "status": status, "filledqty": str(filled), "flprc": "100.0"}
+    om._drain_ws_frames(deque([json.dumps(frame)]))
+
+
+def test_partial_fill_then_cancel_stops_only_the_filled_part():
+    om = _manager()
+    parent = _working(om, 10)
+
+    _update(om, "OPEN", 4)
+    assert om._sl_by_parent[parent.id].quantity == -4
+
+    _update(om, "CANCELED", 4)
+    asyncio.run(om.process_ws_updates())
+
+    sl_order = om._sl_by_parent[parent.id]
+    assert sl_order.quantity == -4 and sl_order.price == 95.0
+    assert om._live_pos_mgr.positions_to_flatten() == [("NSE|1", -4)]
+
+
+def test_later_partial_fills_grow_the_stop():
+    om = _manager()
+    parent = _working(om, -10)
+
+    _update(om, "OPEN", 3)
+    _update(om, "OPEN", 7)
+    _update(om, "COMPLETE", 10)
+    asyncio.run(om.process_ws_updates())
+
+    assert om._sl_by_parent[parent.id].quantity == 10
+    assert sum(len(book) for book in om._sl_orders.values()) == 1
@@ -0,0 +1,72 @@
+"""Strategy threads hand orders to the loop through the inbox, never touching loop state directly"""
+import asyncio
+import threading
+
+import pytest
+
+from omsflatradejiddi import (KniteOrder, OrderManager, ORDER_TYPE_LIMIT, SCHED_ENTRY, SCHED_EXIT, STAGE_COMMAND,
+                              STAGE_NEW)
+
+
+def _order(i: int, exit_order: bool = False) -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    order.quantity = 1
+    order.price = 100.0
+    order.symbol = f"SYM{i}-EQ"
+    order.is_exit_order = exit_order
+    return order
+
+
+def _queued(om: OrderManager, klass: int) -> list:
+    return om.scheduler().drop(klass)
+
+
+def test_submit_before_start_raises():
+    om = OrderManager(JOURNAL_ENABLED=False)
+    with pytest.raises(RuntimeError):
+        om.submit_threadsafe(_order(0))
+
+
+def test_foreign_threads_submit_to_the_loop():
+    om = OrderManager(JOURNAL_ENABLED=False)
+    per_thread, threads = 200, 4
+    loop_threads = set()
+
+    drain_inbox = om._drain_inbox
+
+    def drain_on_loop():
+        loop_threads.add(threading.get_ident())
+        drain_inbox()
+    om._drain_inbox = drain_on_loop
+
+    async def session():
+        om._loop = asyncio.get_running_loop()
+        om._loop_thread = threading.get_ident()
+        barrier = threading.Barrier(threads)
+
+        def strategy(t: int):
+            barrier.wait()
+            for i in range(per_thread):
+                om.submit_threadsafe(_order(t * per_thread + i))
+            om.submit_many_threadsafe([_order(-1 - t, exit_order=True)])
+
+        workers = [threading.Thread(target=strategy, args=(t,)) for t in range(threads)]
+        for worker in workers:
+            worker.start()
+        await asyncio.get_running_loop().run_in_executor(None, lambda: [w.join() for w in workers])
+        om.command_threadsafe("ExitAll")
+        await om._wakeup.wait()
+        for _ in range(10):  # Let any drain scheduled by the last posts run
+            await asyncio.sleep(0)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(session())
+
+    entries = _queued(om, SCHED_ENTRY)
+    assert len(entries) == threads * per_thread
+    assert len({o.id for o in entries}) == threads * per_thread
+    assert len(_queued(om, SCHED_EXIT)) == threads
+    assert not om._inbox
+    assert loop_threads == {loop_thread}  # Only the loop thread touched the scheduler
+    assert {STAGE_NEW, STAGE_COMMAND} <= om._pending_stages and om._export_orders_str == "ExitAll"
+    assert om._latency_hist["thread_handoff"].count == threads * (per_thread + 1) + 1
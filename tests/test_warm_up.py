@@ -0,0 +1,55 @@
+"""Warm-up touches the broker only with read-only calls; orders wait for the ready point"""
+import asyncio
+import contextlib
+
+import flattrade_simulator as sim_mod
+from omsflatradejiddi import KniteOrder, OrderManager, ORDER_TYPE_LIMIT
+
+
+def _order() -> KniteOrder:
+    order = KniteOrder(ORDER_TYPE_LIMIT)
+    order.quantity = 1
+    order.price = 100.0
+    order.symbol = "RELIANCE-EQ"
+    order.token = "2885"
+    return order
+
+
+def test_orders_submitted_during_warm_up_go_out_after_ready():
+    async def session():
+        sim = sim_mod.FlattradeSimulator(fill_model=sim_mod.FillModel("manual"))
+        await sim.start()
+        om = OrderManager(STARTUP_BUDGET_SEC=1.0, EVENT_LOG_ENABLED=False)
+        sim_mod.install(sim, om)
+        placed_when_ready = []
+
+        class API(sim_mod.SimulatedFlattradeAPI):
+            async def place_order(self, **payload) -> dict:
+                placed_when_ready.append(om._ready.is_set())
+                return await super().place_order(**payload)
+        om.API_CLASS = lambda creds, token=None: API(sim, creds, token)
+
+        loop_task = asyncio.create_task(om.start(sim_mod.SIM_CREDS))
+        try:
+            while om._loop is None:
+                await asyncio.sleep(0)
+            om.submit_threadsafe(_order())
+            await om._ready.wait()
+            assert sim.stats["placed"] == 0  # Pre-warm and prefetch placed nothing
+            for _ in range(200):
+                if sim.stats["placed"]:
+                    break
+                await asyncio.sleep(0.01)
+            return placed_when_ready, sim.stats["placed"], om.startup_report()
+        finally:
+            await om.stop()
+            loop_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await loop_task
+            await om._api.close()
+            await sim.stop()
+
+    placed_when_ready, placed, report = asyncio.run(session())
+
+    assert placed_when_ready == [True] and placed == 1
+    assert {"token", "sod", "http_prewarm", "order_book"} <= set(report["steps_ms"])
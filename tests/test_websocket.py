@@ -0,0 +1,49 @@
+"""WebSocket reconnect backoff only resets once a connection really came up"""
+import asyncio
+
+from omsflatradejiddi import EV_WS_RECONNECT, OrderManager
+
+
+class _DroppingSocket:
+    """Connects, optionally acknowledges the login, then drops"""
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.frames:
+            raise StopAsyncIteration
+        return self.frames.pop(0)
+
+    async def close(self):
+        pass
+
+
+def _reconnect_attempts(frames, drops: int = 4):
+    """Attempt numbers the listener logs across `drops` connections that each send frames and close"""
+    om = OrderManager(WS_RECONNECT_BASE_SEC=0.0001, EVENT_LOG_ENABLED=False)
+    attempts = []
+
+    async def ws_open():
+        return _DroppingSocket(frames)
+
+    def event(code, order_id=0, b="", num=0, value=0.0):
+        if code == EV_WS_RECONNECT:
+            attempts.append(num)
+            if len(attempts) == drops:
+                om._cts.set()
+    om._ws_open = ws_open
+    om._event = event
+    asyncio.run(om._ws_listener())
+    return attempts
+
+
+def test_backoff_escalates_when_login_is_never_acknowledged():
+    assert _reconnect_attempts([]) == [1, 2, 3, 4]
+    assert _reconnect_attempts(['{"t":"ck","s":"NOT_OK","emsg":"Session Expired"}']) == [1, 2, 3, 4]
+
+
+def test_backoff_resets_after_login_ack():
+    assert _reconnect_attempts(['{"t":"ck","s":"OK","uid":"FT0001"}']) == [1, 1, 1, 1]